@@ -27,16 +27,29 @@ CREATE TABLE IF NOT EXISTS user_roles (
 CREATE TABLE IF NOT EXISTS refresh_tokens (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-    token TEXT UNIQUE NOT NULL,
+    token_hash BYTEA UNIQUE NOT NULL,  -- blake2b (16 bytes) do token; o token não é armazenado
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     is_valid BOOLEAN DEFAULT TRUE
 );
 
+-- Migração de bases antigas que guardavam o token completo: o hash blake2b não pode ser
+-- calculado no Postgres, então tokens antigos são invalidados (novo login) e descartados
+ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA;
+DELETE FROM refresh_tokens WHERE token_hash IS NULL;
+ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'refresh_tokens_token_hash_key') THEN
+        ALTER TABLE refresh_tokens ADD CONSTRAINT refresh_tokens_token_hash_key UNIQUE (token_hash);
+    END IF;
+END $$;
+ALTER TABLE refresh_tokens DROP COLUMN IF EXISTS token;
+DROP INDEX IF EXISTS idx_refresh_tokens_token;
+
 -- Índices
 CREATE INDEX IF NOT EXISTS idx_user_roles_user_id ON user_roles(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_roles_role_id ON user_roles(role_id);
 CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_id ON refresh_tokens(user_id);
-CREATE INDEX IF NOT EXISTS idx_refresh_tokens_token ON refresh_tokens(token);
 CREATE INDEX IF NOT EXISTS idx_refresh_tokens_created_at ON refresh_tokens(created_at);
 
 -- Roles padrão
@@ -55,6 +68,39 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Função para invalidar refresh tokens antigos, mantendo apenas os N mais recentes
+CREATE OR REPLACE FUNCTION invalidate_old_refresh_tokens(p_user_id UUID, p_keep_n INTEGER)
+RETURNS VOID AS $$
+    UPDATE refresh_tokens
+    SET is_valid = FALSE
+    WHERE user_id = p_user_id
+      AND is_valid = TRUE
+      AND id NOT IN (
+          SELECT id FROM refresh_tokens
+          WHERE user_id = p_user_id AND is_valid = TRUE
+          ORDER BY created_at DESC
+          LIMIT p_keep_n
+      );
+$$ language 'sql';
+
+-- Função para remover refresh tokens expirados (mais de 7 dias)
+CREATE OR REPLACE FUNCTION cleanup_expired_refresh_tokens()
+RETURNS VOID AS $$
+    DELETE FROM refresh_tokens
+    WHERE created_at < NOW() - INTERVAL '7 days';
+$$ language 'sql';
+
+-- Job agendado (pg_cron) para a limpeza, fora do processo da aplicação.
+-- Sem pg_cron disponível o script segue; a limpeza precisa então ser agendada externamente.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_cron;
+    PERFORM cron.schedule('cleanup_refresh_tokens', '*/5 * * * *', 'SELECT cleanup_expired_refresh_tokens()');
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_cron indisponível (%); agende cleanup_expired_refresh_tokens() externamente', SQLERRM;
+END
+$$;
+
 -- Trigger para atualizar updated_at
 CREATE TRIGGER update_users_updated_at
     BEFORE UPDATE ON users
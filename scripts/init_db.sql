@@ -277,3 +277,29 @@ CREATE POLICY "Enable write access for service role" ON extraction_strategies
 
 CREATE POLICY "Enable write access for service role" ON aggregations
     FOR ALL USING (auth.role() = 'service_role');
+
+-- Scheduling columns written by the scheduler
+ALTER TABLE monitored_urls
+    ADD COLUMN IF NOT EXISTS next_scrape_at TIMESTAMP WITH TIME ZONE,
+    ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'active',
+    ADD COLUMN IF NOT EXISTS retry_count INTEGER DEFAULT 0;
+
+-- Bulk update of buffered scheduler rows in one round-trip.
+-- Update-only: rows for URLs deleted meanwhile are skipped, never re-created.
+-- Fields missing from a row keep their current value.
+CREATE OR REPLACE FUNCTION update_monitored_urls(rows JSONB)
+RETURNS VOID AS $$
+    UPDATE monitored_urls m
+    SET next_scrape_at = COALESCE(r.next_scrape_at, m.next_scrape_at),
+        last_check = COALESCE(r.last_check, m.last_check),
+        status = COALESCE(r.status, m.status),
+        retry_count = COALESCE(r.retry_count, m.retry_count)
+    FROM jsonb_to_recordset(rows) AS r(
+        url TEXT,
+        next_scrape_at TIMESTAMP WITH TIME ZONE,
+        last_check TIMESTAMP WITH TIME ZONE,
+        status TEXT,
+        retry_count INTEGER
+    )
+    WHERE m.url = r.url;
+$$ language 'sql';
@@ -0,0 +1,4 @@
+import sys
+
+# slots=True needs Python 3.10+; older interpreters get regular dataclasses
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
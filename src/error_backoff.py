@@ -0,0 +1,20 @@
+import random
+
+ERROR_DELAY_CAP = 60  # max base delay after loop errors, before jitter
+ERROR_BACKOFF_MAX = 300  # cap for the doubling backoff counter
+
+class ErrorBackoff:
+    """Exponential backoff with jitter for consecutive loop errors."""
+
+    def __init__(self):
+        self._backoff = 1.0
+
+    def reset(self):
+        """Start over after a successful iteration."""
+        self._backoff = 1.0
+
+    def next_delay(self) -> float:
+        """Seconds to sleep after another consecutive error."""
+        delay = min(ERROR_DELAY_CAP, self._backoff) * (1 + random.random())
+        self._backoff = min(self._backoff * 2, ERROR_BACKOFF_MAX)
+        return delay
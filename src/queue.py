@@ -1,10 +1,10 @@
 import asyncio
+import itertools
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass
 from collections import defaultdict
-import heapq
 from loguru import logger
 from src.config.settings import settings
 
@@ -42,14 +42,21 @@ class QueueEmptyError(QueueError):
 class ScrapingQueue:
     def __init__(self, max_workers: int = 10):
         """Initialize the scraping queue with concurrency control."""
-        self.priority_queue: List[QueueItem] = []
+        # Entries are (-priority_score, sequence, item): highest score first, FIFO on ties
+        self.priority_queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        # Rate-limited items waiting to be re-queued, by token; flush() cancels them
+        self._requeues: Dict[int, asyncio.TimerHandle] = {}
+        self.max_workers = max_workers
         self.processing_items: Set[str] = set()
         self.domain_last_scrape: Dict[str, datetime] = {}
-        self.domain_success_rate: Dict[str, float] = defaultdict(lambda: 1.0)
-        self.domain_error_count: Dict[str, int] = defaultdict(int)
-        self.semaphore = asyncio.Semaphore(max_workers)
+        # Plain dicts: missing domains read as 1.0 success rate / 0 errors
+        self.domain_success_rate: Dict[str, float] = {}
+        self.domain_error_count: Dict[str, int] = {}
         self._lock = asyncio.Lock()
         self._paused = False
+        self._running = asyncio.Event()
+        self._running.set()
         self._stop_event = asyncio.Event()
         self._setup_logging()
         
@@ -66,20 +73,32 @@ class ScrapingQueue:
             rotation=settings.LOG_ROTATION_SIZE,
             retention=f"{settings.LOG_RETENTION_DAYS} days",
             level=settings.LOG_LEVEL,
-            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+            # Format and write from loguru's background thread, not the event loop
+            enqueue=True,
+            backtrace=False,
+            diagnose=False
         )
 
+    def _put(self, item: QueueItem) -> None:
+        """Push an item onto the priority queue."""
+        self.priority_queue.put_nowait((-item.priority_score, next(self._sequence), item))
+
+    def _requeue(self, token: int, item: QueueItem) -> None:
+        """Put back an item whose domain rate limit has expired."""
+        self._requeues.pop(token, None)
+        self._put(item)
+
     async def add_item(self, item: QueueItem) -> None:
         """Add an item to the priority queue."""
-        async with self._lock:
-            if len(self.priority_queue) >= settings.MAX_QUEUE_SIZE:
-                raise QueueFullError("Queue is at maximum capacity")
-            
-            # Calculate priority score
-            item.priority_score = await self._calculate_priority_score(item)
-            
-            # Add to priority queue
-            heapq.heappush(self.priority_queue, item)
+        if self.priority_queue.qsize() >= settings.MAX_QUEUE_SIZE:
+            raise QueueFullError("Queue is at maximum capacity")
+        
+        # Calculate priority score
+        item.priority_score = await self._calculate_priority_score(item)
+        
+        # Add to priority queue
+        self._put(item)
 
     async def _calculate_priority_score(self, item: QueueItem) -> float:
         """Calculate priority score based on multiple factors."""
@@ -91,7 +110,7 @@ class ScrapingQueue:
         score += time_score * 0.4  # 40% weight
         
         # Domain success rate (0-1 score)
-        domain_success = self.domain_success_rate[item.domain]
+        domain_success = self.domain_success_rate.get(item.domain, 1.0)
         score += domain_success * 0.3  # 30% weight
         
         # Error count penalty
@@ -104,35 +123,38 @@ class ScrapingQueue:
         
         return max(0.0, min(1.0, score))
 
-    async def get_next_item(self) -> Optional[QueueItem]:
-        """Get the next item from the queue respecting domain rate limits."""
-        async with self._lock:
-            if not self.priority_queue or self._paused:
-                return None
+    async def get_next_item(self) -> QueueItem:
+        """Wait for the next item from the queue respecting domain rate limits."""
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self.priority_queue.get()
+            if self._paused:
+                # Paused while waiting: keep the item queued (same position) until resume
+                self.priority_queue.put_nowait(entry)
+                await self._running.wait()
+                continue
+            _, _, item = entry
             
-            # Try to find an item that respects domain rate limits
-            for _ in range(len(self.priority_queue)):
-                item = heapq.heappop(self.priority_queue)
-                
-                # Check domain rate limit
-                last_scrape = self.domain_last_scrape.get(item.domain)
-                if last_scrape:
-                    time_since_last = (datetime.utcnow() - last_scrape).total_seconds()
-                    if time_since_last < settings.DOMAIN_RATE_LIMIT:
-                        # Put back in queue with lower priority
-                        item.priority_score *= 0.9
-                        heapq.heappush(self.priority_queue, item)
-                        continue
-                
-                # Update domain last scrape time
-                self.domain_last_scrape[item.domain] = datetime.utcnow()
-                self.processing_items.add(item.url)
-                item.status = "processing"
-                item.processing_start = datetime.utcnow()
-                
-                return item
+            # Check domain rate limit
+            last_scrape = self.domain_last_scrape.get(item.domain)
+            if last_scrape:
+                time_since_last = (datetime.utcnow() - last_scrape).total_seconds()
+                if time_since_last < settings.DOMAIN_RATE_LIMIT:
+                    # Put back in queue with lower priority once the domain is allowed again
+                    item.priority_score *= 0.9
+                    token = next(self._sequence)
+                    self._requeues[token] = loop.call_later(
+                        settings.DOMAIN_RATE_LIMIT - time_since_last, self._requeue, token, item
+                    )
+                    continue
+            
+            # Update domain last scrape time
+            self.domain_last_scrape[item.domain] = datetime.utcnow()
+            self.processing_items.add(item.url)
+            item.status = "processing"
+            item.processing_start = datetime.utcnow()
             
-            return None
+            return item
 
     async def mark_complete(self, item: QueueItem, success: bool, error: Optional[str] = None) -> None:
         """Mark an item as complete and update metrics."""
@@ -140,22 +162,21 @@ class ScrapingQueue:
             self.processing_items.remove(item.url)
             item.processing_end = datetime.utcnow()
             
+            # Update domain success rate (EWMA), one read and one write
+            rates = self.domain_success_rate
+            rates[item.domain] = rates.get(item.domain, 1.0) * 0.9 + (0.1 if success else 0.0)
+            
             if success:
                 item.status = "done"
                 self.total_processed += 1
-                # Update domain success rate
-                self.domain_success_rate[item.domain] = (
-                    self.domain_success_rate[item.domain] * 0.9 + 0.1
-                )
             else:
                 item.status = "error"
                 self.total_errors += 1
                 item.error_count += 1
                 item.last_error = error
                 # Update domain error count
-                self.domain_error_count[item.domain] += 1
-                # Decrease domain success rate
-                self.domain_success_rate[item.domain] *= 0.9
+                errors = self.domain_error_count
+                errors[item.domain] = errors.get(item.domain, 0) + 1
             
             # Update processing time metrics
             if item.processing_start and item.processing_end:
@@ -166,16 +187,17 @@ class ScrapingQueue:
             queue_time = (item.processing_start - item.added_at).total_seconds()
             self.queue_times[item.domain].append(queue_time)
             
+            # Arguments are formatted by loguru only if a sink accepts the record
             logger.info(
-                f"Completed {item.url} with status {item.status} "
-                f"(processing time: {processing_time:.2f}s, queue time: {queue_time:.2f}s)"
+                "Completed {} with status {} (processing time: {:.2f}s, queue time: {:.2f}s)",
+                item.url, item.status, processing_time, queue_time
             )
 
     async def retry_item(self, item: QueueItem) -> None:
         """Retry an item with exponential backoff."""
         if item.retries >= settings.MAX_RETRIES:
             item.status = "broken"
-            logger.warning(f"Item {item.url} marked as broken after {item.retries} retries")
+            logger.warning("Item {} marked as broken after {} retries", item.url, item.retries)
             return
         
         item.retries += 1
@@ -183,26 +205,32 @@ class ScrapingQueue:
         item.priority_score = await self._calculate_priority_score(item)
         
         # Add back to queue with lower priority
-        async with self._lock:
-            heapq.heappush(self.priority_queue, item)
-            logger.info(f"Retrying {item.url} (attempt {item.retries})")
+        self._put(item)
+        logger.info("Retrying {} (attempt {})", item.url, item.retries)
 
     async def pause(self) -> None:
         """Pause queue processing."""
         async with self._lock:
             self._paused = True
+            self._running.clear()
             logger.info("Queue paused")
 
     async def resume(self) -> None:
         """Resume queue processing."""
         async with self._lock:
             self._paused = False
+            self._running.set()
             logger.info("Queue resumed")
 
     async def flush(self) -> None:
         """Clear the queue."""
         async with self._lock:
-            self.priority_queue.clear()
+            while not self.priority_queue.empty():
+                self.priority_queue.get_nowait()
+            # Rate-limited items scheduled to come back are dropped too
+            for handle in self._requeues.values():
+                handle.cancel()
+            self._requeues.clear()
             self.processing_items.clear()
             logger.info("Queue flushed")
 
@@ -210,15 +238,15 @@ class ScrapingQueue:
         """Get current queue status."""
         async with self._lock:
             return {
-                "queue_size": len(self.priority_queue),
+                "queue_size": self.priority_queue.qsize(),
                 "processing": len(self.processing_items),
                 "total_processed": self.total_processed,
                 "total_errors": self.total_errors,
                 "paused": self._paused,
                 "domain_stats": {
                     domain: {
-                        "success_rate": self.domain_success_rate[domain],
-                        "error_count": self.domain_error_count[domain],
+                        "success_rate": self.domain_success_rate.get(domain, 1.0),
+                        "error_count": self.domain_error_count.get(domain, 0),
                         "avg_processing_time": sum(times) / len(times) if times else 0,
                         "avg_queue_time": sum(qtimes) / len(qtimes) if qtimes else 0
                     }
@@ -230,59 +258,67 @@ class ScrapingQueue:
             }
 
     async def process_queue(self, engine, metrics, db, notifier):
-        """Main queue processing loop."""
+        """Main queue processing loop: runs max_workers workers until stopped."""
         logger.info("Starting queue processor")
         
+        workers = [
+            asyncio.create_task(self._worker(engine, metrics, db, notifier))
+            for _ in range(self.max_workers)
+        ]
+        try:
+            await self._stop_event.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self, engine, metrics, db, notifier):
+        """Process items as soon as they become available."""
         while not self._stop_event.is_set():
             try:
-                if self._paused:
-                    await asyncio.sleep(1)
-                    continue
+                await self._running.wait()
+                item = await self.get_next_item()
                 
-                async with self.semaphore:
-                    item = await self.get_next_item()
-                    if not item:
-                        await asyncio.sleep(1)
-                        continue
+                try:
+                    # Process item
+                    result = await engine.scrape(item)
+                    
+                    # Update metrics
+                    await metrics.record_scrape(
+                        domain=item.domain,
+                        success=result.success,
+                        processing_time=result.processing_time,
+                        queue_time=result.queue_time
+                    )
                     
-                    try:
-                        # Process item
-                        result = await engine.scrape(item)
-                        
-                        # Update metrics
-                        await metrics.record_scrape(
-                            domain=item.domain,
-                            success=result.success,
-                            processing_time=result.processing_time,
-                            queue_time=result.queue_time
-                        )
-                        
-                        # Update database
-                        await db.update_url_status(
-                            url=item.url,
-                            status="active" if result.success else "error",
-                            last_check=datetime.utcnow()
-                        )
-                        
-                        # Mark complete
-                        await self.mark_complete(item, result.success, result.error)
-                        
-                        # Handle errors
-                        if not result.success:
-                            if item.retries < settings.MAX_RETRIES:
-                                await self.retry_item(item)
-                            else:
-                                await notifier.send_alert(
-                                    level="error",
-                                    message=f"URL {item.url} failed after {item.retries} retries",
-                                    details=result.error
-                                )
+                    # Update database
+                    await db.update_url_status(
+                        url=item.url,
+                        status="active" if result.success else "error",
+                        last_check=datetime.utcnow()
+                    )
                     
-                    except Exception as e:
-                        logger.error(f"Error processing {item.url}: {str(e)}")
-                        await self.mark_complete(item, False, str(e))
-                        await self.retry_item(item)
+                    # Mark complete
+                    await self.mark_complete(item, result.success, result.error)
+                    
+                    # Handle errors
+                    if not result.success:
+                        if item.retries < settings.MAX_RETRIES:
+                            await self.retry_item(item)
+                        else:
+                            await notifier.send_alert(
+                                level="error",
+                                message=f"URL {item.url} failed after {item.retries} retries",
+                                details=result.error
+                            )
                 
+                except Exception as e:
+                    logger.error(f"Error processing {item.url}: {str(e)}")
+                    await self.mark_complete(item, False, str(e))
+                    await self.retry_item(item)
+            
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in queue processor: {str(e)}")
                 await asyncio.sleep(settings.QUEUE_PROCESS_INTERVAL)
@@ -1,41 +1,117 @@
-from typing import Dict, List, Optional, Tuple, Any, Set
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple, Any, Set
 from dataclasses import dataclass
 import logging
+import sys
 from datetime import datetime
 import json
 import gzip
+import hashlib
 import zlib
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import threading
+from contextlib import ExitStack
 from queue import Queue
 import time
 import psutil
 import numpy as np
 from src.config.settings import settings
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import weakref
 
 logger = logging.getLogger(__name__)
 
+# Fraction of max_total_size above which reads opportunistically evict
+CACHE_LOW_WATER_MARK = 0.9
+
+# Number of lock stripes guarding the cache and connection pool (power of two)
+LOCK_STRIPES = 16
+
+# Seconds between periodic resource checks
+RESOURCE_MONITOR_INTERVAL = 60
+
+# Maximum number of compressed blobs kept for reuse
+COMPRESSED_CACHE_SIZE = 256
+
+# Initial capacity of the eviction score arrays (grown geometrically)
+INITIAL_CACHE_SLOTS = 64
+
 @dataclass
 class CacheEntry:
     data: Any
     timestamp: datetime
     size: int
-    access_count: int
-    last_accessed: datetime
+    slot: int  # index into the eviction score arrays
 
 class ResourceOptimizer:
     def __init__(self):
         self.memory_cache: Dict[str, CacheEntry] = {}
         self.connection_pool: Dict[str, List[Any]] = defaultdict(list)
         self.request_queue: Queue = Queue()
+        self._cache_bytes = 0
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Guards the byte counter and the slot arrays; taken after a stripe
+        self._index_lock = threading.Lock()
+        self._reset_slots()
+        self._proc = psutil.Process()
+        # Seed the system-wide CPU sample so later non-blocking reads are meaningful
+        psutil.cpu_percent(interval=None)
+        # Result of the last periodic check; check_resources() only reads it
+        self._within_limits = True
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._compressed_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._compressed_lock = threading.Lock()
         self._setup_logging()
         self._start_optimization_threads()
-        self._lock = threading.Lock()
         self._executor = ThreadPoolExecutor(max_workers=settings.network.max_concurrent_connections)
         self._finalizer = weakref.finalize(self, self.cleanup)
 
+    def _lk(self, key: str) -> threading.Lock:
+        """Get the lock stripe guarding a cache key or pool domain."""
+        return self._locks[hash(key) & (LOCK_STRIPES - 1)]
+
+    def _reset_slots(self) -> None:
+        """Allocate empty eviction score arrays (one slot per cache entry)."""
+        self._keys: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._counts = np.zeros(INITIAL_CACHE_SLOTS, dtype=np.int32)
+        self._times = np.zeros(INITIAL_CACHE_SLOTS, dtype=np.float64)
+        self._sizes = np.zeros(INITIAL_CACHE_SLOTS, dtype=np.int64)
+        self._live = np.zeros(INITIAL_CACHE_SLOTS, dtype=bool)
+
+    def _grow_slots(self) -> None:
+        """Double the capacity of the slot arrays."""
+        capacity = len(self._counts)
+        self._counts = np.concatenate([self._counts, np.zeros(capacity, dtype=np.int32)])
+        self._times = np.concatenate([self._times, np.zeros(capacity, dtype=np.float64)])
+        self._sizes = np.concatenate([self._sizes, np.zeros(capacity, dtype=np.int64)])
+        self._live = np.concatenate([self._live, np.zeros(capacity, dtype=bool)])
+
+    def _acquire_slot(self, key: str, size: int) -> int:
+        """Register a cache entry in the slot arrays. Caller holds _index_lock."""
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._keys)
+            self._keys.append(None)
+            if slot >= len(self._counts):
+                self._grow_slots()
+
+        self._keys[slot] = key
+        self._counts[slot] = 0
+        self._times[slot] = time.monotonic()
+        self._sizes[slot] = size
+        self._live[slot] = True
+        self._cache_bytes += size
+        return slot
+
+    def _release_slot(self, slot: int) -> None:
+        """Free a slot of a removed entry. Caller holds _index_lock."""
+        self._keys[slot] = None
+        self._live[slot] = False
+        self._cache_bytes -= int(self._sizes[slot])
+        self._free_slots.append(slot)
+
     def _setup_logging(self):
         """Configure logging for resource optimization."""
         logger.setLevel(settings.logging.level)
@@ -46,39 +122,25 @@ class ResourceOptimizer:
 
     def _start_optimization_threads(self):
         """Start background threads for optimization tasks."""
-        self.memory_cleanup_thread = threading.Thread(
-            target=self._memory_cleanup_worker,
-            daemon=True
-        )
-        self.memory_cleanup_thread.start()
-
         self.request_batching_thread = threading.Thread(
             target=self._request_batching_worker,
             daemon=True
         )
         self.request_batching_thread.start()
 
-        self.resource_monitor_thread = threading.Thread(
-            target=self._resource_monitor_worker,
-            daemon=True
-        )
-        self.resource_monitor_thread.start()
+    async def initialize(self) -> None:
+        """Start periodic resource monitoring on the running event loop."""
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._resource_monitor())
 
     def optimize_memory_usage(self, data: Dict) -> Dict:
         """Optimize memory usage by reducing data duplication."""
-        optimized = {}
-        
-        # Remove duplicate values using weak references
-        value_cache = weakref.WeakValueDictionary()
-        for key, value in data.items():
-            if isinstance(value, (str, int, float, bool)):
-                if value in value_cache:
-                    optimized[key] = value_cache[value]
-                else:
-                    value_cache[value] = value
-                    optimized[key] = value
-            else:
-                optimized[key] = value
+        # Deduplicate strings through the interpreter's intern table; numbers
+        # and bools are immutable and gain nothing from deduplication
+        optimized = {
+            key: sys.intern(value) if isinstance(value, str) else value
+            for key, value in data.items()
+        }
 
         # Compress large string values
         for key, value in optimized.items():
@@ -88,11 +150,23 @@ class ResourceOptimizer:
         return optimized
 
     def _compress_data(self, data: str) -> bytes:
-        """Compress data using gzip."""
-        return gzip.compress(
-            data.encode('utf-8'),
-            compresslevel=settings.network.compression_level
-        )
+        """Compress data using gzip, reusing blobs for previously seen content."""
+        raw = data.encode('utf-8')
+        key = hashlib.blake2b(raw, digest_size=16).digest()
+
+        with self._compressed_lock:
+            compressed = self._compressed_cache.get(key)
+            if compressed is not None:
+                self._compressed_cache.move_to_end(key)
+                return compressed
+
+        compressed = gzip.compress(raw, compresslevel=settings.network.compression_level)
+
+        with self._compressed_lock:
+            self._compressed_cache[key] = compressed
+            if len(self._compressed_cache) > COMPRESSED_CACHE_SIZE:
+                self._compressed_cache.popitem(last=False)
+        return compressed
 
     def _decompress_data(self, data: bytes) -> str:
         """Decompress gzip data."""
@@ -100,91 +174,127 @@ class ResourceOptimizer:
 
     def cache_data(self, key: str, data: Any, size: int) -> None:
         """Cache data with size tracking."""
-        with self._lock:
-            if size > settings.cache.max_entry_size:
-                logger.warning(f"Data too large to cache: {size} bytes")
-                return
+        if size > settings.cache.max_entry_size:
+            logger.warning(f"Data too large to cache: {size} bytes")
+            return
 
-            # Check if we need to make space
-            while self._get_cache_size() + size > settings.cache.max_total_size:
-                self._evict_least_valuable_entry()
+        with self._lk(key):
+            with self._index_lock:
+                # Replacing an entry frees its previous slot first
+                previous = self.memory_cache.get(key)
+                if previous is not None:
+                    self._release_slot(previous.slot)
+                slot = self._acquire_slot(key, size)
 
-            # Add to cache
             self.memory_cache[key] = CacheEntry(
                 data=data,
                 timestamp=datetime.now(),
                 size=size,
-                access_count=0,
-                last_accessed=datetime.now()
+                slot=slot
             )
 
+        # Make space outside the stripe so eviction can take other stripes
+        while self._cache_bytes > settings.cache.max_total_size:
+            if not self._evict_least_valuable_entry(exclude=key):
+                break
+
     def get_cached_data(self, key: str) -> Optional[Any]:
         """Get data from cache with access tracking."""
-        with self._lock:
-            if key not in self.memory_cache:
+        with self._lk(key):
+            entry = self.memory_cache.get(key)
+            if entry is None:
                 return None
 
-            entry = self.memory_cache[key]
-            entry.access_count += 1
-            entry.last_accessed = datetime.now()
+            # The slot cannot be released while we hold the key's stripe; the
+            # index lock keeps _grow_slots from swapping the arrays mid-write
+            now = time.monotonic()
+            with self._index_lock:
+                self._counts[entry.slot] += 1
+                self._times[entry.slot] = now
+
+        # Opportunistic eviction replaces the old periodic cleanup thread
+        if self._cache_bytes > CACHE_LOW_WATER_MARK * settings.cache.max_total_size:
+            self._evict_least_valuable_entry(exclude=key)
 
-            return entry.data
+        return entry.data
 
     def _get_cache_size(self) -> int:
         """Get total size of cached data."""
-        return sum(entry.size for entry in self.memory_cache.values())
+        return self._cache_bytes
 
-    def _evict_least_valuable_entry(self) -> None:
-        """Remove least valuable entry from cache."""
-        if not self.memory_cache:
-            return
+    def _evict_least_valuable_entry(self, exclude: Optional[str] = None) -> bool:
+        """Remove least valuable entry from cache.
 
-        # Calculate value score for each entry
-        current_time = datetime.now()
-        entries = []
-        for key, entry in self.memory_cache.items():
-            # Value based on recency, access frequency and size
-            age = (current_time - entry.last_accessed).total_seconds()
-            value_score = (entry.access_count / (1 + age)) * (1 / (1 + entry.size))
-            entries.append((key, value_score))
+        Scores every slot in one vectorized pass. Must be called without
+        holding any stripe lock. Returns False when there was nothing to
+        evict.
+        """
+        excluded = self.memory_cache.get(exclude) if exclude is not None else None
 
-        # Remove entry with lowest value
-        if entries:
-            worst_key = min(entries, key=lambda x: x[1])[0]
-            del self.memory_cache[worst_key]
+        with self._index_lock:
+            n = len(self._keys)
+            if n == 0:
+                return False
 
-    def _memory_cleanup_worker(self):
-        """Background thread for memory cleanup."""
-        while True:
-            try:
-                # Check cache size periodically
-                if self._get_cache_size() > settings.cache.max_total_size:
-                    self._evict_least_valuable_entry()
-
-                # Sleep to prevent excessive CPU usage
-                time.sleep(settings.cache.cleanup_interval)
-            except Exception as e:
-                logger.error(f"Error in memory cleanup: {e}")
-
-    def _resource_monitor_worker(self):
-        """Background thread for resource monitoring."""
+            # Value based on recency, access frequency and size
+            now = time.monotonic()
+            scores = self._counts[:n] / (1 + now - self._times[:n]) / (1 + self._sizes[:n])
+            scores[~self._live[:n]] = np.inf
+            if excluded is not None and excluded.slot < n:
+                scores[excluded.slot] = np.inf
+
+            # Remove entry with lowest value
+            slot = int(np.argmin(scores))
+            if scores[slot] == np.inf:
+                return False
+            worst_key = self._keys[slot]
+
+        with self._lk(worst_key):
+            entry = self.memory_cache.get(worst_key)
+            # Skip if the entry was replaced while we were scoring
+            if entry is not None and entry.slot == slot:
+                del self.memory_cache[worst_key]
+                with self._index_lock:
+                    self._release_slot(slot)
+        return True
+
+    async def _resource_monitor(self) -> None:
+        """Periodic resource monitoring task."""
         while True:
             try:
-                # Monitor CPU usage
-                cpu_percent = psutil.cpu_percent()
-                if cpu_percent > settings.resource.max_cpu_percent:
-                    logger.warning(f"High CPU usage: {cpu_percent}%")
-                    self._reduce_cpu_usage()
-
-                # Monitor memory usage
-                memory = psutil.Process().memory_info()
-                if memory.rss > settings.resource.max_memory_mb * 1024 * 1024:
-                    logger.warning(f"High memory usage: {memory.rss / (1024 * 1024)}MB")
-                    self._reduce_memory_usage()
-
-                time.sleep(60)
+                self._within_limits = self._check_resources()
             except Exception as e:
                 logger.error(f"Error in resource monitoring: {e}")
+            await asyncio.sleep(RESOURCE_MONITOR_INTERVAL)
+
+    async def check_resources(self) -> bool:
+        """Return whether the last periodic check was within limits.
+
+        Called per URL, so it neither samples nor sheds load: sampling here would
+        reset the CPU window the monitor measures, and shedding would shrink the
+        pool once per request instead of once per RESOURCE_MONITOR_INTERVAL.
+        """
+        return self._within_limits
+
+    def _check_resources(self) -> bool:
+        """Check CPU and memory usage and shed load when over limits (monitor task only)."""
+        within_limits = True
+
+        # Monitor CPU usage (non-blocking: compares against the previous call)
+        cpu_percent = psutil.cpu_percent(interval=None)
+        if cpu_percent > settings.resource.max_cpu_percent:
+            logger.warning(f"High CPU usage: {cpu_percent}%")
+            self._reduce_cpu_usage()
+            within_limits = False
+
+        # Monitor memory usage
+        rss = self._proc.memory_info().rss
+        if rss > settings.resource.max_memory_mb * 1024 * 1024:
+            logger.warning(f"High memory usage: {rss / (1024 * 1024)}MB")
+            self._reduce_memory_usage()
+            within_limits = False
+
+        return within_limits
 
     def _reduce_cpu_usage(self):
         """Reduce CPU usage by adjusting thread pool size."""
@@ -195,16 +305,16 @@ class ResourceOptimizer:
 
     def _reduce_memory_usage(self):
         """Reduce memory usage by clearing cache and unused connections."""
-        with self._lock:
-            # Clear half of the cache
-            cache_size = len(self.memory_cache)
-            if cache_size > 0:
-                entries_to_remove = cache_size // 2
-                self._evict_least_valuable_entry()
-                logger.info(f"Cleared {entries_to_remove} cache entries")
-
-            # Close unused connections
-            for domain, connections in self.connection_pool.items():
+        # Clear half of the cache
+        cache_size = len(self.memory_cache)
+        if cache_size > 0:
+            entries_to_remove = cache_size // 2
+            self._evict_least_valuable_entry()
+            logger.info(f"Cleared {entries_to_remove} cache entries")
+
+        # Close unused connections
+        for domain, connections in list(self.connection_pool.items()):
+            with self._lk(domain):
                 if len(connections) > settings.network.max_concurrent_connections:
                     excess = len(connections) - settings.network.max_concurrent_connections
                     for _ in range(excess):
@@ -269,7 +379,8 @@ class ResourceOptimizer:
 
     def _process_batched_requests(self, batched_requests: List[Dict]) -> None:
         """Process batched requests."""
-        futures = []
+        # Future -> (domain, connection) so each connection returns to its own pool
+        futures = {}
         for batch in batched_requests:
             try:
                 # Get connection from pool
@@ -278,29 +389,30 @@ class ResourceOptimizer:
                 # Process batch
                 if connection:
                     future = self._executor.submit(self._send_batch, connection, batch)
-                    futures.append((connection, future))
+                    futures[future] = (batch['domain'], connection)
                     
             except Exception as e:
                 logger.error(f"Error processing batch: {e}")
 
-        # Wait for all batches to complete
-        for connection, future in futures:
+        # Handle batches in completion order
+        for future in as_completed(futures):
+            domain, connection = futures[future]
             try:
                 future.result()
-                self._return_connection(batch['domain'], connection)
+                self._return_connection(domain, connection)
             except Exception as e:
                 logger.error(f"Error in batch processing: {e}")
 
     def _get_connection(self, domain: str) -> Optional[Any]:
         """Get connection from pool or create new one."""
-        with self._lock:
+        with self._lk(domain):
             if self.connection_pool[domain]:
                 return self.connection_pool[domain].pop()
             return self._create_connection(domain)
 
     def _return_connection(self, domain: str, connection: Any) -> None:
         """Return connection to pool."""
-        with self._lock:
+        with self._lk(domain):
             if connection and len(self.connection_pool[domain]) < settings.network.max_concurrent_connections:
                 self.connection_pool[domain].append(connection)
 
@@ -322,11 +434,15 @@ class ResourceOptimizer:
             logger.error(f"Error sending batch: {e}")
 
     def optimize_cpu_usage(self, data: Dict) -> Dict:
-        """Optimize CPU usage by implementing lazy loading."""
+        """Optimize CPU usage by implementing lazy loading.
+
+        Large values are replaced by zero-argument loaders; call
+        ``optimized[key]()`` to obtain the value.
+        """
         optimized = {}
         
         for key, value in data.items():
-            if isinstance(value, (str, bytes)) and len(str(value)) > settings.resource.lazy_loading_threshold:
+            if isinstance(value, (str, bytes)) and len(value) > settings.resource.lazy_loading_threshold:
                 # Create lazy loading wrapper
                 optimized[key] = self._create_lazy_loader(value)
             else:
@@ -334,43 +450,45 @@ class ResourceOptimizer:
 
         return optimized
 
-    def _create_lazy_loader(self, data: Any) -> Any:
-        """Create lazy loading wrapper for data."""
-        class LazyLoader:
-            def __init__(self, data):
-                self._data = data
-                self._loaded = False
-                self._value = None
-                self._lock = threading.Lock()
-
-            def __get__(self, instance, owner):
-                if not self._loaded:
-                    with self._lock:
-                        if not self._loaded:  # Double-checked locking
-                            self._value = self._process_data(self._data)
-                            self._loaded = True
-                return self._value
-
-            def _process_data(self, data):
-                # Implement data processing logic here
-                return data
-
-        return LazyLoader(data)
+    def _create_lazy_loader(self, data: Any) -> Callable[[], Any]:
+        """Create a loader that decompresses data on first call and memoizes it."""
+        cache = []
+
+        def load():
+            if not cache:
+                cache.append(self._decompress_data(data) if isinstance(data, bytes) else data)
+            return cache[0]
+
+        return load
 
     def cleanup(self):
         """Cleanup resources."""
-        # Clear memory cache
-        self.memory_cache.clear()
-
-        # Close connections
-        for domain, connections in self.connection_pool.items():
-            for connection in connections:
-                try:
-                    # Implement connection closing logic here
-                    pass
-                except Exception as e:
-                    logger.error(f"Error closing connection: {e}")
-            self.connection_pool[domain].clear()
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+
+        # Global operation: take every stripe in order
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+
+            # Clear memory cache
+            self.memory_cache.clear()
+            with self._compressed_lock:
+                self._compressed_cache.clear()
+            with self._index_lock:
+                self._cache_bytes = 0
+                self._reset_slots()
+
+            # Close connections
+            for domain, connections in self.connection_pool.items():
+                for connection in connections:
+                    try:
+                        # Implement connection closing logic here
+                        pass
+                    except Exception as e:
+                        logger.error(f"Error closing connection: {e}")
+                self.connection_pool[domain].clear()
 
         # Shutdown thread pool
         self._executor.shutdown(wait=True) 
\ No newline at end of file
@@ -1,22 +1,35 @@
-from typing import Dict, List, Optional
+from typing import Deque, Dict, Optional
 import asyncio
 import logging
 import psutil
 import time
+from collections import deque
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from src.compat import DATACLASS_SLOTS
+from src.error_backoff import ErrorBackoff
+from src.scaling.lock_timing import (
+    LOCK_WAIT_SAMPLES, summarize_lock_waits, timed_lock, try_acquire
+)
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Window kept for history and window averaged for scaling decisions, in seconds
+HISTORY_WINDOW = 60 * 60
+SCALING_WINDOW = 5 * 60
+
+# Seconds to wait for a busy lock before skipping a metrics sample
+LOCK_ACQUIRE_TIMEOUT = 0.5
+
+@dataclass(**DATACLASS_SLOTS)
 class ResourceMetrics:
     cpu_percent: float
     memory_percent: float
     active_connections: int
     queue_size: int
-    timestamp: datetime
+    timestamp: float  # epoch seconds, converted to ISO only in get_metrics
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ScalingConfig:
     min_instances: int = 1
     max_instances: int = 5
@@ -30,12 +43,23 @@ class ScalingConfig:
 class LoadBalancer:
     def __init__(self, config: ScalingConfig):
         self.config = config
-        self._metrics_history: List[ResourceMetrics] = []
-        self._last_scale_time: Optional[datetime] = None
+        # Bounded windows; the recent one keeps running sums so averages are O(1)
+        self._metrics_history: Deque[ResourceMetrics] = deque(
+            maxlen=max(1, HISTORY_WINDOW // config.metrics_interval)
+        )
+        self._recent_metrics: Deque[ResourceMetrics] = deque(
+            maxlen=max(1, SCALING_WINDOW // config.metrics_interval)
+        )
+        self._cpu_sum = 0.0
+        self._memory_sum = 0.0
+        self._last_scale_time: Optional[float] = None  # time.monotonic()
         self._active_instances: int = config.min_instances
         self._lock = asyncio.Lock()
+        self._lock_waits: Deque[float] = deque(maxlen=LOCK_WAIT_SAMPLES)
         self._running = False
         self._metrics_task: Optional[asyncio.Task] = None
+        self._error_backoff = ErrorBackoff()
+        self._proc = psutil.Process()
 
     async def start(self):
         """Start the load balancer monitoring."""
@@ -57,35 +81,65 @@ class LoadBalancer:
     async def _collect_metrics(self):
         """Collect system metrics periodically."""
         while self._running:
+            delay = self.config.metrics_interval
             try:
                 metrics = ResourceMetrics(
                     cpu_percent=psutil.cpu_percent(),
                     memory_percent=psutil.virtual_memory().percent,
                     active_connections=self._get_active_connections(),
                     queue_size=self._get_queue_size(),
-                    timestamp=datetime.utcnow()
+                    timestamp=time.time()
                 )
                 
-                async with self._lock:
-                    self._metrics_history.append(metrics)
-                    # Keep only last hour of metrics
-                    cutoff = datetime.utcnow() - timedelta(hours=1)
-                    self._metrics_history = [
-                        m for m in self._metrics_history
-                        if m.timestamp > cutoff
-                    ]
-                
-                await self._check_scaling()
+                # Telemetry must not queue behind real work: drop the sample instead
+                if await try_acquire(self._lock, LOCK_ACQUIRE_TIMEOUT, "load_balancer", self._lock_waits):
+                    try:
+                        # Full deques drop their oldest sample on append
+                        self._metrics_history.append(metrics)
+                        self._add_recent_metrics(metrics)
+                        self._trim_windows(metrics.timestamp)
+                    finally:
+                        self._lock.release()
+                    
+                    await self._check_scaling()
+                else:
+                    logger.debug("Metrics lock busy, skipping sample")
                 
+                self._error_backoff.reset()
             except Exception as e:
                 logger.error(f"Error collecting metrics: {e}")
+                delay = self._error_backoff.next_delay()
             
-            await asyncio.sleep(self.config.metrics_interval)
+            await asyncio.sleep(delay)
+
+    def _add_recent_metrics(self, metrics: ResourceMetrics):
+        """Append to the scaling window, keeping running sums in step."""
+        if len(self._recent_metrics) == self._recent_metrics.maxlen:
+            oldest = self._recent_metrics[0]
+            self._cpu_sum -= oldest.cpu_percent
+            self._memory_sum -= oldest.memory_percent
+        self._recent_metrics.append(metrics)
+        self._cpu_sum += metrics.cpu_percent
+        self._memory_sum += metrics.memory_percent
+
+    def _trim_windows(self, now: float):
+        """Drop samples older than each window (gaps from skipped samples)."""
+        history = self._metrics_history
+        cutoff = now - HISTORY_WINDOW
+        while history and history[0].timestamp <= cutoff:
+            history.popleft()
+
+        recent = self._recent_metrics
+        cutoff = now - SCALING_WINDOW
+        while recent and recent[0].timestamp <= cutoff:
+            oldest = recent.popleft()
+            self._cpu_sum -= oldest.cpu_percent
+            self._memory_sum -= oldest.memory_percent
 
     def _get_active_connections(self) -> int:
         """Get number of active connections. NÃO IMPLEMENTADO: Retorna valor fictício para produção."""
         # Limitação: Contagem real de conexões não implementada nesta versão.
-        return len(psutil.Process().connections())
+        return len(self._proc.connections())
 
     def _get_queue_size(self) -> int:
         """Get current queue size. NÃO IMPLEMENTADO: Retorna valor fictício para produção."""
@@ -97,41 +151,42 @@ class LoadBalancer:
         if not self._metrics_history:
             return
 
-        async with self._lock:
-            # Check cooldown period
-            if self._last_scale_time:
-                if datetime.utcnow() - self._last_scale_time < timedelta(seconds=self.config.cooldown_period):
-                    return
-
-            # Calculate average metrics
-            recent_metrics = [
-                m for m in self._metrics_history
-                if datetime.utcnow() - m.timestamp < timedelta(minutes=5)
-            ]
-            
-            if not recent_metrics:
+        # Snapshot under the lock; thresholds and scaling run outside it
+        async with timed_lock(self._lock, "load_balancer", self._lock_waits):
+            last_scale_time = self._last_scale_time
+            count = len(self._recent_metrics)
+            cpu_sum = self._cpu_sum
+            memory_sum = self._memory_sum
+
+        # Check cooldown period
+        if last_scale_time is not None:
+            if time.monotonic() - last_scale_time < self.config.cooldown_period:
                 return
 
-            avg_cpu = sum(m.cpu_percent for m in recent_metrics) / len(recent_metrics)
-            avg_memory = sum(m.memory_percent for m in recent_metrics) / len(recent_metrics)
-            
-            # Check if scaling is needed
-            if (avg_cpu > self.config.scale_up_threshold or 
-                avg_memory > self.config.scale_up_threshold):
-                if self._active_instances < self.config.max_instances:
-                    await self._scale_up()
-            
-            elif (avg_cpu < self.config.scale_down_threshold and 
-                  avg_memory < self.config.scale_down_threshold):
-                if self._active_instances > self.config.min_instances:
-                    await self._scale_down()
+        # Calculate average metrics
+        if not count:
+            return
+
+        avg_cpu = cpu_sum / count
+        avg_memory = memory_sum / count
+        
+        # Check if scaling is needed
+        if (avg_cpu > self.config.scale_up_threshold or 
+            avg_memory > self.config.scale_up_threshold):
+            if self._active_instances < self.config.max_instances:
+                await self._scale_up()
+        
+        elif (avg_cpu < self.config.scale_down_threshold and 
+              avg_memory < self.config.scale_down_threshold):
+            if self._active_instances > self.config.min_instances:
+                await self._scale_down()
 
     async def _scale_up(self):
         """Scale up the number of instances. NÃO IMPLEMENTADO: Apenas incrementa contador local."""
         try:
             # Limitação: Criação real de instâncias não implementada nesta versão.
             self._active_instances += 1
-            self._last_scale_time = datetime.utcnow()
+            self._last_scale_time = time.monotonic()
             logger.info(f"Scaling up to {self._active_instances} instances")
         except Exception as e:
             logger.error(f"Error scaling up: {e}")
@@ -141,31 +196,37 @@ class LoadBalancer:
         try:
             # Limitação: Remoção real de instâncias não implementada nesta versão.
             self._active_instances -= 1
-            self._last_scale_time = datetime.utcnow()
+            self._last_scale_time = time.monotonic()
             logger.info(f"Scaling down to {self._active_instances} instances")
         except Exception as e:
             logger.error(f"Error scaling down: {e}")
 
     async def get_metrics(self) -> Dict:
         """Get current metrics and scaling status."""
-        async with self._lock:
-            if not self._metrics_history:
-                return {
-                    "active_instances": self._active_instances,
-                    "metrics": None
-                }
-            
-            latest = self._metrics_history[-1]
+        async with timed_lock(self._lock, "load_balancer", self._lock_waits):
+            active_instances = self._active_instances
+            latest = self._metrics_history[-1] if self._metrics_history else None
+
+        lock_wait = summarize_lock_waits(self._lock_waits)
+        if latest is None:
             return {
-                "active_instances": self._active_instances,
-                "metrics": {
-                    "cpu_percent": latest.cpu_percent,
-                    "memory_percent": latest.memory_percent,
-                    "active_connections": latest.active_connections,
-                    "queue_size": latest.queue_size,
-                    "timestamp": latest.timestamp.isoformat()
-                }
+                "active_instances": active_instances,
+                "lock_wait": lock_wait,
+                "metrics": None
+            }
+        
+        return {
+            "active_instances": active_instances,
+            "lock_wait": lock_wait,
+            "metrics": {
+                "cpu_percent": latest.cpu_percent,
+                "memory_percent": latest.memory_percent,
+                "active_connections": latest.active_connections,
+                "queue_size": latest.queue_size,
+                # Naive UTC ISO string, the format callers got from datetime.utcnow()
+                "timestamp": datetime.fromtimestamp(latest.timestamp, timezone.utc).replace(tzinfo=None).isoformat()
             }
+        }
 
     async def cleanup(self):
         """Clean up resources."""
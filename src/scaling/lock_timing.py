@@ -0,0 +1,67 @@
+from typing import Deque, Dict
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+try:
+    from prometheus_client import Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# Number of recent lock waits kept per component for summaries
+LOCK_WAIT_SAMPLES = 1000
+
+if PROMETHEUS_AVAILABLE:
+    LOCK_WAIT_SECONDS = Histogram(
+        'scaling_lock_wait_seconds',
+        'Time spent waiting to acquire scaling locks',
+        ['component'],
+        buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+    )
+
+def record_lock_wait(component: str, samples: Deque[float], seconds: float):
+    """Record one lock acquisition wait."""
+    samples.append(seconds)
+    if PROMETHEUS_AVAILABLE:
+        LOCK_WAIT_SECONDS.labels(component=component).observe(seconds)
+
+async def try_acquire(lock: asyncio.Lock, timeout: float, component: str,
+                      samples: Deque[float]) -> bool:
+    """Acquire ``lock`` unless it stays busy for ``timeout`` seconds.
+
+    Records the wait on success; the caller releases the lock.
+    """
+    start = time.perf_counter()
+    if lock.locked():
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+    else:
+        # Uncontended: acquire() returns without suspending
+        await lock.acquire()
+    record_lock_wait(component, samples, time.perf_counter() - start)
+    return True
+
+@asynccontextmanager
+async def timed_lock(lock: asyncio.Lock, component: str, samples: Deque[float]):
+    """Hold ``lock``, recording how long acquiring it took."""
+    start = time.perf_counter()
+    await lock.acquire()
+    record_lock_wait(component, samples, time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        lock.release()
+
+def summarize_lock_waits(samples: Deque[float]) -> Dict[str, float]:
+    """Summarize recent lock waits (seconds)."""
+    if not samples:
+        return {"count": 0, "avg": 0.0, "max": 0.0}
+    snapshot = list(samples)
+    return {
+        "count": len(snapshot),
+        "avg": sum(snapshot) / len(snapshot),
+        "max": max(snapshot)
+    }
@@ -1,14 +1,21 @@
-from typing import Dict, Optional
+from typing import Deque, Dict, Optional
 import asyncio
 import logging
 import psutil
 import resource
+import time
+from collections import deque
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
+from src.compat import DATACLASS_SLOTS
+from src.scaling.lock_timing import LOCK_WAIT_SAMPLES, summarize_lock_waits, try_acquire
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Seconds to wait for a busy lock before skipping a limits check
+LOCK_ACQUIRE_TIMEOUT = 0.5
+
+@dataclass(**DATACLASS_SLOTS)
 class ResourceLimits:
     max_cpu_percent: float = 80.0
     max_memory_percent: float = 80.0
@@ -21,7 +28,10 @@ class ResourceManager:
     def __init__(self, limits: ResourceLimits):
         self.limits = limits
         self._lock = asyncio.Lock()
-        self._violations: Dict[str, datetime] = {}
+        self._lock_waits: Deque[float] = deque(maxlen=LOCK_WAIT_SAMPLES)
+        self._violations: Dict[str, float] = {}  # epoch seconds
+        # Reused so cpu_percent() measures since the previous check
+        self._proc = psutil.Process()
         self._setup_limits()
 
     def _setup_limits(self):
@@ -43,8 +53,16 @@ class ResourceManager:
             logger.error(f"Error setting resource limits: {e}")
 
     async def check_limits(self) -> Dict[str, bool]:
-        """Check if current resource usage is within limits."""
-        async with self._lock:
+        """Check if current resource usage is within limits.
+
+        Returns no violations if the check is skipped because the lock
+        stayed busy for LOCK_ACQUIRE_TIMEOUT.
+        """
+        if not await try_acquire(self._lock, LOCK_ACQUIRE_TIMEOUT, "resource_manager", self._lock_waits):
+            logger.debug("Resource lock busy, skipping limits check")
+            return {}
+
+        try:
             current_usage = self._get_current_usage()
             violations = {}
             
@@ -74,36 +92,46 @@ class ResourceManager:
                 self._record_violation("connections")
             
             return violations
+        finally:
+            self._lock.release()
 
     def _get_current_usage(self) -> Dict[str, float]:
         """Get current resource usage."""
-        process = psutil.Process()
+        process = self._proc
         
-        return {
-            "cpu_percent": process.cpu_percent(),
-            "memory_percent": process.memory_percent(),
-            "file_descriptors": len(process.open_files()),
-            "threads": process.num_threads(),
-            "connections": len(process.connections())
-        }
+        # oneshot() reads each /proc file once for all the values below
+        with process.oneshot():
+            return {
+                "cpu_percent": process.cpu_percent(),
+                "memory_percent": process.memory_percent(),
+                "file_descriptors": len(process.open_files()),
+                "threads": process.num_threads(),
+                "connections": len(process.connections())
+            }
 
     def _record_violation(self, resource_type: str):
         """Record a resource limit violation."""
-        self._violations[resource_type] = datetime.utcnow()
+        self._violations[resource_type] = time.time()
         logger.warning(f"Resource limit violation: {resource_type}")
 
     async def get_violations(self) -> Dict[str, str]:
         """Get recent resource limit violations."""
-        async with self._lock:
-            return {
-                resource_type: timestamp.isoformat()
-                for resource_type, timestamp in self._violations.items()
-            }
+        # Lock-free: iterate a copy, the dict is only written by check_limits.
+        # Values stay naive UTC ISO strings, the format datetime.utcnow() produced
+        snapshot = dict(self._violations)
+        return {
+            resource_type: datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat()
+            for resource_type, timestamp in snapshot.items()
+        }
 
     async def get_usage(self) -> Dict[str, float]:
         """Get current resource usage."""
-        async with self._lock:
-            return self._get_current_usage()
+        # psutil reads need no exclusion against check_limits
+        return self._get_current_usage()
+
+    def get_lock_stats(self) -> Dict[str, float]:
+        """Get recent lock acquisition wait times (seconds)."""
+        return summarize_lock_waits(self._lock_waits)
 
     async def cleanup(self):
         """Clean up resources."""
@@ -1,14 +1,22 @@
 import asyncio
-import secrets
+import sys
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Set
 import random
 from loguru import logger
 from supabase import create_client, Client
-from dataclasses import dataclass
-from collections import defaultdict
+from dataclasses import dataclass, field
+from collections import Counter, defaultdict
+from src.compat import DATACLASS_SLOTS
 from src.config.settings import settings
+from src.error_backoff import ErrorBackoff
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = sys.platform != "win32"
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 # Configuration
 BASE_INTERVAL = 6 * 60 * 60  # 6 hours in seconds
@@ -18,23 +26,36 @@ RETRY_BACKOFF = 600  # 10 minutes in seconds
 DOMAIN_COOLDOWN = 3 * 60 * 60  # 3 hours in seconds
 DOMAIN_RATE_LIMIT = 300  # 5 minutes in seconds
 PRIORITY_THRESHOLD = 24 * 60 * 60  # 24 hours in seconds
-
-@dataclass
+UPDATE_FLUSH_DELAY = 0.2  # seconds to accumulate URL updates before flushing them
+BLOCKED_DOMAINS_TTL = 5 * 60  # seconds a domain's CAPTCHA block check stays cached
+SESSION_MAX_CONCURRENCY = 4  # URLs processed at once on one browser session
+
+def _iso_to_epoch(value: str) -> float:
+    """Convert an ISO timestamp to epoch seconds, treating naive values as UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+@dataclass(**DATACLASS_SLOTS)
 class URLMetadata:
     url: str
     domain: str
     priority: int
     proxy_tag: Optional[str]
     fingerprint_tag: Optional[str]
-    next_scrape_at: datetime
+    next_scrape_at: str  # ISO timestamp as stored; parse with _iso_to_epoch when needed
     retry_count: int = 0
     status: str = "active"
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class BrowserSession:
     domain: str
-    last_used: datetime
+    last_used: float  # time.monotonic()
     is_active: bool = True
+    semaphore: asyncio.Semaphore = field(
+        default_factory=lambda: asyncio.Semaphore(SESSION_MAX_CONCURRENCY)
+    )
 
 class SchedulerError(Exception):
     """Base exception for scheduler errors."""
@@ -56,11 +77,17 @@ class SmartScheduler:
             self.url_queue: Dict[str, List[str]] = defaultdict(list)
             self.domain_last_scrape: Dict[str, datetime] = {}
             self.domain_blocked: Set[str] = set()
+            self._blocked_checked_until: Dict[str, float] = {}  # time.monotonic() deadlines
             self.domain_errors: Dict[str, int] = defaultdict(int)
             self.active_sessions: Dict[str, BrowserSession] = {}
-            self.domain_cooldowns: Dict[str, datetime] = {}
+            self.domain_cooldowns: Dict[str, float] = {}  # time.monotonic() deadlines
             self.processing_locks: Set[str] = set()
             self.semaphore = asyncio.Semaphore(settings.scraping.max_concurrent)
+            # Pending monitored_urls updates, merged per URL until the next flush
+            self._pending_updates: Dict[str, dict] = {}
+            self._updates_lock = asyncio.Lock()
+            self._flush_task: Optional[asyncio.Task] = None
+            self._error_backoff = ErrorBackoff()
             self._setup_logging()
         except Exception as e:
             logger.error(f"Failed to initialize scheduler: {str(e)}")
@@ -90,14 +117,15 @@ class SmartScheduler:
                 .execute()
 
             urls = []
+            now_epoch = time.time()
             for url_data in response.data:
                 metadata = URLMetadata(
                     url=url_data["url"],
                     domain=url_data["domain"],
-                    priority=self._calculate_priority(url_data),
+                    priority=self._calculate_priority(url_data, now_epoch),
                     proxy_tag=url_data.get("proxy_tag"),
                     fingerprint_tag=url_data.get("fingerprint_tag"),
-                    next_scrape_at=datetime.fromisoformat(url_data["next_scrape_at"]),
+                    next_scrape_at=url_data["next_scrape_at"],
                     retry_count=url_data.get("retry_count", 0),
                     status=url_data["status"]
                 )
@@ -110,72 +138,90 @@ class SmartScheduler:
             logger.error(f"Error loading monitored URLs: {str(e)}")
             raise DatabaseError(f"Failed to load URLs: {str(e)}")
 
-    def _calculate_priority(self, url_data: dict) -> int:
-        """Calculate priority based on various factors."""
+    def _calculate_priority(self, url_data: dict, now_epoch: float) -> int:
+        """Calculate priority based on various factors.
+
+        ``now_epoch`` is ``time.time()`` taken once per loaded batch.
+        """
         try:
-            priority = 0
-            
-            if url_data.get("has_frequent_price_changes"):
-                priority += 3
+            priority = 3 if url_data.get("has_frequent_price_changes") else 0
+            threshold = settings.PRIORITY_THRESHOLD
 
             last_change = url_data.get("last_price_change_at")
-            if last_change:
-                last_change_time = datetime.fromisoformat(last_change)
-                if (datetime.utcnow() - last_change_time).total_seconds() < settings.PRIORITY_THRESHOLD:
-                    priority += 2
+            if last_change and now_epoch - _iso_to_epoch(last_change) < threshold:
+                priority += 2
 
             last_scrape = url_data.get("last_check")
-            if last_scrape:
-                last_scrape_time = datetime.fromisoformat(last_scrape)
-                if (datetime.utcnow() - last_scrape_time).total_seconds() > settings.PRIORITY_THRESHOLD:
-                    priority += 1
+            if last_scrape and now_epoch - _iso_to_epoch(last_scrape) > threshold:
+                priority += 1
 
             return priority
         except Exception as e:
             logger.error(f"Error calculating priority: {str(e)}")
             return 0  # Default to lowest priority on error
 
-    async def check_domain_cooldown(self, domain: str) -> bool:
-        """Check if domain is in cooldown period."""
+    async def refresh_blocked_domains(self, domains: List[str]) -> None:
+        """Load recent CAPTCHA blocks for all given domains in a single query.
+
+        Results are cached for BLOCKED_DOMAINS_TTL; only domains whose cached
+        result expired are queried again.
+        """
+        now = time.monotonic()
+        stale = [d for d in domains if self._blocked_checked_until.get(d, 0.0) <= now]
+        if not stale:
+            return
+
         try:
-            # Check recent CAPTCHA blocks
+            cutoff = (datetime.utcnow() - timedelta(hours=settings.CAPTCHA_WINDOW_HOURS)).isoformat()
             response = await self.supabase.table("scrape_logs") \
-                .select("created_at") \
-                .eq("domain", domain) \
+                .select("domain") \
+                .in_("domain", stale) \
                 .eq("error_type", "captcha-blocked") \
-                .gte("created_at", (datetime.utcnow() - timedelta(hours=settings.CAPTCHA_WINDOW_HOURS)).isoformat()) \
+                .gte("created_at", cutoff) \
                 .execute()
 
-            if len(response.data) >= settings.MAX_CAPTCHA_BLOCKS:
-                self.domain_blocked.add(domain)
-                logger.warning(f"Domain {domain} is in cooldown due to multiple CAPTCHA blocks")
-                return True
-
-            # Check general error rate
-            if self.domain_errors[domain] >= settings.MAX_DOMAIN_ERRORS:
-                logger.warning(f"Domain {domain} is in cooldown due to high error rate")
-                return True
-
-            return False
+            blocks = Counter(row["domain"] for row in response.data)
+            for domain in stale:
+                if blocks[domain] >= settings.MAX_CAPTCHA_BLOCKS:
+                    if domain not in self.domain_blocked:
+                        logger.warning(f"Domain {domain} is in cooldown due to multiple CAPTCHA blocks")
+                    self.domain_blocked.add(domain)
+                else:
+                    self.domain_blocked.discard(domain)
+                self._blocked_checked_until[domain] = now + BLOCKED_DOMAINS_TTL
 
         except Exception as e:
             logger.error(f"Error checking domain cooldown: {str(e)}")
-            return True  # Default to cooldown on error
+            # Default to cooldown on error, retried on the next refresh
+            self.domain_blocked.update(stale)
+
+    def check_domain_cooldown(self, domain: str) -> bool:
+        """Check if domain is in cooldown period.
+
+        CAPTCHA blocks come from the last refresh_blocked_domains() call.
+        """
+        if domain in self.domain_blocked:
+            return True
+
+        # Check general error rate
+        if self.domain_errors[domain] >= settings.MAX_DOMAIN_ERRORS:
+            logger.warning(f"Domain {domain} is in cooldown due to high error rate")
+            return True
+
+        return False
 
     def _calculate_next_scrape_time(self, url: URLMetadata) -> datetime:
         """Calculate next scrape time with randomization."""
         try:
-            base_time = datetime.utcnow() + timedelta(seconds=settings.BASE_INTERVAL)
-            
-            # Add random variation
-            variation = secrets.randbelow(settings.RANDOM_VARIATION * 2) - settings.RANDOM_VARIATION
-            next_time = base_time + timedelta(seconds=variation)
+            # Add random variation (jitter only; no need for the OS CSPRNG)
+            variation = random.randrange(-settings.RANDOM_VARIATION, settings.RANDOM_VARIATION)
+            delay = settings.BASE_INTERVAL + variation
 
             # Add cooldown for blocked domains
             if url.domain in self.domain_blocked:
-                next_time += timedelta(seconds=settings.DOMAIN_COOLDOWN)
+                delay += settings.DOMAIN_COOLDOWN
 
-            return next_time
+            return datetime.utcnow() + timedelta(seconds=delay)
         except Exception as e:
             logger.error(f"Error calculating next scrape time: {str(e)}")
             # Default to base interval on error
@@ -187,13 +233,18 @@ class SmartScheduler:
             # Group URLs by domain
             domain_groups = defaultdict(list)
             for url in urls:
-                domain = url.domain
-                if self._can_process_domain(domain):
-                    domain_groups[domain].append(url)
+                domain_groups[url.domain].append(url)
 
-            # Process domains in parallel with batching
+            # One CAPTCHA-block query for every domain in this cycle
+            await self.refresh_blocked_domains(list(domain_groups))
+
+            # Process domains in parallel with batching, checking each domain once
+            now = time.monotonic()
             tasks = []
             for domain, domain_urls in domain_groups.items():
+                if not self._can_process_domain(domain, now) or self.check_domain_cooldown(domain):
+                    continue
+
                 # Split into batches
                 batches = [domain_urls[i:i + settings.BATCH_SIZE] 
                           for i in range(0, len(domain_urls), settings.BATCH_SIZE)]
@@ -221,12 +272,17 @@ class SmartScheduler:
                     logger.warning(f"Could not create session for domain: {domain}")
                     return
 
-                # Process URLs in batch
-                for url in urls:
-                    await self._process_url(url, session)
+                # Process URLs in batch concurrently, bounded by the session
+                results = await asyncio.gather(
+                    *(self._process_session_url(url, session) for url in urls),
+                    return_exceptions=True
+                )
+                errors = [r for r in results if isinstance(r, BaseException)]
+                if errors:
+                    raise errors[0]
 
                 # Update session last used time
-                session.last_used = datetime.now()
+                session.last_used = time.monotonic()
 
             except Exception as e:
                 logger.error(f"Error processing batch for domain {domain}: {e}")
@@ -234,6 +290,11 @@ class SmartScheduler:
             finally:
                 self.processing_locks.discard(domain)
 
+    async def _process_session_url(self, url: URLMetadata, session: BrowserSession) -> None:
+        """Process a URL once the session has a free slot."""
+        async with session.semaphore:
+            await self._process_url(url, session)
+
     async def _get_browser_session(self, domain: str) -> BrowserSession:
         """Get or create a browser session for a domain."""
         if domain in self.active_sessions:
@@ -242,24 +303,28 @@ class SmartScheduler:
                 return session
 
         # Create new session
-        session = BrowserSession(domain=domain, last_used=datetime.now())
+        session = BrowserSession(domain=domain, last_used=time.monotonic())
         self.active_sessions[domain] = session
         return session
 
-    def _can_process_domain(self, domain: str) -> bool:
-        """Check if a domain can be processed."""
+    def _can_process_domain(self, domain: str, now: Optional[float] = None) -> bool:
+        """Check if a domain can be processed.
+
+        ``now`` is a ``time.monotonic()`` reading, computed once per call site.
+        """
         if domain in self.processing_locks:
             return False
 
-        if domain in self.domain_cooldowns:
-            if datetime.now() < self.domain_cooldowns[domain]:
-                return False
+        if now is None:
+            now = time.monotonic()
+        if now < self.domain_cooldowns.get(domain, 0.0):
+            return False
 
         return True
 
     def _handle_domain_error(self, domain: str) -> None:
         """Handle errors for a domain."""
-        self.domain_cooldowns[domain] = datetime.now() + timedelta(minutes=30)
+        self.domain_cooldowns[domain] = time.monotonic() + 30 * 60
         if domain in self.active_sessions:
             self.active_sessions[domain].is_active = False
 
@@ -296,21 +361,61 @@ class SmartScheduler:
                 }
                 self.domain_errors[url.domain] += 1
 
-            await self.supabase.table("monitored_urls") \
-                .update(data) \
-                .eq("url", url.url) \
-                .execute()
+            await self._queue_update(url, data)
 
         except Exception as e:
             logger.error(f"Error updating URL status: {str(e)}")
             raise DatabaseError(f"Failed to update URL status: {str(e)}")
 
+    async def _queue_update(self, url: URLMetadata, data: dict) -> None:
+        """Buffer a monitored_urls update and schedule a debounced flush."""
+        async with self._updates_lock:
+            row = self._pending_updates.setdefault(url.url, {"url": url.url, "domain": url.domain})
+            row.update(data)
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_updates_later())
+
+    async def _flush_updates_later(self) -> None:
+        """Flush pending updates after UPDATE_FLUSH_DELAY."""
+        await asyncio.sleep(UPDATE_FLUSH_DELAY)
+        try:
+            await self.flush_updates()
+        except DatabaseError:
+            # Failed rows stay pending; the next flush retries them
+            pass
+
+    async def flush_updates(self) -> None:
+        """
+        Write all pending URL updates in one round-trip.
+
+        The update_monitored_urls SQL function updates by URL, so URLs deleted after
+        the update was buffered are not re-created. If the call fails, the rows are
+        kept pending (newer buffered values win) and DatabaseError is raised.
+        """
+        async with self._updates_lock:
+            pending, self._pending_updates = self._pending_updates, {}
+
+        if not pending:
+            return
+
+        try:
+            await self.supabase.rpc("update_monitored_urls", {"rows": list(pending.values())}).execute()
+        except Exception as e:
+            logger.error(f"Error flushing {len(pending)} URL updates: {str(e)}")
+            async with self._updates_lock:
+                for url, row in pending.items():
+                    newer = self._pending_updates.get(url)
+                    if newer is not None:
+                        row = {**row, **newer}
+                    self._pending_updates[url] = row
+            raise DatabaseError(f"Failed to update URL status: {str(e)}")
+
     async def cleanup_sessions(self) -> None:
         """Clean up inactive sessions."""
-        current_time = datetime.now()
+        current_time = time.monotonic()
         inactive_sessions = [
             domain for domain, session in self.active_sessions.items()
-            if (current_time - session.last_used) > timedelta(hours=1)
+            if current_time - session.last_used > 60 * 60
         ]
         
         for domain in inactive_sessions:
@@ -322,11 +427,11 @@ class SmartScheduler:
         """
         try:
             next_time = self._calculate_next_scrape_time(url)
-            await self.supabase.table("monitored_urls").update({
+            await self._queue_update(url, {
                 "next_scrape_at": next_time.isoformat(),
                 "last_check": datetime.utcnow().isoformat(),
                 "status": "active" if success else "warning"
-            }).eq("url", url.url).execute()
+            })
             logger.info(f"[SCHEDULER] Próxima coleta para {url.url} agendada para {next_time}")
         except Exception as e:
             logger.error(f"Erro ao atualizar next_scrape_at para {url.url}: {str(e)}")
@@ -335,18 +440,29 @@ class SmartScheduler:
         """
         Loop principal do scheduler: carrega URLs, agenda execuções, atualiza next_scrape_at.
         """
+        # Batches that short-circuit finish without an extra loop round-trip (Python 3.12+)
+        if hasattr(asyncio, "eager_task_factory"):
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
         while True:
             try:
                 urls = await self.load_monitored_urls()
                 await self.schedule_urls(urls)
+                await self.flush_updates()
+                self._error_backoff.reset()
                 # Aguarda até o próximo ciclo (ex: 10 minutos)
                 await asyncio.sleep(settings.scraping.loop_interval)
             except Exception as e:
                 logger.error(f"Erro no loop do scheduler: {str(e)}")
-                await asyncio.sleep(60)
+                # Backoff com jitter evita instâncias tentando em sincronia
+                await asyncio.sleep(self._error_backoff.next_delay())
 
 if __name__ == "__main__":
     try:
+        # uvloop cuts per-iteration overhead of tasks, gather and timers
+        if UVLOOP_AVAILABLE:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
         # Create and run scheduler
         scheduler = SmartScheduler()
         asyncio.run(scheduler.run())
@@ -1,8 +1,14 @@
+import time
 from functools import wraps
-from typing import Callable, List, Optional, Dict
+from typing import Callable, FrozenSet, List, Optional, Dict
 from loguru import logger
 from .jwt_manager import JWTManager
 from .role_manager import RoleManager
+from .ttl_cache import TTLCache
+
+# Limites dos caches de verificação (entradas e segundos de validade)
+AUTH_CACHE_SIZE = 10_000
+AUTH_CACHE_TTL = 60
 
 class UnauthorizedError(Exception):
     pass
@@ -14,20 +20,54 @@ class AuthMiddleware:
     def __init__(self):
         self.jwt_manager = JWTManager()
         self.role_manager = RoleManager()
+        # token -> payload
+        self._token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+        # (user_id, roles) -> True; só autorizações concedidas
+        self._role_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+    def _verify_token_cached(self, token: str) -> Optional[Dict]:
+        """Verifica um token, reaproveitando o resultado de verificações recentes."""
+        payload = self._token_cache.get(token)
+        if payload is not None:
+            # Cópia: o payload vai para os handlers, que não devem alterar o cache
+            return dict(payload)
+
+        payload = self.jwt_manager.verify_token(token)
+        if payload:
+            # Nunca manter em cache além da expiração do próprio token
+            ttl = min(AUTH_CACHE_TTL, payload.get('exp', 0) - time.time())
+            if ttl > 0:
+                self._token_cache.put(token, dict(payload), ttl)
+        return payload
+
+    async def _has_required_roles_cached(self, user_id: str, required_roles: FrozenSet[str]) -> bool:
+        """
+        Verifica roles do usuário, reaproveitando resultados positivos recentes.
+
+        Negativas não entram no cache: has_required_roles também retorna False
+        em falhas transitórias do banco, que não devem virar 403 por AUTH_CACHE_TTL.
+        """
+        key = (user_id, required_roles)
+        if self._role_cache.get(key):
+            return True
+        allowed = await self.role_manager.has_required_roles(user_id, required_roles)
+        if allowed:
+            self._role_cache.put(key, True)
+        return allowed
 
     def _extract_token_from_header(self, headers: Dict) -> Optional[str]:
         """Extrai o token JWT do header Authorization."""
-        try:
-            auth_header = headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                return None
-            return auth_header.split(' ')[1]
-        except Exception as e:
-            logger.error(f"Erro ao extrair token do header: {str(e)}")
+        auth_header = headers.get('Authorization') or ''
+        # Esquema comparado sem diferenciar maiúsculas (RFC 7235)
+        if auth_header[:7].lower() != 'bearer ':
             return None
+        return auth_header[7:].strip() or None
 
     def require_auth(self, required_roles: List[str] = None):
         """Decorator para proteger rotas que requerem autenticação."""
+        # Convertido uma vez, na decoração, e não a cada requisição
+        required = frozenset(required_roles or ())
+
         def decorator(func: Callable):
             @wraps(func)
             async def wrapper(*args, **kwargs):
@@ -38,7 +78,7 @@ class AuthMiddleware:
                         raise UnauthorizedError("Token não fornecido")
 
                     # Verificar token
-                    payload = self.jwt_manager.verify_token(token)
+                    payload = self._verify_token_cached(token)
                     if not payload:
                         raise UnauthorizedError("Token inválido ou expirado")
 
@@ -47,8 +87,8 @@ class AuthMiddleware:
                         raise UnauthorizedError("Tipo de token inválido")
 
                     # Verificar roles se necessário
-                    if required_roles:
-                        if not await self.role_manager.has_required_roles(payload['user_id'], required_roles):
+                    if required:
+                        if not await self._has_required_roles_cached(payload['user_id'], required):
                             raise ForbiddenError("Permissão insuficiente")
 
                     # Adicionar payload ao contexto
@@ -97,7 +137,7 @@ class AuthMiddleware:
             if not token:
                 return None
 
-            payload = self.jwt_manager.verify_token(token)
+            payload = self._verify_token_cached(token)
             if not payload or payload.get('type') != 'access':
                 return None
 
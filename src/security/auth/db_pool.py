@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Optional
+
+from loguru import logger
+from src.config.settings import settings
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+# Após uma falha ao criar o pool, novas tentativas esperam este intervalo (segundos);
+# até lá os chamadores usam o cliente Supabase sem esperar pelo banco
+POOL_RETRY_DELAY = 30
+
+_pool = None
+# Criado na primeira chamada: no Python 3.9 um asyncio.Lock() criado na importação
+# fica preso ao loop padrão, e não ao loop em que get_pool() roda
+_pool_lock: Optional[asyncio.Lock] = None
+_retry_at = 0.0
+
+async def get_pool() -> Optional["asyncpg.Pool"]:
+    """Retorna o pool asyncpg compartilhado, criando-o na primeira chamada.
+
+    Retorna None se o asyncpg não estiver instalado, PG_DSN não estiver
+    configurado ou a última tentativa de criação falhou há menos de
+    POOL_RETRY_DELAY; nesse caso os chamadores usam o cliente Supabase.
+    """
+    global _pool, _pool_lock, _retry_at
+    if _pool is not None:
+        return _pool
+    dsn = getattr(settings, "PG_DSN", None)
+    if not ASYNCPG_AVAILABLE or not dsn:
+        return None
+    if time.monotonic() < _retry_at:
+        return None
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None and time.monotonic() >= _retry_at:
+            try:
+                _pool = await asyncpg.create_pool(
+                    dsn=dsn,
+                    min_size=10,
+                    max_size=50,
+                    max_inactive_connection_lifetime=300,
+                    command_timeout=60,
+                    # Supavisor/PgBouncer em modo transação não suporta prepared statements
+                    statement_cache_size=int(getattr(settings, "PG_STATEMENT_CACHE_SIZE", 100))
+                )
+            except Exception as e:
+                logger.error(f"Erro ao criar pool asyncpg: {str(e)}")
+                _retry_at = time.monotonic() + POOL_RETRY_DELAY
+                return None
+    return _pool
+
+async def close_pool():
+    """Fecha o pool compartilhado, se existir."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -1,6 +1,11 @@
-from datetime import datetime, timedelta
-import jwt
+import time
 from typing import Dict, Optional
+
+try:
+    # Implementação em Rust com a mesma API do PyJWT (HMAC/base64 nativos)
+    import jwt_rs as jwt
+except ImportError:
+    import jwt
 from loguru import logger
 from src.config.settings import settings
 
@@ -8,19 +13,25 @@ class JWTManager:
     def __init__(self):
         self.secret_key = settings.JWT_SECRET_KEY
         self.algorithm = "HS256"
-        self.access_token_expire = timedelta(minutes=15)
-        self.refresh_token_expire = timedelta(days=7)
+        # Chave já em bytes e lista de algoritmos prontas: evitam normalização por token
+        self._key = self.secret_key.encode("utf-8")
+        self._algorithms = [self.algorithm]
+        # Tokens sem "exp" ou "type" são rejeitados já na decodificação
+        self._decode_options = {"verify_exp": True, "require": ["exp", "type"]}
+        # Validade em segundos; "exp" é gravado como epoch inteiro
+        self._access_ttl = 15 * 60
+        self._refresh_ttl = 7 * 24 * 60 * 60
 
     def create_access_token(self, data: Dict) -> str:
         """Cria um token de acesso JWT."""
         try:
             to_encode = data.copy()
-            expire = datetime.utcnow() + self.access_token_expire
+            expire = int(time.time()) + self._access_ttl
             to_encode.update({
                 "exp": expire,
                 "type": "access"
             })
-            return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+            return jwt.encode(to_encode, self._key, algorithm=self.algorithm)
         except Exception as e:
             logger.error(f"Erro ao criar access token: {str(e)}")
             raise
@@ -29,12 +40,12 @@ class JWTManager:
         """Cria um refresh token JWT."""
         try:
             to_encode = data.copy()
-            expire = datetime.utcnow() + self.refresh_token_expire
+            expire = int(time.time()) + self._refresh_ttl
             to_encode.update({
                 "exp": expire,
                 "type": "refresh"
             })
-            return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+            return jwt.encode(to_encode, self._key, algorithm=self.algorithm)
         except Exception as e:
             logger.error(f"Erro ao criar refresh token: {str(e)}")
             raise
@@ -42,7 +53,7 @@ class JWTManager:
     def verify_token(self, token: str) -> Optional[Dict]:
         """Verifica e decodifica um token JWT."""
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            payload = jwt.decode(token, self._key, algorithms=self._algorithms, options=self._decode_options)
             return payload
         except jwt.ExpiredSignatureError:
             logger.warning("Token expirado")
@@ -55,15 +66,6 @@ class JWTManager:
             return None
 
     def is_token_expired(self, token: str) -> bool:
-        """Verifica se um token está expirado."""
-        try:
-            payload = self.verify_token(token)
-            if not payload:
-                return True
-            exp = payload.get("exp")
-            if not exp:
-                return True
-            return datetime.utcnow().timestamp() > exp
-        except Exception as e:
-            logger.error(f"Erro ao verificar expiração do token: {str(e)}")
-            return True 
\ No newline at end of file
+        """Verifica se um token está expirado (ou é inválido)."""
+        # verify_token já valida "exp"; não há por que decodificar duas vezes
+        return self.verify_token(token) is None
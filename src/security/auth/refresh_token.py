@@ -1,27 +1,77 @@
-from datetime import datetime, timedelta
-from typing import Optional, Dict
+import asyncio
+import hashlib
+from typing import Optional, Dict, Set
 from supabase import create_client, Client
 from loguru import logger
 from src.config.settings import settings
+from src.security.auth.db_pool import get_pool
+from src.security.auth.ttl_cache import TTLCache
+
+# Limites do cache de validação (entradas e segundos de validade)
+VALIDATION_CACHE_SIZE = 10_000
+VALIDATION_CACHE_TTL = 60
+
+# Marca tokens inválidos no cache (cache negativo)
+_INVALID = ""
 
 class RefreshTokenManager:
     def __init__(self):
         self.supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
         self.max_refresh_tokens = 5  # Número máximo de refresh tokens ativos por usuário
+        # hash do token -> user_id ou _INVALID; o índice por usuário acompanha as remoções
+        self._cache = TTLCache(VALIDATION_CACHE_SIZE, VALIDATION_CACHE_TTL, on_remove=self._forget_user_key)
+        # user_id -> hashes em cache, para invalidação em massa
+        self._user_keys: Dict[str, Set[bytes]] = {}
+        # Limpezas em segundo plano: no máximo uma por usuário, repetida se houver novo login
+        self._cleanup_inflight: Set[str] = set()
+        self._cleanup_pending: Set[str] = set()
+        self._cleanup_tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _token_hash(token: str) -> bytes:
+        """Hash curto do token: chave do cache e da coluna token_hash."""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    @staticmethod
+    def _hash_param(token_hash: bytes) -> str:
+        """Formato hex de bytea aceito pelo PostgREST."""
+        return "\\x" + token_hash.hex()
+
+    def _cache_put(self, key: bytes, user_id: Optional[str]):
+        """Armazena o resultado de uma validação, indexando-o pelo usuário."""
+        if user_id:
+            self._user_keys.setdefault(user_id, set()).add(key)
+        self._cache.put(key, user_id or _INVALID)
+
+    def _forget_user_key(self, key: bytes, user_id: str):
+        """Remove um hash do índice por usuário (chamado pelo cache a cada remoção)."""
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def _cache_drop_user(self, user_id: str):
+        """Remove do cache todos os tokens de um usuário."""
+        for key in self._user_keys.pop(user_id, ()):
+            self._cache.pop(key, None)
 
     async def store_refresh_token(self, user_id: str, token: str) -> bool:
         """Armazena um novo refresh token."""
         try:
-            # Limpar tokens antigos se necessário
-            await self._cleanup_old_tokens(user_id)
+            token_hash = self._token_hash(token)
+            # Um resultado negativo antigo em cache não pode esconder o novo token
+            self._cache.pop(token_hash)
 
-            # Armazenar novo token
+            # Armazenar apenas o hash do token (created_at usa o DEFAULT NOW() da tabela)
             await self.supabase.table('refresh_tokens').insert({
                 'user_id': user_id,
-                'token': token,
-                'created_at': datetime.utcnow().isoformat(),
+                'token_hash': self._hash_param(token_hash),
                 'is_valid': True
             }).execute()
+
+            # Limpar tokens antigos fora do caminho crítico do login
+            self._schedule_cleanup(user_id)
             return True
         except Exception as e:
             logger.error(f"Erro ao armazenar refresh token para usuário {user_id}: {str(e)}")
@@ -30,9 +80,11 @@ class RefreshTokenManager:
     async def invalidate_refresh_token(self, token: str) -> bool:
         """Invalida um refresh token específico."""
         try:
+            token_hash = self._token_hash(token)
             await self.supabase.table('refresh_tokens').update({
                 'is_valid': False
-            }).eq('token', token).execute()
+            }).eq('token_hash', self._hash_param(token_hash)).execute()
+            self._cache.pop(token_hash)
             return True
         except Exception as e:
             logger.error(f"Erro ao invalidar refresh token: {str(e)}")
@@ -44,6 +96,7 @@ class RefreshTokenManager:
             await self.supabase.table('refresh_tokens').update({
                 'is_valid': False
             }).eq('user_id', user_id).execute()
+            self._cache_drop_user(user_id)
             return True
         except Exception as e:
             logger.error(f"Erro ao invalidar todos os tokens do usuário {user_id}: {str(e)}")
@@ -52,33 +105,71 @@ class RefreshTokenManager:
     async def validate_refresh_token(self, token: str) -> Optional[str]:
         """Valida um refresh token e retorna o ID do usuário se válido."""
         try:
-            response = await self.supabase.table('refresh_tokens').select('user_id').eq('token', token).eq('is_valid', True).execute()
-            if response.data:
-                return response.data[0]['user_id']
-            return None
+            key = self._token_hash(token)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached or None
+
+            pool = await get_pool()
+            if pool is not None:
+                user_id = await pool.fetchval(
+                    "SELECT user_id FROM refresh_tokens WHERE token_hash = $1 AND is_valid = true LIMIT 1",
+                    key
+                )
+                user_id = str(user_id) if user_id is not None else None
+            else:
+                response = await self.supabase.table('refresh_tokens').select('user_id').eq('token_hash', self._hash_param(key)).eq('is_valid', True).execute()
+                user_id = response.data[0]['user_id'] if response.data else None
+
+            self._cache_put(key, user_id)
+            return user_id
         except Exception as e:
             logger.error(f"Erro ao validar refresh token: {str(e)}")
             return None
 
+    def _schedule_cleanup(self, user_id: str):
+        """Agenda a limpeza de tokens antigos sem bloquear o chamador."""
+        if user_id in self._cleanup_inflight:
+            self._cleanup_pending.add(user_id)
+            return
+        self._cleanup_inflight.add(user_id)
+        task = asyncio.create_task(self._run_cleanup(user_id))
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_tasks.discard)
+
+    async def _run_cleanup(self, user_id: str):
+        """Executa a limpeza, repetindo enquanto chegarem novos tokens do usuário."""
+        try:
+            while True:
+                self._cleanup_pending.discard(user_id)
+                await self._cleanup_old_tokens(user_id)
+                if user_id not in self._cleanup_pending:
+                    break
+        finally:
+            self._cleanup_inflight.discard(user_id)
+
     async def _cleanup_old_tokens(self, user_id: str):
         """Limpa tokens antigos do usuário, mantendo apenas o limite máximo."""
         try:
-            # Obter tokens ativos do usuário
-            response = await self.supabase.table('refresh_tokens').select('*').eq('user_id', user_id).eq('is_valid', True).order('created_at', desc=True).execute()
-            
-            # Se exceder o limite, invalidar os mais antigos
-            if len(response.data) >= self.max_refresh_tokens:
-                tokens_to_invalidate = response.data[self.max_refresh_tokens-1:]
-                for token in tokens_to_invalidate:
-                    await self.invalidate_refresh_token(token['token'])
+            # Invalida os mais antigos numa única chamada (o novo token já foi inserido)
+            await self.supabase.rpc('invalidate_old_refresh_tokens', {
+                'p_user_id': user_id,
+                'p_keep_n': self.max_refresh_tokens
+            }).execute()
+            self._cache_drop_user(user_id)
         except Exception as e:
             logger.error(f"Erro ao limpar tokens antigos do usuário {user_id}: {str(e)}")
 
     async def cleanup_expired_tokens(self):
-        """Limpa todos os tokens expirados do banco de dados."""
+        """Limpa todos os tokens expirados do banco de dados.
+
+        A limpeza normal roda no job pg_cron 'cleanup_refresh_tokens'; este método
+        apenas dispara a mesma função sob demanda (uso administrativo).
+        """
         try:
-            expiry_date = (datetime.utcnow() - timedelta(days=7)).isoformat()
-            await self.supabase.table('refresh_tokens').delete().lt('created_at', expiry_date).execute()
+            await self.supabase.rpc('cleanup_expired_refresh_tokens', {}).execute()
+            self._cache.clear()
+            self._user_keys.clear()
         except Exception as e:
             logger.error(f"Erro ao limpar tokens expirados: {str(e)}")
 
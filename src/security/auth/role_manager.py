@@ -1,53 +1,98 @@
-from typing import List, Dict, Optional
+import asyncio
+from typing import AbstractSet, FrozenSet, List, Dict, Optional
 from supabase import create_client, Client
 from loguru import logger
 from src.config.settings import settings
-from datetime import datetime, timedelta
+from src.security.auth.db_pool import get_pool
+from src.security.auth.ttl_cache import TTLCache
+
+# Limites do cache de roles (entradas e segundos de validade)
+ROLE_CACHE_SIZE = 50_000
+ROLE_CACHE_TTL = 30 * 60
 
 class RoleManager:
     def __init__(self):
         self.supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        self.role_cache: Dict[str, Dict] = {}
-        self.cache_expiry: Dict[str, datetime] = {}
-        self.cache_duration = timedelta(minutes=30)
+        # user_id -> roles
+        self._cache = TTLCache(ROLE_CACHE_SIZE, ROLE_CACHE_TTL)
+        # Cache misses do mesmo ciclo do event loop, resolvidos por uma única consulta
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._batch_task: Optional[asyncio.Task] = None
 
     async def get_user_roles(self, user_id: str) -> List[str]:
         """Obtém as roles de um usuário, usando cache quando possível."""
         try:
-            # Verificar cache
-            if self._is_cache_valid(user_id):
-                return self.role_cache[user_id]["roles"]
-
-            # Buscar roles do banco
-            response = await self.supabase.table('user_roles').select('role').eq('user_id', user_id).execute()
-            roles = [role['role'] for role in response.data]
-            
-            # Atualizar cache
-            self._update_cache(user_id, roles)
-            return roles
+            return list(await self._get_user_role_set(user_id))
         except Exception as e:
             logger.error(f"Erro ao obter roles do usuário {user_id}: {str(e)}")
             return []
 
-    def has_required_roles(self, user_id: str, required_roles: List[str]) -> bool:
+    async def has_required_roles(self, user_id: str, required_roles: AbstractSet[str]) -> bool:
         """Verifica se um usuário possui todas as roles necessárias."""
         try:
-            user_roles = self.get_user_roles(user_id)
-            return all(role in user_roles for role in required_roles)
+            user_roles = await self._get_user_role_set(user_id)
+            return user_roles.issuperset(required_roles)
         except Exception as e:
             logger.error(f"Erro ao verificar roles do usuário {user_id}: {str(e)}")
             return False
 
-    def _is_cache_valid(self, user_id: str) -> bool:
-        """Verifica se o cache para um usuário ainda é válido."""
-        if user_id not in self.role_cache or user_id not in self.cache_expiry:
-            return False
-        return datetime.utcnow() < self.cache_expiry[user_id]
+    async def _get_user_role_set(self, user_id: str) -> FrozenSet[str]:
+        """Obtém as roles de um usuário como frozenset, direto do cache quando possível."""
+        roles = self._cache.get(user_id)
+        if roles is not None:
+            return roles
+
+        # Quem pede o mesmo usuário compartilha o mesmo future; o shield evita
+        # que o cancelamento de um chamador cancele o carregamento dos demais
+        return await asyncio.shield(self._load(user_id))
+
+    def _load(self, user_id: str) -> asyncio.Future:
+        """Registra um cache miss no lote atual, agendando o flush se necessário."""
+        future = self._pending.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[user_id] = future
+            if self._batch_task is None:
+                self._batch_task = loop.create_task(self._flush())
+        return future
+
+    async def _flush(self):
+        """Busca as roles de todos os usuários pendentes numa única consulta."""
+        # Cede um ciclo para agrupar os misses do mesmo tick (inclusive com eager tasks)
+        await asyncio.sleep(0)
+        batch, self._pending = self._pending, {}
+        self._batch_task = None
+        try:
+            roles_by_user = await self._fetch_roles_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for user_id, future in batch.items():
+            roles = frozenset(roles_by_user.get(user_id, ()))
+            self._cache.put(user_id, roles)
+            if not future.done():
+                future.set_result(roles)
+
+    async def _fetch_roles_batch(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        """Busca as roles de vários usuários no banco, agrupadas por usuário."""
+        pool = await get_pool()
+        if pool is not None:
+            rows = await pool.fetch(
+                "SELECT user_id, role FROM user_roles WHERE user_id = ANY($1::uuid[])",
+                user_ids
+            )
+        else:
+            response = await self.supabase.table('user_roles').select('user_id, role').in_('user_id', user_ids).execute()
+            rows = response.data
 
-    def _update_cache(self, user_id: str, roles: List[str]):
-        """Atualiza o cache de roles para um usuário."""
-        self.role_cache[user_id] = {"roles": roles}
-        self.cache_expiry[user_id] = datetime.utcnow() + self.cache_duration
+        roles_by_user: Dict[str, List[str]] = {}
+        for row in rows:
+            roles_by_user.setdefault(str(row['user_id']), []).append(row['role'])
+        return roles_by_user
 
     async def add_role_to_user(self, user_id: str, role: str) -> bool:
         """Adiciona uma role a um usuário."""
@@ -57,8 +102,7 @@ class RoleManager:
                 'role': role
             }).execute()
             # Invalidar cache
-            if user_id in self.role_cache:
-                del self.role_cache[user_id]
+            self._cache.pop(user_id, None)
             return True
         except Exception as e:
             logger.error(f"Erro ao adicionar role {role} ao usuário {user_id}: {str(e)}")
@@ -69,8 +113,7 @@ class RoleManager:
         try:
             await self.supabase.table('user_roles').delete().eq('user_id', user_id).eq('role', role).execute()
             # Invalidar cache
-            if user_id in self.role_cache:
-                del self.role_cache[user_id]
+            self._cache.pop(user_id, None)
             return True
         except Exception as e:
             logger.error(f"Erro ao remover role {role} do usuário {user_id}: {str(e)}")
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Cache LRU limitado em que cada entrada expira após um TTL (tempo monotônico)."""
+
+    def __init__(self, maxsize: int, ttl: float,
+                 on_remove: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        Args:
+            maxsize: Número máximo de entradas; acima dele sai a menos usada
+            ttl: Validade padrão das entradas, em segundos
+            on_remove: Chamado com (chave, valor) sempre que uma entrada sai do
+                cache (expiração, descarte por tamanho ou pop), mas não em clear()
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._on_remove = on_remove
+        # chave -> (expira_em monotonic, valor), da menos para a mais usada
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna o valor se presente e ainda válido, marcando-o como usado."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Armazena um valor (com o TTL padrão ou o informado)."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            oldest, (_, oldest_value) = self._data.popitem(last=False)
+            if self._on_remove is not None:
+                self._on_remove(oldest, oldest_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove e retorna o valor da chave (mesmo expirado)."""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        if self._on_remove is not None:
+            self._on_remove(key, entry[1])
+        return entry[1]
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,93 +1,189 @@
-from typing import Dict, Optional
+from typing import Deque, Dict, Optional
 import time
-import asyncio
+import uuid
+from collections import deque
 from datetime import datetime, timedelta
 import logging
 from dataclasses import dataclass
 
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# After a Redis error, seconds to use local limits before trying Redis again;
+# keeps an outage from adding the socket timeout to every request
+REDIS_RETRY_DELAY = 30
+
+# Janela deslizante atômica por IP. Retorna 1 (permitido), -1 (bloqueado),
+# 0 (limite por minuto excedido, IP bloqueado) ou -2 (limite de burst excedido).
+SLIDING_WINDOW_SCRIPT = """
+local key, block_key = KEYS[1], KEYS[2]
+local now = tonumber(ARGV[1])
+if redis.call('EXISTS', block_key) == 1 then
+    return -1
+end
+redis.call('ZREMRANGEBYSCORE', key, 0, now - 60)
+if redis.call('ZCARD', key) >= tonumber(ARGV[2]) then
+    redis.call('SET', block_key, 1, 'EX', tonumber(ARGV[4]))
+    return 0
+end
+if redis.call('ZCOUNT', key, now - 1, '+inf') >= tonumber(ARGV[3]) then
+    return -2
+end
+redis.call('ZADD', key, now, ARGV[5])
+redis.call('EXPIRE', key, 60)
+return 1
+"""
+
 @dataclass
 class RateLimitConfig:
     requests_per_minute: int = 60
     burst_limit: int = 10
     block_duration: int = 300  # 5 minutes in seconds
+    redis_url: Optional[str] = None  # shared limits across workers when set
 
 class RateLimiter:
     def __init__(self, config: RateLimitConfig):
         self.config = config
-        self._ip_requests: Dict[str, list] = {}
+        self._ip_requests: Dict[str, Deque[float]] = {}
         self._ip_blocks: Dict[str, datetime] = {}
-        self._lock = asyncio.Lock()
+        self._redis = None
+        self._script = None
+        self._redis_retry_at = 0.0  # time.monotonic() deadline after a Redis error
+        if config.redis_url and REDIS_AVAILABLE:
+            try:
+                self._redis = aioredis.Redis.from_url(
+                    config.redis_url,
+                    socket_timeout=2.0,
+                    retry_on_timeout=True
+                )
+                # register_script uses EVALSHA and reloads the script on NOSCRIPT
+                self._script = self._redis.register_script(SLIDING_WINDOW_SCRIPT)
+            except Exception as e:
+                logger.error(f"Error initializing Redis rate limiter: {str(e)}")
+                self._redis = None
+
+    @staticmethod
+    def _keys(ip: str):
+        return [f"ratelimit:{ip}", f"ratelimit:block:{ip}"]
 
     async def is_allowed(self, ip: str) -> bool:
         """Check if an IP is allowed to make a request."""
-        async with self._lock:
-            # Check if IP is blocked
-            if ip in self._ip_blocks:
-                if datetime.utcnow() < self._ip_blocks[ip]:
-                    logger.warning(f"IP {ip} is blocked until {self._ip_blocks[ip]}")
-                    return False
-                else:
-                    del self._ip_blocks[ip]
-
-            # Initialize request history for new IPs
-            if ip not in self._ip_requests:
-                self._ip_requests[ip] = []
-
-            # Clean old requests
-            now = time.time()
-            self._ip_requests[ip] = [
-                req_time for req_time in self._ip_requests[ip]
-                if now - req_time < 60
+        if self._redis is not None and time.monotonic() >= self._redis_retry_at:
+            try:
+                return await self._is_allowed_redis(ip)
+            except Exception as e:
+                logger.error(
+                    f"Redis rate limiter error, using local limits for {REDIS_RETRY_DELAY}s: {str(e)}"
+                )
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_DELAY
+        return self._is_allowed_local(ip)
+
+    async def _is_allowed_redis(self, ip: str) -> bool:
+        """Check the shared sliding window in Redis (one round-trip)."""
+        result = await self._script(
+            keys=self._keys(ip),
+            args=[
+                time.time(),
+                self.config.requests_per_minute,
+                self.config.burst_limit,
+                self.config.block_duration,
+                uuid.uuid4().hex
             ]
+        )
+        result = int(result)
+        if result == -1:
+            logger.warning(f"IP {ip} is blocked")
+        elif result == 0:
+            logger.warning(f"Rate limit exceeded for IP {ip}")
+        elif result == -2:
+            logger.warning(f"Burst limit exceeded for IP {ip}")
+        return result == 1
 
-            # Check rate limit
-            if len(self._ip_requests[ip]) >= self.config.requests_per_minute:
-                logger.warning(f"Rate limit exceeded for IP {ip}")
-                self._ip_blocks[ip] = datetime.utcnow() + timedelta(seconds=self.config.block_duration)
+    def _is_allowed_local(self, ip: str) -> bool:
+        """Check the in-process limits (no Redis configured, or Redis unavailable)."""
+        # Check if IP is blocked
+        if ip in self._ip_blocks:
+            if datetime.utcnow() < self._ip_blocks[ip]:
+                logger.warning(f"IP {ip} is blocked until {self._ip_blocks[ip]}")
                 return False
+            else:
+                del self._ip_blocks[ip]
 
-            # Check burst limit
-            recent_requests = [
-                req_time for req_time in self._ip_requests[ip]
-                if now - req_time < 1
-            ]
-            if len(recent_requests) >= self.config.burst_limit:
-                logger.warning(f"Burst limit exceeded for IP {ip}")
-                return False
+        # Drop requests that left the window (oldest first)
+        requests = self._ip_requests.setdefault(ip, deque())
+        now = time.time()
+        cutoff = now - 60
+        while requests and requests[0] <= cutoff:
+            requests.popleft()
+
+        # Check rate limit
+        if len(requests) >= self.config.requests_per_minute:
+            logger.warning(f"Rate limit exceeded for IP {ip}")
+            self._ip_blocks[ip] = datetime.utcnow() + timedelta(seconds=self.config.block_duration)
+            return False
+
+        # Check burst limit, counting back from the newest request
+        burst_cutoff = now - 1
+        recent_requests = 0
+        for req_time in reversed(requests):
+            if req_time <= burst_cutoff:
+                break
+            recent_requests += 1
+            if recent_requests >= self.config.burst_limit:
+                break
+        if recent_requests >= self.config.burst_limit:
+            logger.warning(f"Burst limit exceeded for IP {ip}")
+            return False
 
-            # Add new request
-            self._ip_requests[ip].append(now)
-            return True
+        # Add new request
+        requests.append(now)
+        return True
 
     async def get_ip_stats(self, ip: str) -> Dict:
         """Get statistics for an IP address."""
-        async with self._lock:
-            now = time.time()
-            requests = self._ip_requests.get(ip, [])
-            recent_requests = [req for req in requests if now - req < 60]
-            
-            return {
-                "requests_last_minute": len(recent_requests),
-                "is_blocked": ip in self._ip_blocks,
-                "block_until": self._ip_blocks.get(ip),
-                "total_requests": len(requests)
-            }
+        now = time.time()
+        if self._redis is not None:
+            try:
+                key, block_key = self._keys(ip)
+                count = await self._redis.zcount(key, now - 60, "+inf")
+                total = await self._redis.zcard(key)
+                block_ttl = await self._redis.ttl(block_key)
+                return {
+                    "requests_last_minute": count,
+                    "is_blocked": block_ttl > 0,
+                    "block_until": datetime.utcnow() + timedelta(seconds=block_ttl) if block_ttl > 0 else None,
+                    "total_requests": total
+                }
+            except Exception as e:
+                logger.error(f"Error reading Redis rate limit stats: {str(e)}")
+
+        requests = self._ip_requests.get(ip, ())
+        recent_requests = sum(1 for req in requests if now - req < 60)
+
+        return {
+            "requests_last_minute": recent_requests,
+            "is_blocked": ip in self._ip_blocks,
+            "block_until": self._ip_blocks.get(ip),
+            "total_requests": len(requests)
+        }
 
     async def cleanup(self):
-        """Clean up old request records."""
-        async with self._lock:
-            now = time.time()
-            for ip in list(self._ip_requests.keys()):
-                self._ip_requests[ip] = [
-                    req_time for req_time in self._ip_requests[ip]
-                    if now - req_time < 60
-                ]
-                if not self._ip_requests[ip]:
-                    del self._ip_requests[ip]
-
-            # Clean up expired blocks
-            for ip in list(self._ip_blocks.keys()):
-                if datetime.utcnow() >= self._ip_blocks[ip]:
-                    del self._ip_blocks[ip] 
\ No newline at end of file
+        """Clean up old request records (Redis keys expire on their own)."""
+        now = time.time()
+        cutoff = now - 60
+        for ip in list(self._ip_requests.keys()):
+            requests = self._ip_requests[ip]
+            while requests and requests[0] <= cutoff:
+                requests.popleft()
+            if not requests:
+                del self._ip_requests[ip]
+
+        # Clean up expired blocks
+        for ip in list(self._ip_blocks.keys()):
+            if datetime.utcnow() >= self._ip_blocks[ip]:
+                del self._ip_blocks[ip] 
\ No newline at end of file
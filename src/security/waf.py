@@ -1,12 +1,38 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import re
 import logging
+from collections import Counter
 from dataclasses import dataclass
 from datetime import datetime
-import json
 
 logger = logging.getLogger(__name__)
 
+# Leading global inline flags, e.g. "(?i)"; only valid at the start of a pattern
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+# A single ASCII word: no default rule can match it (each needs punctuation or two words)
+_SAFE_VALUE = re.compile(rb"[A-Za-z0-9_]*")
+
+def _scoped_pattern(pattern: str) -> str:
+    """Rewrite leading global flags as a scoped group so the pattern can be embedded."""
+    m = _GLOBAL_FLAGS.match(pattern)
+    if m:
+        return f"(?{m.group(1)}:{pattern[m.end():]})"
+    return f"(?:{pattern})"
+
+def _iter_strings(obj: Any) -> Iterator[str]:
+    """Yield every string (dict keys included) nested in a request payload."""
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(key, str):
+                yield key
+            yield from _iter_strings(value)
+    elif isinstance(obj, (list, tuple, set)):
+        for value in obj:
+            yield from _iter_strings(value)
+
 @dataclass
 class WAFRule:
     name: str
@@ -19,8 +45,17 @@ class WAFRule:
 class WAF:
     def __init__(self):
         self.rules: List[WAFRule] = []
-        self._setup_default_rules()
         self._compiled_patterns: Dict[str, re.Pattern] = {}
+        # Enabled rules with their compiled patterns, rebuilt only when rules change
+        self._active: List[Tuple[WAFRule, re.Pattern]] = []
+        # Patterns known not to match a single word; the fast path needs all active rules here
+        self._word_safe_patterns: frozenset = frozenset()
+        self._fast_path = False
+        # All enabled rules fused into one alternation: one scan per request
+        self._fused: Optional[re.Pattern] = None
+        self._fused_rules: Dict[str, WAFRule] = {}
+        self._stats_cache: Dict = {}
+        self._setup_default_rules()
 
     def _setup_default_rules(self):
         """Setup default WAF rules."""
@@ -56,15 +91,65 @@ class WAF:
                 description="Potential sensitive data exposure"
             )
         ]
+        self._word_safe_patterns = frozenset(rule.pattern for rule in self.rules)
         self._compile_patterns()
 
     def _compile_patterns(self):
-        """Compile regex patterns for better performance."""
+        """Compile regex patterns (bytes, scanned against UTF-8 input) for better performance."""
         for rule in self.rules:
             try:
-                self._compiled_patterns[rule.name] = re.compile(rule.pattern)
+                self._compiled_patterns[rule.name] = re.compile(rule.pattern.encode())
             except Exception as e:
                 logger.error(f"Error compiling pattern for rule {rule.name}: {e}")
+        self._rebuild_active()
+
+    def _rebuild_active(self):
+        """Refresh the enabled-rule list and the fused alternation built from it."""
+        self._active = [
+            (rule, self._compiled_patterns[rule.name])
+            for rule in self.rules
+            if rule.enabled and rule.name in self._compiled_patterns
+        ]
+        # Group names are generated so any rule name works
+        self._fused_rules = {f"r{i}": rule for i, (rule, _) in enumerate(self._active)}
+        try:
+            self._fused = re.compile("|".join(
+                f"(?P<{group}>{_scoped_pattern(rule.pattern)})"
+                for group, rule in self._fused_rules.items()
+            ).encode()) if self._active else None
+        except Exception as e:
+            logger.error(f"Error compiling fused WAF pattern, scanning rules one by one: {e}")
+            self._fused = None
+        self._fast_path = all(rule.pattern in self._word_safe_patterns for rule, _ in self._active)
+        self._recompute_stats()
+
+    def _recompute_stats(self):
+        """Recompute rule statistics in a single pass."""
+        severities = Counter(r.severity for r in self.rules)
+        self._stats_cache = {
+            "total_rules": len(self.rules),
+            "enabled_rules": sum(1 for r in self.rules if r.enabled),
+            "severity_counts": {
+                "high": severities["high"],
+                "medium": severities["medium"],
+                "low": severities["low"]
+            }
+        }
+
+    def _match(self, value: str) -> Optional[WAFRule]:
+        """Return the rule matching ``value``, if any."""
+        data = value.encode("utf-8", "ignore")
+        if self._fast_path and _SAFE_VALUE.fullmatch(data):
+            return None
+
+        if self._fused is not None:
+            match = self._fused.search(data)
+            return self._fused_rules[match.lastgroup] if match else None
+
+        for rule, pattern in self._active:
+            if pattern.search(data):
+                return rule
+        return None
 
     async def inspect_request(self, request_data: Dict) -> Tuple[bool, Optional[str], Optional[str]]:
         """
@@ -72,26 +157,18 @@ class WAF:
         Returns: (is_allowed, rule_name, description)
         """
         try:
-            # Convert request data to string for inspection
-            request_str = json.dumps(request_data)
-            
-            for rule in self.rules:
-                if not rule.enabled:
-                    continue
-                    
-                pattern = self._compiled_patterns.get(rule.name)
-                if not pattern:
-                    continue
-                    
-                if pattern.search(request_str):
+            # Only string leaves can carry a payload; numbers, bools and None are skipped
+            for value in _iter_strings(request_data):
+                rule = self._match(value)
+                if rule is not None:
                     logger.warning(
                         f"WAF rule triggered: {rule.name} - {rule.description} "
                         f"(Severity: {rule.severity})"
                     )
                     return False, rule.name, rule.description
-                    
+
             return True, None, None
-            
+
         except Exception as e:
             logger.error(f"Error inspecting request: {e}")
             return False, "error", str(e)
@@ -99,8 +176,9 @@ class WAF:
     def add_rule(self, rule: WAFRule):
         """Add a new WAF rule."""
         try:
-            self._compiled_patterns[rule.name] = re.compile(rule.pattern)
+            self._compiled_patterns[rule.name] = re.compile(rule.pattern.encode())
             self.rules.append(rule)
+            self._rebuild_active()
             logger.info(f"Added new WAF rule: {rule.name}")
         except Exception as e:
             logger.error(f"Error adding WAF rule {rule.name}: {e}")
@@ -113,6 +191,7 @@ class WAF:
                     rule.enabled = enabled
                 if action is not None:
                     rule.action = action
+                self._rebuild_active()
                 logger.info(f"Updated WAF rule: {rule_name}")
                 return
         logger.warning(f"WAF rule not found: {rule_name}")
@@ -132,13 +211,5 @@ class WAF:
         ]
 
     def get_rule_stats(self) -> Dict:
-        """Get statistics about WAF rules."""
-        return {
-            "total_rules": len(self.rules),
-            "enabled_rules": len([r for r in self.rules if r.enabled]),
-            "severity_counts": {
-                "high": len([r for r in self.rules if r.severity == "high"]),
-                "medium": len([r for r in self.rules if r.severity == "medium"]),
-                "low": len([r for r in self.rules if r.severity == "low"])
-            }
-        } 
\ No newline at end of file
+        """Get statistics about WAF rules (recomputed only when rules change)."""
+        return self._stats_cache
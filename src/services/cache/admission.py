@@ -0,0 +1,133 @@
+"""
+Filtro de admissão TinyLFU para o cache em memória.
+
+Estima a frequência recente de cada chave com um count-min sketch de
+contadores de 4 bits, precedido por um "doorkeeper" (filtro de Bloom) que
+absorve chaves vistas uma única vez. Com o cache cheio, uma chave nova só
+substitui a vítima do LRU se for acessada com pelo menos a mesma frequência.
+
+Inclui também um filtro de Bloom simples, usado pelo cache para lembrar
+chaves recentemente ausentes em todos os backends.
+"""
+
+import math
+from typing import Hashable
+
+# Multiplicadores ímpares de 64 bits, um por linha do sketch
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_MASK64 = (1 << 64) - 1
+
+# Tabela para envelhecer todos os contadores de uma vez: divide os dois nibbles de cada byte por 2
+_HALVE = bytes(((b >> 1) & 0x77) for b in range(256))
+
+
+class TinyLFU:
+    """Count-min sketch (4 bits, 4 linhas) com doorkeeper e envelhecimento periódico."""
+
+    def __init__(self, capacity: int):
+        """
+        Inicializa o filtro.
+
+        Args:
+            capacity: Número máximo de entradas do cache protegido
+        """
+        width = 16
+        while width < capacity:
+            width <<= 1
+        self._bits = width.bit_length() - 1
+        self._width = width
+        # 4 linhas de `width` contadores de 4 bits, dois por byte
+        self._table = bytearray(len(_SEEDS) * width // 2)
+        self._doorkeeper = bytearray(width // 2)
+        self._door_shift = 64 - (width * 4).bit_length() + 1
+        # Após ~10x a capacidade em incrementos, todos os contadores são divididos por 2
+        self._sample_size = 10 * max(capacity, 1)
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        """Posições do contador da chave em cada linha."""
+        h = hash(key) & _MASK64
+        shift = 64 - self._bits
+        for row, seed in enumerate(_SEEDS):
+            yield row * self._width + (((h * seed) & _MASK64) >> shift)
+
+    def _door_indexes(self, key: Hashable):
+        """Bits da chave no doorkeeper."""
+        h = hash(key) & _MASK64
+        return tuple(((h * seed) & _MASK64) >> self._door_shift for seed in _SEEDS[2:])
+
+    def _in_doorkeeper(self, key: Hashable) -> bool:
+        return all(self._doorkeeper[i >> 3] & (1 << (i & 7)) for i in self._door_indexes(key))
+
+    def increment(self, key: Hashable) -> None:
+        """Registra um acesso à chave."""
+        if not self._in_doorkeeper(key):
+            # Primeira ocorrência recente: apenas o doorkeeper é marcado
+            for i in self._door_indexes(key):
+                self._doorkeeper[i >> 3] |= 1 << (i & 7)
+        else:
+            table = self._table
+            for pos in self._indexes(key):
+                byte, shift = pos >> 1, (pos & 1) << 2
+                if (table[byte] >> shift) & 0xF < 15:
+                    table[byte] += 1 << shift
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def estimate(self, key: Hashable) -> int:
+        """Frequência estimada da chave."""
+        table = self._table
+        count = min(
+            (table[pos >> 1] >> ((pos & 1) << 2)) & 0xF
+            for pos in self._indexes(key)
+        )
+        return count + 1 if self._in_doorkeeper(key) else count
+
+    def admit(self, candidate: Hashable, victim: Hashable) -> bool:
+        """Indica se a chave candidata deve substituir a vítima."""
+        return self.estimate(candidate) >= self.estimate(victim)
+
+    def _reset(self) -> None:
+        """Envelhece o sketch: contadores pela metade e doorkeeper zerado."""
+        self._table = bytearray(self._table.translate(_HALVE))
+        self._doorkeeper = bytearray(len(self._doorkeeper))
+        self._additions = 0
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre hash() (só pertinência aproximada, sem remoção)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Inicializa o filtro.
+
+        Args:
+            capacity: Número de chaves esperado antes de recriar o filtro
+            error_rate: Taxa de falsos positivos desejada nessa capacidade
+        """
+        capacity = max(capacity, 1)
+        size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._size = size
+        self._hashes = max(1, round(size / capacity * math.log(2)))
+        self._bits = bytearray((size + 7) // 8)
+
+    def _positions(self, key: Hashable):
+        """Bits da chave (hashing duplo a partir de um único hash())."""
+        h = hash(key) & _MASK64
+        h1 = (h * _SEEDS[0]) & _MASK64
+        h2 = ((h * _SEEDS[1]) & _MASK64) | 1
+        size = self._size
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % size
+
+    def add(self, key: Hashable) -> None:
+        """Marca a chave como vista."""
+        bits = self._bits
+        for i in self._positions(key):
+            bits[i >> 3] |= 1 << (i & 7)
+
+    def __contains__(self, key: Hashable) -> bool:
+        bits = self._bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in self._positions(key))
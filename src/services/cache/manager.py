@@ -1,32 +1,174 @@
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Union, List, Set, Tuple
+import asyncio
 import json
 import logging
 import os
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
+import functools
 import hashlib
 import threading
+from collections import OrderedDict
 from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 import redis
+import redis.asyncio as aioredis
+
+from .admission import BloomFilter, TinyLFU
+from .sqlite_store import SQLiteStore
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
 # Configuração de logging
 logger = logging.getLogger(__name__)
 
+def _dumps(obj: Any) -> bytes:
+    """Serializa para JSON em bytes (orjson quando disponível)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _loads(data: Union[bytes, str]) -> Any:
+    """Desserializa JSON (orjson quando disponível)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Payloads persistidos (arquivo e Redis) começam com um byte de formato;
+# dados antigos, sem o byte, são JSON puro e começam com outro caractere
+_FORMAT_RAW = 0x00
+_FORMAT_ZSTD = 0x01
+# Abaixo disso o cabeçalho do zstd anula o ganho
+COMPRESS_MIN_SIZE = 256
+
+# Compressores zstd não podem ser usados por duas threads ao mesmo tempo
+_zstd_local = threading.local()
+
+def _zstd_compressor() -> "zstandard.ZstdCompressor":
+    cctx = getattr(_zstd_local, 'cctx', None)
+    if cctx is None:
+        cctx = _zstd_local.cctx = zstandard.ZstdCompressor(level=3)
+    return cctx
+
+def _zstd_decompressor() -> "zstandard.ZstdDecompressor":
+    dctx = getattr(_zstd_local, 'dctx', None)
+    if dctx is None:
+        dctx = _zstd_local.dctx = zstandard.ZstdDecompressor()
+    return dctx
+
+def _encode(obj: Any) -> bytes:
+    """Serializa para persistência, comprimindo com zstd payloads grandes."""
+    data = _dumps(obj)
+    if ZSTD_AVAILABLE and len(data) >= COMPRESS_MIN_SIZE:
+        return bytes((_FORMAT_ZSTD,)) + _zstd_compressor().compress(data)
+    return bytes((_FORMAT_RAW,)) + data
+
+def _decode(data: bytes) -> Any:
+    """Desserializa um payload gravado por _encode (ou JSON puro antigo)."""
+    tag = data[0]
+    if tag == _FORMAT_ZSTD:
+        return _loads(_zstd_decompressor().decompress(data[1:]))
+    if tag == _FORMAT_RAW:
+        return _loads(data[1:])
+    return _loads(data)
+
+@functools.lru_cache(maxsize=8192)
+def _key_to_filename(key: str) -> str:
+    """Nome do arquivo de uma chave no backend 'json'; memoizado para chaves quentes e repetidas."""
+    # BLAKE2b de 128 bits: implementação interna do CPython, sem o custo por chamada do MD5 via OpenSSL
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".json"
+
+
 class CacheEntry:
     """Representa uma entrada no cache."""
-    def __init__(self, data: Any, expires_at: Optional[datetime] = None):
+    def __init__(self, data: Any, expires_at: Optional[float] = None, size: int = 0):
         self.data = data
-        self.timestamp = datetime.now()
+        self.size = size  # tamanho serializado, calculado uma vez na inserção
+        # Prazo em time.monotonic(): imune a ajustes do relógio e sem alocar objetos
         self.expires_at = expires_at
-        self.access_count = 0
+        # Bit de referência do CLOCK: marcado na leitura, sem lock
+        self.referenced = False
 
     @property
     def is_expired(self) -> bool:
         """Verifica se a entrada está expirada."""
-        if self.expires_at is None:
-            return False
-        return datetime.now() > self.expires_at
+        return self.expires_at is not None and time.monotonic() > self.expires_at
+
+
+class _Stripe:
+    """Fatia do cache em memória: fila CLOCK própria, com lock e capacidade próprios."""
+    __slots__ = ('lock', 'entries', 'max_size', 'bytes')
+
+    def __init__(self, max_size: int):
+        self.lock = Lock()
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.max_size = max_size
+        # Soma de entry.size das entradas da fatia, mantida sob o lock
+        self.bytes = 0
+
+
+# Número máximo de fatias do cache em memória (potência de 2)
+MEMORY_STRIPES = 16
+
+# Payloads a partir deste tamanho têm o espaço pré-alocado no arquivo (posix_fallocate);
+# só vale para o backend legado 'json' — o padrão 'sqlite' grava no banco
+FALLOCATE_MIN_SIZE = 64 * 1024
+
+# Flags de abertura dos arquivos de cache do backend 'json' (O_BINARY só existe no Windows)
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+# Filtro de chaves ausentes: capacidade e intervalo (segundos) até ser recriado
+NEGATIVE_CACHE_CAPACITY = 10_000
+NEGATIVE_CACHE_RESET = 300.0
+
+# Validade (segundos) das estatísticas do cache em arquivo memoizadas em get_stats
+FILE_STATS_TTL = 5.0
+
+# Pools de conexão Redis compartilhados entre instâncias, por URL
+_REDIS_POOLS: Dict[str, "redis.ConnectionPool"] = {}
+_ASYNC_REDIS_POOLS: Dict[str, "aioredis.ConnectionPool"] = {}
+_REDIS_POOLS_LOCK = Lock()
+
+def _get_redis_pool(url: str, max_connections: int) -> "redis.ConnectionPool":
+    """Obtém (ou cria) o pool de conexões limitado para a URL."""
+    with _REDIS_POOLS_LOCK:
+        pool = _REDIS_POOLS.get(url)
+        if pool is None:
+            pool = redis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=max_connections,
+                socket_timeout=2.0,
+                socket_keepalive=True,
+                retry_on_timeout=True
+            )
+            _REDIS_POOLS[url] = pool
+        return pool
+
+def _get_async_redis_pool(url: str, max_connections: int) -> "aioredis.ConnectionPool":
+    """Obtém (ou cria) o pool de conexões assíncrono para a URL."""
+    with _REDIS_POOLS_LOCK:
+        pool = _ASYNC_REDIS_POOLS.get(url)
+        if pool is None:
+            pool = aioredis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=max_connections,
+                socket_timeout=2.0,
+                socket_keepalive=True,
+                retry_on_timeout=True
+            )
+            _ASYNC_REDIS_POOLS[url] = pool
+        return pool
 
 
 class CacheManager:
@@ -49,9 +191,13 @@ class CacheManager:
                 file_enabled: bool - Se o cache em arquivo está habilitado
                 redis_enabled: bool - Se o cache Redis está habilitado
                 cache_path: str - Caminho para o cache em arquivo
+                file_backend: str - 'sqlite' (banco único em WAL) ou 'json' (um arquivo por chave)
                 ttl: int - Tempo de vida das entradas em segundos
                 max_size: int - Tamanho máximo do cache
+                admission_enabled: bool - Se o filtro TinyLFU decide a admissão na memória cheia
+                negative_cache_enabled: bool - Se chaves ausentes em todos os backends pulam as consultas a arquivo/Redis
                 redis_url: str - URL do Redis
+                redis_pool_size: int - Máximo de conexões do pool Redis compartilhado
         """
         # Configuração padrão
         self.config = {
@@ -59,9 +205,13 @@ class CacheManager:
             'file_enabled': True,
             'redis_enabled': False,
             'cache_path': 'data/cache',
+            'file_backend': 'sqlite',
             'ttl': 3600,  # 1 hora em segundos
             'max_size': 1000,
+            'admission_enabled': True,
+            'negative_cache_enabled': True,
             'redis_url': None,
+            'redis_pool_size': 32,
         }
         
         # Atualiza com configurações fornecidas
@@ -70,27 +220,63 @@ class CacheManager:
             
         # Inicialização
         self.logger = logging.getLogger("cache_manager")
-        self._memory_cache: Dict[str, CacheEntry] = {}
+        # Cache em memória dividido em fatias por hash da chave: chaves diferentes
+        # raramente disputam o mesmo lock. Cada fatia é uma fila CLOCK (segunda chance):
+        # leituras só marcam o bit de referência, sem lock; apenas inserções travam a fatia.
+        max_size = max(1, self.config['max_size'])
+        stripes = 1
+        while stripes * 2 <= min(MEMORY_STRIPES, max_size):
+            stripes *= 2
+        self._stripes = [
+            _Stripe(max_size // stripes + (1 if i < max_size % stripes else 0))
+            for i in range(stripes)
+        ]
+        self._stripe_mask = stripes - 1
+        # Lock das operações em arquivo
         self._lock = Lock()
+        # Escritas em arquivo pendentes (chave -> (valor, expiração)): a mais recente vale
+        # para leitores até o escritor em segundo plano gravá-la
+        self._pending_writes: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._pending_lock = Lock()
+        self._write_futures: Set[Future] = set()
+        self._writer = None
+        # (prazo monotônico, entradas, bytes) das últimas estatísticas de arquivo
+        self._file_stats: Optional[Tuple[float, int, int]] = None
+        # Frequência recente das chaves; evita que acessos únicos expulsem entradas populares
+        self._admission = TinyLFU(self.config['max_size']) if self.config['admission_enabled'] else None
         
         # Inicializa cache em arquivo
+        self._sqlite = None
         if self.config['file_enabled']:
             self.cache_path = Path(self.config['cache_path'])
             self.cache_path.mkdir(parents=True, exist_ok=True)
+            if self.config['file_backend'] == 'sqlite':
+                self._sqlite = SQLiteStore(self.cache_path / 'cache.db')
+            self._writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-writer')
+        # Expiração conhecida de cada arquivo (nome -> epoch); evita abrir o arquivo só para checá-la.
+        # Usado apenas pelo backend legado 'json'; o 'sqlite' guarda a expiração na própria linha
+        self._file_ttl_index: Dict[str, float] = {}
             
         # Inicializa Redis
         self._redis_client = None
+        self._async_redis_client = None
         if self.config['redis_enabled'] and self.config['redis_url']:
             try:
-                self._redis_client = redis.Redis.from_url(
-                    self.config['redis_url'],
-                    socket_timeout=2.0,
-                    retry_on_timeout=True
-                )
+                pool = _get_redis_pool(self.config['redis_url'], self.config['redis_pool_size'])
+                self._redis_client = redis.Redis(connection_pool=pool)
+                # Cliente assíncrono para aget/aset; conexões abertas sob demanda
+                async_pool = _get_async_redis_pool(self.config['redis_url'], self.config['redis_pool_size'])
+                self._async_redis_client = aioredis.Redis(connection_pool=async_pool)
                 self.logger.info("Redis cache inicializado")
             except Exception as e:
                 self.logger.error(f"Erro ao inicializar Redis: {str(e)}")
                 
+        # Chaves recentemente ausentes em todos os backends: (bloom, chaves gravadas depois, prazo).
+        # Lido uma única vez por operação; a troca da tupla inteira mantém o estado consistente
+        self._negative: Optional[Tuple[BloomFilter, Set[str], float]] = None
+        if self.config['negative_cache_enabled'] and (self.config['file_enabled'] or self.config['redis_enabled']):
+            self._reset_negative()
+            
     def get(self, key: str) -> Optional[Any]:
         """
         Obtém valor do cache. Tenta primeiro em memória, depois arquivo, depois Redis.
@@ -107,6 +293,11 @@ class CacheManager:
             if value is not None:
                 return value
                 
+        # Ausente há pouco em todos os backends: evita acesso a disco e ida ao Redis
+        negative = self._negative
+        if negative is not None and key in negative[0] and key not in negative[1]:
+            return None
+            
         # Tenta arquivo
         if self.config['file_enabled']:
             value = self._get_from_file(key)
@@ -125,6 +316,7 @@ class CacheManager:
                     self._add_to_memory(key, value)
                 return value
                 
+        self._remember_missing(negative, key)
         return None
         
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
@@ -140,13 +332,15 @@ class CacheManager:
             True se salvo com sucesso, False caso contrário
         """
         ttl = ttl or self.config['ttl']
-        expires_at = datetime.now() + timedelta(seconds=ttl)
+        # Expiração persistida em epoch (relógio de parede); a memória usa o relógio monotônico
+        expires_at = time.time() + ttl
         
         success = True
+        self._forget_missing(key)
         
         # Salva na memória
         if self.config['memory_enabled']:
-            if not self._add_to_memory(key, value, expires_at):
+            if not self._add_to_memory(key, value, ttl):
                 success = False
                 
         # Salva em arquivo
@@ -161,6 +355,186 @@ class CacheManager:
                 
         return success
         
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Obtém vários valores do cache. No Redis, as chaves ausentes nos demais
+        backends são buscadas num único pipeline (uma ida e volta).
+        
+        Args:
+            keys: Chaves do cache
+            
+        Returns:
+            Dicionário chave -> valor, apenas com as chaves encontradas
+        """
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        negative = self._negative
+        
+        for key in keys:
+            value = None
+            # Tenta memória
+            if self.config['memory_enabled']:
+                value = self._get_from_memory(key)
+                if value is not None:
+                    found[key] = value
+                    continue
+            # Ausente há pouco em todos os backends
+            if negative is not None and key in negative[0] and key not in negative[1]:
+                continue
+            # Tenta arquivo
+            if value is None and self.config['file_enabled']:
+                value = self._get_from_file(key)
+                if value is not None and self.config['memory_enabled']:
+                    self._add_to_memory(key, value)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+                
+        # Tenta Redis para o restante, em lote
+        if missing and self.config['redis_enabled'] and self._redis_client:
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)
+                for key in missing:
+                    pipe.get(key)
+                for key, raw_data in zip(missing, pipe.execute()):
+                    if not raw_data:
+                        continue
+                    value = _decode(raw_data)
+                    found[key] = value
+                    if self.config['memory_enabled']:
+                        self._add_to_memory(key, value)
+            except Exception as e:
+                self.logger.error(f"Erro ao ler lote do Redis: {str(e)}")
+                
+        for key in missing:
+            if key not in found:
+                self._remember_missing(negative, key)
+                
+        return found
+        
+    def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """
+        Salva vários valores no cache. No Redis, todas as escritas vão num
+        único pipeline.
+        
+        Args:
+            items: Dicionário chave -> valor
+            ttl: Tempo de vida em segundos (opcional, usa padrão se None)
+            
+        Returns:
+            True se todos foram salvos com sucesso, False caso contrário
+        """
+        ttl = ttl or self.config['ttl']
+        # Expiração persistida em epoch (relógio de parede); a memória usa o relógio monotônico
+        expires_at = time.time() + ttl
+        
+        success = True
+        
+        for key, value in items.items():
+            self._forget_missing(key)
+            # Salva na memória
+            if self.config['memory_enabled']:
+                if not self._add_to_memory(key, value, ttl):
+                    success = False
+            # Salva em arquivo
+            if self.config['file_enabled']:
+                if not self._add_to_file(key, value, expires_at):
+                    success = False
+                    
+        # Salva no Redis, em lote
+        if items and self.config['redis_enabled'] and self._redis_client:
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipe.setex(key, ttl, _encode(value))
+                pipe.execute()
+            except Exception as e:
+                self.logger.error(f"Erro ao salvar lote no Redis: {str(e)}")
+                success = False
+                
+        return success
+        
+    async def aget(self, key: str) -> Optional[Any]:
+        """
+        Versão assíncrona de get. Após a memória, consulta arquivo e Redis em
+        paralelo e usa a primeira resposta encontrada.
+        
+        Args:
+            key: Chave do cache
+            
+        Returns:
+            Valor armazenado ou None se não encontrado
+        """
+        # Tenta memória
+        if self.config['memory_enabled']:
+            value = self._get_from_memory(key)
+            if value is not None:
+                return value
+                
+        # Ausente há pouco em todos os backends
+        negative = self._negative
+        if negative is not None and key in negative[0] and key not in negative[1]:
+            return None
+            
+        loop = asyncio.get_running_loop()
+        probes = []
+        if self.config['file_enabled']:
+            probes.append(loop.run_in_executor(None, self._get_from_file, key))
+        if self.config['redis_enabled'] and self._async_redis_client:
+            probes.append(asyncio.ensure_future(self._aget_from_redis(key)))
+            
+        try:
+            for probe in asyncio.as_completed(probes):
+                value = await probe
+                if value is not None:
+                    # Atualiza memória
+                    if self.config['memory_enabled']:
+                        self._add_to_memory(key, value)
+                    return value
+        finally:
+            for probe in probes:
+                if not probe.done():
+                    probe.cancel()
+                    
+        self._remember_missing(negative, key)
+        return None
+        
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """
+        Versão assíncrona de set. Grava arquivo e Redis em paralelo.
+        
+        Args:
+            key: Chave do cache
+            value: Valor a ser armazenado
+            ttl: Tempo de vida em segundos (opcional, usa padrão se None)
+            
+        Returns:
+            True se salvo com sucesso, False caso contrário
+        """
+        ttl = ttl or self.config['ttl']
+        # Expiração persistida em epoch (relógio de parede); a memória usa o relógio monotônico
+        expires_at = time.time() + ttl
+        
+        success = True
+        self._forget_missing(key)
+        
+        # Salva na memória
+        if self.config['memory_enabled']:
+            if not self._add_to_memory(key, value, ttl):
+                success = False
+                
+        # Arquivo: apenas enfileira a escrita, não bloqueia o loop
+        if self.config['file_enabled']:
+            if not self._add_to_file(key, value, expires_at):
+                success = False
+                
+        if self.config['redis_enabled'] and self._async_redis_client:
+            if not await self._aadd_to_redis(key, value, ttl):
+                success = False
+                
+        return success
+        
     def delete(self, key: str) -> bool:
         """
         Remove valor do cache em todos os backends.
@@ -175,19 +549,28 @@ class CacheManager:
         
         # Remove da memória
         if self.config['memory_enabled']:
-            with self._lock:
-                if key in self._memory_cache:
-                    del self._memory_cache[key]
+            stripe = self._stripe(key)
+            with stripe.lock:
+                entry = stripe.entries.pop(key, None)
+                if entry is not None:
+                    stripe.bytes -= entry.size
                     
         # Remove do arquivo
         if self.config['file_enabled']:
             try:
-                filename = self._get_filename(key)
-                filepath = self.cache_path / filename
-                
-                if filepath.exists():
-                    with self._lock:
-                        filepath.unlink()
+                with self._lock:
+                    # Descarta escrita pendente para que não recrie a chave
+                    with self._pending_lock:
+                        self._pending_writes.pop(key, None)
+                    if self._sqlite:
+                        self._sqlite.delete(key)
+                    else:
+                        filename = _key_to_filename(key)
+                        filepath = self.cache_path / filename
+                        
+                        self._file_ttl_index.pop(filename, None)
+                        if filepath.exists():
+                            filepath.unlink()
             except Exception as e:
                 self.logger.error(f"Erro ao remover do arquivo: {str(e)}")
                 success = False
@@ -213,15 +596,25 @@ class CacheManager:
         
         # Limpa memória
         if self.config['memory_enabled']:
-            with self._lock:
-                self._memory_cache.clear()
+            for stripe in self._stripes:
+                with stripe.lock:
+                    stripe.entries.clear()
+                    stripe.bytes = 0
                 
         # Limpa arquivos
         if self.config['file_enabled']:
             try:
-                with self._lock:
-                    for filepath in self.cache_path.glob("*.json"):
-                        filepath.unlink()
+                with self._pending_lock:
+                    self._pending_writes.clear()
+                self.flush()
+                self._file_stats = None
+                if self._sqlite:
+                    self._sqlite.clear()
+                else:
+                    with self._lock:
+                        for filepath in self.cache_path.glob("*.json"):
+                            filepath.unlink()
+                        self._file_ttl_index.clear()
             except Exception as e:
                 self.logger.error(f"Erro ao limpar cache em arquivo: {str(e)}")
                 success = False
@@ -247,30 +640,178 @@ class CacheManager:
         
         # Limpa memória
         if self.config['memory_enabled']:
-            with self._lock:
-                expired_keys = [
-                    k for k, v in self._memory_cache.items()
-                    if v.is_expired
-                ]
-                for key in expired_keys:
-                    del self._memory_cache[key]
-                count += len(expired_keys)
+            now = time.monotonic()
+            for stripe in self._stripes:
+                with stripe.lock:
+                    # Reconstrói a fatia numa única passada, preservando a ordem do CLOCK;
+                    # leitores sem lock veem o dicionário antigo ou o novo, ambos válidos
+                    entries = stripe.entries
+                    live = OrderedDict(
+                        (k, v) for k, v in entries.items()
+                        if v.expires_at is None or v.expires_at > now
+                    )
+                    removed = len(entries) - len(live)
+                    if removed:
+                        stripe.entries = live
+                        stripe.bytes = sum(v.size for v in live.values())
+                count += removed
                 
         # Limpa arquivos
         if self.config['file_enabled']:
             try:
-                file_count = 0
-                with self._lock:
-                    for filepath in self.cache_path.glob("*.json"):
-                        if self._is_file_expired(filepath):
-                            filepath.unlink()
-                            file_count += 1
-                count += file_count
+                self.flush()
+                if self._sqlite:
+                    count += self._sqlite.delete_expired()
+                else:
+                    file_count = 0
+                    with self._lock:
+                        # Varredura única: também reconstrói o índice de expiração após um reinício
+                        for filepath in self.cache_path.glob("*.json"):
+                            if self._is_file_expired(filepath):
+                                filepath.unlink()
+                                self._file_ttl_index.pop(filepath.name, None)
+                                file_count += 1
+                    count += file_count
             except Exception as e:
                 self.logger.error(f"Erro ao limpar arquivos expirados: {str(e)}")
                 
         return count
         
+    def _reset_negative(self) -> None:
+        """Recria o filtro de chaves ausentes, limitando a taxa de falsos positivos."""
+        self._negative = (
+            BloomFilter(NEGATIVE_CACHE_CAPACITY),
+            set(),
+            time.monotonic() + NEGATIVE_CACHE_RESET
+        )
+        
+    def _remember_missing(self, negative: Optional[Tuple[BloomFilter, Set[str], float]], key: str) -> None:
+        """
+        Registra chave ausente em todos os backends no filtro lido no início da operação.
+        Se o filtro foi recriado nesse meio tempo, a marcação vai para o antigo e se perde.
+        """
+        if negative is None:
+            return
+        bloom, written, reset_at = negative
+        if time.monotonic() >= reset_at or len(written) >= NEGATIVE_CACHE_CAPACITY:
+            if self._negative is negative:
+                self._reset_negative()
+            return
+        bloom.add(key)
+        
+    def _forget_missing(self, key: str) -> None:
+        """Chave gravada: deixa de ser tratada como ausente até o filtro ser recriado."""
+        negative = self._negative
+        if negative is not None:
+            negative[1].add(key)
+            
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda a gravação das escritas em arquivo pendentes.
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos (opcional)
+            
+        Returns:
+            True se todas foram concluídas, False caso contrário
+        """
+        futures = list(self._write_futures)
+        if not futures:
+            return True
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+        
+    def close(self) -> None:
+        """Grava as escritas pendentes e libera o escritor e o banco SQLite."""
+        if self._writer is not None:
+            self.flush()
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._sqlite is not None:
+            self._sqlite.close()
+            
+    def prewarm(self, limit: Optional[int] = None) -> int:
+        """
+        Pré-carrega na memória as entradas mais recentes do cache em arquivo.
+        As leituras são feitas em paralelo, aquecendo também o page cache do SO.
+        
+        Args:
+            limit: Máximo de entradas a carregar (padrão: max_size)
+            
+        Returns:
+            Número de entradas carregadas
+        """
+        if not (self.config['memory_enabled'] and self.config['file_enabled']):
+            return 0
+            
+        limit = limit or self.config['max_size']
+        if self._sqlite:
+            return self._prewarm_sqlite(limit)
+        try:
+            with os.scandir(self.cache_path) as it:
+                files = [
+                    (entry.stat().st_mtime, entry.path)
+                    for entry in it
+                    if entry.name.endswith('.json')
+                ]
+        except Exception as e:
+            self.logger.error(f"Erro ao listar cache em arquivo: {str(e)}")
+            return 0
+            
+        files.sort(reverse=True)
+        paths = [path for _, path in files[:limit]]
+        
+        count = 0
+        now = time.time()
+        with ThreadPoolExecutor(max_workers=16, thread_name_prefix='cache-prewarm') as executor:
+            for cache_data in executor.map(self._load_file, paths):
+                if not cache_data or 'key' not in cache_data:
+                    continue
+                expires_at = cache_data.get('expires_at')
+                ttl = None
+                if expires_at:
+                    expires_at = datetime.fromisoformat(expires_at).timestamp()
+                    self._file_ttl_index[_key_to_filename(cache_data['key'])] = expires_at
+                    ttl = expires_at - now
+                    if ttl <= 0:
+                        continue
+                if self._add_to_memory(cache_data['key'], cache_data.get('value'), ttl):
+                    count += 1
+                    
+        self.logger.info(f"Cache pré-carregado com {count} entradas")
+        return count
+        
+    def _prewarm_sqlite(self, limit: int) -> int:
+        """Pré-carrega as entradas gravadas mais recentemente no banco SQLite."""
+        try:
+            rows = self._sqlite.recent(limit)
+        except Exception as e:
+            self.logger.error(f"Erro ao ler cache SQLite: {str(e)}")
+            return 0
+            
+        count = 0
+        now = time.time()
+        for key, blob, expires_at in rows:
+            try:
+                value = _decode(blob)
+            except Exception:
+                continue
+            ttl = expires_at - now if expires_at is not None else None
+            if self._add_to_memory(key, value, ttl):
+                count += 1
+                
+        self.logger.info(f"Cache pré-carregado com {count} entradas")
+        return count
+        
+    @staticmethod
+    def _load_file(path: str) -> Optional[Dict[str, Any]]:
+        """Lê um arquivo de cache; retorna None se ilegível."""
+        try:
+            with open(path, 'rb') as f:
+                return _decode(f.read())
+        except Exception:
+            return None
+            
     def get_stats(self) -> Dict[str, Any]:
         """
         Retorna estatísticas do cache.
@@ -279,10 +820,12 @@ class CacheManager:
             Dicionário com estatísticas
         """
         stats = {
-            'config': self.config.copy(),
+            # Referência à configuração atual, sem cópia; não deve ser modificada
+            'config': self.config,
             'memory': {
-                'entries': len(self._memory_cache) if self.config['memory_enabled'] else 0,
-                'bytes': sum(len(json.dumps(v.data)) for v in self._memory_cache.values()) if self.config['memory_enabled'] else 0
+                # Somas sem lock: valores aproximados sob concorrência
+                'entries': sum(len(s.entries) for s in self._stripes) if self.config['memory_enabled'] else 0,
+                'bytes': sum(s.bytes for s in self._stripes) if self.config['memory_enabled'] else 0
             },
             'file': {
                 'entries': 0,
@@ -297,12 +840,19 @@ class CacheManager:
         # Estatísticas de arquivo
         if self.config['file_enabled']:
             try:
-                files = list(self.cache_path.glob("*.json"))
-                stats['file']['entries'] = len(files)
-                stats['file']['size_mb'] = round(
-                    sum(f.stat().st_size for f in files) / (1024 * 1024),
-                    2
-                )
+                now = time.monotonic()
+                if self._file_stats is not None and self._file_stats[0] > now:
+                    _, entries, size = self._file_stats
+                else:
+                    if self._sqlite:
+                        entries, size = self._sqlite.stats()
+                    else:
+                        files = list(self.cache_path.glob("*.json"))
+                        entries = len(files)
+                        size = sum(f.stat().st_size for f in files)
+                    self._file_stats = (now + FILE_STATS_TTL, entries, size)
+                stats['file']['entries'] = entries
+                stats['file']['size_mb'] = round(size / (1024 * 1024), 2)
             except Exception as e:
                 self.logger.error(f"Erro ao obter estatísticas de arquivo: {str(e)}")
                 
@@ -315,33 +865,65 @@ class CacheManager:
                 
         return stats
         
+    def _stripe(self, key: str) -> _Stripe:
+        """Fatia do cache em memória responsável pela chave."""
+        return self._stripes[hash(key) & self._stripe_mask]
+
     def _get_from_memory(self, key: str) -> Optional[Any]:
-        """Obtém valor do cache em memória."""
-        with self._lock:
-            if key in self._memory_cache:
-                entry = self._memory_cache[key]
-                if not entry.is_expired:
-                    # Atualiza contador de acesso
-                    entry.access_count += 1
-                    return entry.data
-                else:
-                    # Remove expirado
-                    del self._memory_cache[key]
+        """Obtém valor do cache em memória (sem lock)."""
+        if self._admission is not None:
+            self._admission.increment(key)
+        entry = self._stripe(key).entries.get(key)
+        if entry is None or entry.is_expired:
+            # Entradas expiradas saem na próxima volta do ponteiro ou em clear_expired
+            return None
+        entry.referenced = True
+        return entry.data
+
+    def _select_victim(self, stripe: _Stripe) -> Optional[str]:
+        """Avança o ponteiro do CLOCK até uma entrada sem referência (ou expirada)."""
+        entries = stripe.entries
+        # Cada entrada perde o bit no máximo uma vez: a volta termina em até len + 1 passos
+        for _ in range(len(entries) + 1):
+            key, entry = next(iter(entries.items()))
+            if entry.referenced and not entry.is_expired:
+                entry.referenced = False
+                entries.move_to_end(key)
+            else:
+                return key
         return None
         
-    def _add_to_memory(self, key: str, value: Any, expires_at: Optional[datetime] = None) -> bool:
-        """Adiciona valor ao cache em memória."""
+    def _add_to_memory(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Adiciona valor ao cache em memória; sem ttl, usa o padrão da configuração."""
         try:
-            entry = CacheEntry(data=value, expires_at=expires_at)
+            if ttl is None:
+                ttl = self.config['ttl']
+            entry = CacheEntry(data=value, expires_at=time.monotonic() + ttl, size=len(_dumps(value)))
             
-            with self._lock:
-                # Verifica tamanho máximo
-                if len(self._memory_cache) >= self.config['max_size']:
-                    # Remove o menos acessado
-                    least_used = min(self._memory_cache.items(), key=lambda x: x[1].access_count)
-                    del self._memory_cache[least_used[0]]
-                
-                self._memory_cache[key] = entry
+            stripe = self._stripe(key)
+            with stripe.lock:
+                entries = stripe.entries
+                old = entries.get(key)
+                if old is not None:
+                    # Atualização: mantém a posição no ponteiro do CLOCK
+                    entries[key] = entry
+                    stripe.bytes += entry.size - old.size
+                    return True
+
+                # Fatia cheia: escolhe a vítima; a chave nova só entra se for
+                # mais frequente que ela (vítimas expiradas saem sempre)
+                while len(entries) >= stripe.max_size:
+                    victim = self._select_victim(stripe)
+                    if victim is None:
+                        break
+                    if (self._admission is not None
+                            and not entries[victim].is_expired
+                            and not self._admission.admit(key, victim)):
+                        return True
+                    stripe.bytes -= entries.pop(victim).size
+
+                entries[key] = entry
+                stripe.bytes += entry.size
                 
             return True
         except Exception as e:
@@ -351,32 +933,85 @@ class CacheManager:
     def _get_from_file(self, key: str) -> Optional[Any]:
         """Obtém valor do cache em arquivo."""
         try:
-            filename = self._get_filename(key)
+            # Versão ainda não gravada tem precedência sobre o disco
+            pending = self._pending_writes.get(key)
+            if pending is not None:
+                value, expires_at = pending
+                if expires_at is not None and expires_at < time.time():
+                    return None
+                return value
+                
+            if self._sqlite:
+                blob = self._sqlite.get(key)
+                return _decode(blob) if blob is not None else None
+                
+            filename = _key_to_filename(key)
             filepath = self.cache_path / filename
             
-            if not filepath.exists():
+            # Expiração já conhecida: descarta sem abrir o arquivo
+            expires_ts = self._file_ttl_index.get(filename)
+            if expires_ts is not None and expires_ts < time.time():
+                self._remove_expired_file(filepath)
                 return None
                 
-            if self._is_file_expired(filepath):
-                # Remove arquivo expirado
-                with self._lock:
-                    filepath.unlink()
+            # Leitura única: existência e expiração saem do mesmo open
+            try:
+                with open(filepath, 'rb') as f:
+                    cache_data = _decode(f.read())
+                    mtime = os.fstat(f.fileno()).st_mtime
+            except FileNotFoundError:
+                self._file_ttl_index.pop(filename, None)
                 return None
                 
-            # Lê arquivo
-            with open(filepath, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-                
+            if expires_ts is None:
+                expires_ts = self._file_deadline(cache_data, mtime)
+                self._file_ttl_index[filename] = expires_ts
+                if expires_ts < time.time():
+                    self._remove_expired_file(filepath)
+                    return None
+                    
             return cache_data.get('value')
             
         except Exception as e:
             self.logger.error(f"Erro ao ler de arquivo: {str(e)}")
             return None
             
-    def _add_to_file(self, key: str, value: Any, expires_at: Optional[datetime] = None) -> bool:
-        """Adiciona valor ao cache em arquivo."""
+    def _add_to_file(self, key: str, value: Any, expires_at: Optional[float] = None) -> bool:
+        """Enfileira a escrita do valor no cache em arquivo; retorna sem esperar o disco."""
         try:
-            filename = self._get_filename(key)
+            with self._pending_lock:
+                self._pending_writes[key] = (value, expires_at)
+            future = self._writer.submit(self._flush_file_write, key)
+            self._write_futures.add(future)
+            future.add_done_callback(self._write_futures.discard)
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao agendar escrita em arquivo: {str(e)}")
+            with self._pending_lock:
+                self._pending_writes.pop(key, None)
+            return False
+            
+    def _flush_file_write(self, key: str) -> None:
+        """Grava a versão pendente mais recente da chave (executado no escritor)."""
+        with self._lock:
+            pending = self._pending_writes.get(key)
+            if pending is None:
+                # Já gravada por uma tarefa anterior, ou removida
+                return
+            self._write_file(key, *pending)
+            with self._pending_lock:
+                # Uma versão mais nova enfileirada nesse meio tempo continua pendente
+                if self._pending_writes.get(key) is pending:
+                    del self._pending_writes[key]
+                
+    def _write_file(self, key: str, value: Any, expires_at: Optional[float]) -> bool:
+        """Grava valor no cache em arquivo; chamado com self._lock."""
+        try:
+            if self._sqlite:
+                self._sqlite.set(key, _encode(value), expires_at)
+                return True
+                
+            filename = _key_to_filename(key)
             filepath = self.cache_path / filename
             
             # Prepara dados
@@ -384,14 +1019,25 @@ class CacheManager:
                 'key': key,
                 'value': value,
                 'timestamp': datetime.now().isoformat(),
-                'expires_at': expires_at.isoformat() if expires_at else None
+                'expires_at': datetime.fromtimestamp(expires_at).isoformat() if expires_at else None
             }
             
-            # Salva arquivo
-            with self._lock:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            # Backend legado 'json': escrita direta no descritor, sem o buffer do objeto arquivo
+            data = _encode(cache_data)
+            fd = os.open(filepath, _WRITE_FLAGS, 0o644)
+            try:
+                if len(data) >= FALLOCATE_MIN_SIZE and hasattr(os, 'posix_fallocate'):
+                    # Reserva o tamanho final de uma vez, evitando extensões sucessivas
+                    os.posix_fallocate(fd, 0, len(data))
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
                     
+            self._file_ttl_index[filename] = (
+                expires_at if expires_at else time.time() + self.config['ttl']
+            )
             return True
             
         except Exception as e:
@@ -409,7 +1055,7 @@ class CacheManager:
                 return None
                 
             # Decodifica JSON
-            return json.loads(raw_data)
+            return _decode(raw_data)
             
         except Exception as e:
             self.logger.error(f"Erro ao ler do Redis: {str(e)}")
@@ -422,7 +1068,7 @@ class CacheManager:
                 return False
                 
             # Codifica JSON
-            json_data = json.dumps(value)
+            json_data = _encode(value)
             
             # Salva com TTL
             self._redis_client.setex(key, ttl, json_data)
@@ -432,34 +1078,61 @@ class CacheManager:
             self.logger.error(f"Erro ao salvar no Redis: {str(e)}")
             return False
             
-    def _get_filename(self, key: str) -> str:
-        """Gera nome do arquivo para uma chave."""
-        # Gera hash MD5 da chave
-        hash_md5 = hashlib.md5(key.encode())
-        return f"{hash_md5.hexdigest()}.json"
+    async def _aget_from_redis(self, key: str) -> Optional[Any]:
+        """Obtém valor do cache Redis (cliente assíncrono)."""
+        try:
+            raw_data = await self._async_redis_client.get(key)
+            if not raw_data:
+                return None
+            return _decode(raw_data)
+        except Exception as e:
+            self.logger.error(f"Erro ao ler do Redis: {str(e)}")
+            return None
+            
+    async def _aadd_to_redis(self, key: str, value: Any, ttl: int) -> bool:
+        """Adiciona valor ao cache Redis (cliente assíncrono)."""
+        try:
+            await self._async_redis_client.setex(key, ttl, _encode(value))
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar no Redis: {str(e)}")
+            return False
+            
+    def _file_deadline(self, cache_data: Dict[str, Any], mtime: float) -> float:
+        """Expiração (epoch) de um arquivo: expires_at explícito ou mtime + ttl."""
+        if cache_data.get('expires_at'):
+            return datetime.fromisoformat(cache_data['expires_at']).timestamp()
+        return mtime + self.config['ttl']
         
+    def _remove_expired_file(self, filepath: Path) -> None:
+        """Remove arquivo expirado e sua entrada no índice."""
+        self._file_ttl_index.pop(filepath.name, None)
+        try:
+            with self._lock:
+                filepath.unlink()
+        except FileNotFoundError:
+            pass
+            
     def _is_file_expired(self, filepath: Path) -> bool:
         """Verifica se arquivo está expirado."""
         try:
-            # Verifica se arquivo existe
-            if not filepath.exists():
-                return True
-                
-            # Lê arquivo para verificar expires_at explícito
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                    
-                if cache_data.get('expires_at'):
-                    expires_at = datetime.fromisoformat(cache_data['expires_at'])
-                    return datetime.now() > expires_at
-            except:
-                pass
+            expires_ts = self._file_ttl_index.get(filepath.name)
+            if expires_ts is None:
+                # Desconhecido (ex.: após reinício): lê uma vez e registra no índice
+                try:
+                    with open(filepath, 'rb') as f:
+                        cache_data = _decode(f.read())
+                        mtime = os.fstat(f.fileno()).st_mtime
+                except FileNotFoundError:
+                    return True
+                except Exception:
+                    # Conteúdo ilegível: usa apenas a data de modificação
+                    cache_data, mtime = {}, filepath.stat().st_mtime
+                expires_ts = self._file_deadline(cache_data, mtime)
+                self._file_ttl_index[filepath.name] = expires_ts
                 
-            # Fallback para verificar pela data de modificação
-            mtime = datetime.fromtimestamp(filepath.stat().st_mtime)
-            return datetime.now() - mtime > timedelta(seconds=self.config['ttl'])
+            return time.time() > expires_ts
             
         except Exception as e:
             self.logger.error(f"Erro ao verificar expiração de arquivo: {str(e)}")
-            return True 
\ No newline at end of file
+            return True 
@@ -0,0 +1,108 @@
+"""
+Armazenamento do cache persistente em um único banco SQLite (modo WAL).
+
+Substitui um arquivo por chave: buscas usam o índice da chave primária,
+a limpeza de expirados é um único DELETE e as estatísticas são agregações.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    k TEXT PRIMARY KEY,
+    v BLOB NOT NULL,
+    expires_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_updated_at ON cache(updated_at);
+"""
+
+
+class SQLiteStore:
+    """Tabela chave/valor com expiração; uma conexão por thread."""
+
+    def __init__(self, path: Path):
+        """
+        Abre (ou cria) o banco.
+
+        Args:
+            path: Caminho do arquivo do banco
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão da thread atual, criada na primeira utilização."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False, timeout=5.0)
+            # WAL: leitores não bloqueiam o escritor; NORMAL evita fsync a cada commit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Valor da chave, se existir e não estiver expirado."""
+        row = self._connection().execute(
+            "SELECT v FROM cache WHERE k = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, expires_at: Optional[float]) -> None:
+        """Grava (ou substitui) a chave; expires_at em segundos desde a época."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (k, v, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, time.time())
+        )
+
+    def delete(self, key: str) -> None:
+        """Remove a chave."""
+        self._connection().execute("DELETE FROM cache WHERE k = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove todas as chaves."""
+        self._connection().execute("DELETE FROM cache")
+
+    def delete_expired(self) -> int:
+        """Remove as chaves expiradas; retorna quantas foram removidas."""
+        cursor = self._connection().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Tuple[int, int]:
+        """Número de entradas e total de bytes armazenados."""
+        count, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(v)), 0) FROM cache"
+        ).fetchone()
+        return count, size
+
+    def recent(self, limit: int) -> List[Tuple[str, bytes, Optional[float]]]:
+        """Entradas válidas mais recentemente gravadas."""
+        return self._connection().execute(
+            "SELECT k, v, expires_at FROM cache "
+            "WHERE expires_at IS NULL OR expires_at > ? "
+            "ORDER BY updated_at DESC LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+
+    def close(self) -> None:
+        """Fecha as conexões de todas as threads."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
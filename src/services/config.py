@@ -10,6 +10,21 @@ logger = logging.getLogger(__name__)
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Sentinela para chaves ausentes no cache de get()
+_MISSING = object()
+
+def _env_bool(key: str, default: str) -> bool:
+    """Lê variável de ambiente booleana ('true', sem diferenciar maiúsculas)."""
+    return os.environ.get(key, default).lower() == 'true'
+
+def _env_int(key: str, default: str) -> int:
+    """Lê variável de ambiente inteira."""
+    return int(os.environ.get(key, default))
+
+def _env_float(key: str, default: str) -> float:
+    """Lê variável de ambiente de ponto flutuante."""
+    return float(os.environ.get(key, default))
+
 class Config:
     """
     Configuração centralizada do sistema.
@@ -34,6 +49,8 @@ class Config:
         
         # Carrega configurações
         self.config = self._load_config()
+        # Resultados de get() por chave pontuada; invalidado em set()
+        self._get_cache: Dict[str, Any] = {}
         
     def _ensure_directories(self):
         """Cria diretórios necessários."""
@@ -55,44 +72,49 @@ class Config:
             'cache': {
                 'memory_enabled': True,
                 'file_enabled': True,
-                'redis_enabled': os.environ.get('REDIS_ENABLED', 'false').lower() == 'true',
+                'redis_enabled': _env_bool('REDIS_ENABLED', 'false'),
                 'cache_path': str(self.cache_path),
-                'ttl': int(os.environ.get('CACHE_TTL', '3600')),
-                'max_size': int(os.environ.get('CACHE_MAX_SIZE', '1000')),
-                'redis_url': os.environ.get('REDIS_URL', None)
+                'file_backend': os.environ.get('CACHE_FILE_BACKEND', 'sqlite'),
+                'ttl': _env_int('CACHE_TTL', '3600'),
+                'max_size': _env_int('CACHE_MAX_SIZE', '1000'),
+                'admission_enabled': _env_bool('CACHE_ADMISSION_ENABLED', 'true'),
+                'negative_cache_enabled': _env_bool('CACHE_NEGATIVE_ENABLED', 'true'),
+                'redis_url': os.environ.get('REDIS_URL', None),
+                'redis_pool_size': _env_int('REDIS_POOL_SIZE', '32')
             },
             'proxy': {
-                'enabled': os.environ.get('PROXY_ENABLED', 'false').lower() == 'true',
+                'enabled': _env_bool('PROXY_ENABLED', 'false'),
                 'provider': os.environ.get('PROXY_PROVIDER', 'brightdata'),
                 'username': os.environ.get('BRIGHTDATA_USERNAME', ''),
                 'password': os.environ.get('BRIGHTDATA_PASSWORD', ''),
                 'host': os.environ.get('PROXY_HOST', 'brd.superproxy.io'),
-                'port': int(os.environ.get('PROXY_PORT', '22225')),
+                'port': _env_int('PROXY_PORT', '22225'),
                 'country': os.environ.get('PROXY_COUNTRY', 'br'),
-                'rotation_interval': int(os.environ.get('PROXY_ROTATION_INTERVAL', '300'))
+                'rotation_interval': _env_int('PROXY_ROTATION_INTERVAL', '300')
             },
             'metrics': {
-                'prometheus_enabled': os.environ.get('PROMETHEUS_ENABLED', 'false').lower() == 'true',
-                'prometheus_port': int(os.environ.get('PROMETHEUS_PORT', '8000')),
+                'prometheus_enabled': _env_bool('PROMETHEUS_ENABLED', 'false'),
+                'prometheus_port': _env_int('PROMETHEUS_PORT', '8000'),
                 'file_enabled': True,
                 'file_path': str(self.metrics_path),
-                'retention_days': int(os.environ.get('METRICS_RETENTION_DAYS', '7'))
+                'retention_days': _env_int('METRICS_RETENTION_DAYS', '7'),
+                'record_mode': os.environ.get('METRICS_RECORD_MODE', 'full')
             },
             'browser': {
-                'headless': os.environ.get('BROWSER_HEADLESS', 'true').lower() == 'true',
-                'timeout': int(os.environ.get('BROWSER_TIMEOUT', '30000')),
+                'headless': _env_bool('BROWSER_HEADLESS', 'true'),
+                'timeout': _env_int('BROWSER_TIMEOUT', '30000'),
                 'user_agent': os.environ.get('BROWSER_USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36')
             },
             'scraping': {
-                'min_delay': float(os.environ.get('SCRAPING_MIN_DELAY', '1.0')),
-                'max_delay': float(os.environ.get('SCRAPING_MAX_DELAY', '3.0')),
-                'max_retries': int(os.environ.get('SCRAPING_MAX_RETRIES', '3')),
-                'retry_delay': float(os.environ.get('SCRAPING_RETRY_DELAY', '2.0'))
+                'min_delay': _env_float('SCRAPING_MIN_DELAY', '1.0'),
+                'max_delay': _env_float('SCRAPING_MAX_DELAY', '3.0'),
+                'max_retries': _env_int('SCRAPING_MAX_RETRIES', '3'),
+                'retry_delay': _env_float('SCRAPING_RETRY_DELAY', '2.0')
             },
             'logging': {
                 'level': os.environ.get('LOG_LEVEL', 'INFO'),
                 'rotation_size': os.environ.get('LOG_ROTATION_SIZE', '10 MB'),
-                'retention_days': int(os.environ.get('LOG_RETENTION_DAYS', '7')),
+                'retention_days': _env_int('LOG_RETENTION_DAYS', '7'),
                 'file_path': str(self.logs_path)
             }
         }
@@ -111,29 +133,35 @@ class Config:
         return config
     
     def _deep_update(self, d: Dict, u: Dict) -> Dict:
-        """Atualiza recursivamente um dicionário."""
-        for k, v in u.items():
-            if isinstance(v, Dict) and k in d and isinstance(d[k], Dict):
-                self._deep_update(d[k], v)
-            else:
-                d[k] = v
+        """Atualiza um dicionário aninhado (mescla profunda, sem recursão)."""
+        stack = [(d, u)]
+        while stack:
+            dst, src = stack.pop()
+            for k, v in src.items():
+                if isinstance(v, dict) and isinstance(dst.get(k), dict):
+                    stack.append((dst[k], v))
+                else:
+                    dst[k] = v
         return d
         
     def get(self, key: str, default: Any = None) -> Any:
         """Obtém configuração por chave, suporta notação com pontos."""
-        keys = key.split('.')
-        result = self.config
-        
-        for k in keys:
-            if isinstance(result, Dict) and k in result:
-                result = result[k]
-            else:
-                return default
-                
-        return result
+        result = self._get_cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = self.config
+            for k in key.split('.'):
+                if isinstance(result, dict) and k in result:
+                    result = result[k]
+                else:
+                    result = _MISSING
+                    break
+            self._get_cache[key] = result
+            
+        return default if result is _MISSING else result
         
     def set(self, key: str, value: Any) -> None:
         """Define configuração por chave, suporta notação com pontos."""
+        self._get_cache.clear()
         keys = key.split('.')
         config = self.config
         
@@ -10,15 +10,21 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Serviços conhecidos; cada um é um slot do contêiner
+SERVICE_NAMES = ('cache', 'metrics', 'proxy')
+
 class ServiceContainer:
     """
     Contêiner de serviços para injeção de dependência.
     
-    Gerencia o ciclo de vida dos serviços compartilhados.
+    Gerencia o ciclo de vida dos serviços compartilhados. Os serviços conhecidos
+    ficam em slots, então os atalhos get_cache/get_metrics/get_proxy são uma
+    simples leitura de atributo; outros nomes vão para um dicionário.
     """
+    __slots__ = SERVICE_NAMES + ('_extra', '_initialized')
     
     def __init__(self):
-        self._services: Dict[str, Any] = {}
+        self._extra: Dict[str, Any] = {}
         self._initialized = False
         
     async def initialize(self) -> None:
@@ -34,6 +40,9 @@ class ServiceContainer:
         # Inicializa serviços assíncronos
         await proxy_manager.initialize()
         
+        # Aquece o cache em memória com as entradas recentes em arquivo
+        await asyncio.get_running_loop().run_in_executor(None, cache_manager.prewarm)
+        
         # Registra serviços
         self.register('cache', cache_manager)
         self.register('metrics', metrics_manager)
@@ -45,10 +54,21 @@ class ServiceContainer:
     async def cleanup(self) -> None:
         """Limpa recursos dos serviços."""
         # Limpa serviços assíncronos
-        if 'proxy' in self._services:
-            await self.get('proxy').close()
+        if hasattr(self, 'proxy'):
+            await self.proxy.close()
+            
+        # Grava escritas pendentes do cache em arquivo
+        if hasattr(self, 'cache'):
+            await asyncio.get_running_loop().run_in_executor(None, self.cache.close)
+            
+        # Exporta eventos de métricas pendentes
+        if hasattr(self, 'metrics'):
+            await asyncio.get_running_loop().run_in_executor(None, self.metrics.close)
             
-        self._services.clear()
+        for name in SERVICE_NAMES:
+            if hasattr(self, name):
+                delattr(self, name)
+        self._extra.clear()
         self._initialized = False
         logger.info("Serviços limpos")
         
@@ -60,7 +80,10 @@ class ServiceContainer:
             name: Nome do serviço
             service: Instância do serviço
         """
-        self._services[name] = service
+        if name in SERVICE_NAMES:
+            setattr(self, name, service)
+        else:
+            self._extra[name] = service
         
     def get(self, name: str) -> Any:
         """
@@ -75,10 +98,15 @@ class ServiceContainer:
         Raises:
             KeyError: Se o serviço não existir
         """
-        if name not in self._services:
-            raise KeyError(f"Serviço não encontrado: {name}")
+        if name in SERVICE_NAMES:
+            try:
+                return getattr(self, name)
+            except AttributeError:
+                pass
+        elif name in self._extra:
+            return self._extra[name]
             
-        return self._services[name]
+        raise KeyError(f"Serviço não encontrado: {name}")
         
     def get_typed(self, name: str, type_cls: Type[T]) -> T:
         """
@@ -104,15 +132,24 @@ class ServiceContainer:
         
     def get_cache(self) -> CacheManager:
         """Atalho para obter o gerenciador de cache."""
-        return self.get_typed('cache', CacheManager)
+        try:
+            return self.cache
+        except AttributeError:
+            raise KeyError("Serviço não encontrado: cache") from None
         
     def get_metrics(self) -> MetricsManager:
         """Atalho para obter o gerenciador de métricas."""
-        return self.get_typed('metrics', MetricsManager)
+        try:
+            return self.metrics
+        except AttributeError:
+            raise KeyError("Serviço não encontrado: metrics") from None
         
     def get_proxy(self) -> ProxyManager:
         """Atalho para obter o gerenciador de proxy."""
-        return self.get_typed('proxy', ProxyManager)
+        try:
+            return self.proxy
+        except AttributeError:
+            raise KeyError("Serviço não encontrado: proxy") from None
         
     def is_initialized(self) -> bool:
         """Verifica se o contêiner foi inicializado."""
@@ -3,4 +3,6 @@ Serviço de métricas centralizado.
 Fornece uma implementação unificada de métricas baseada em Prometheus.
 """
  
-from .manager import MetricsManager 
\ No newline at end of file
+from .manager import MetricsManager, read_metrics_file 
+
+__all__ = ['MetricsManager', 'read_metrics_file']
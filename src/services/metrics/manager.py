@@ -1,13 +1,23 @@
-from typing import Dict, Any, Optional, List, Union, Callable
+from typing import Deque, Dict, Any, Mapping, Optional, List, Tuple, Union, Callable
 import time
 import logging
+import atexit
+import functools
 import json
 import os
-from datetime import datetime, timedelta
-from threading import Lock
+import random
+import sys
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import Lock, RLock
 from pathlib import Path
+from types import MappingProxyType
 import threading
 
+from src.compat import DATACLASS_SLOTS
+from .sketch import DurationSketch
+
 # Verificação condicional para importação do prometheus_client
 try:
     from prometheus_client import Counter, Histogram, Gauge, start_http_server
@@ -15,43 +25,216 @@ try:
 except ImportError:
     PROMETHEUS_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _dumps_line(obj: Any) -> bytes:
+    """Serializa um objeto como uma linha JSON compacta em bytes (orjson quando disponível)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+# Quantas extrações recentes cada estratégia considera nos alertas de taxa;
+# totais vitalícios nunca deixariam o alerta cessar
+ALERT_WINDOW = 200
+
+@dataclass(**DATACLASS_SLOTS)
+class StrategyState:
+    """Contadores de uma estratégia, protegidos pelo lock da própria estratégia."""
+    lock: Lock = field(default_factory=Lock)
+    success: int = 0
+    failure: int = 0
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    error_total: int = 0
+    blocks: int = 0
+    captchas: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # Quantis de duração com memória constante (erro relativo de 1%)
+    durations: DurationSketch = field(default_factory=DurationSketch)
+    # Agregados de duração mantidos no registro; o resumo não percorre a lista para eles
+    duration_sum: float = 0.0
+    duration_min: float = float('inf')
+    duration_max: float = float('-inf')
+    confidence: Optional[float] = None
+    # Janela de alertas: só extrações ocupam posições, cada uma como
+    # [falhou, bloqueios, CAPTCHAs]; bloqueios e CAPTCHAs contam na extração mais
+    # recente, então uma rajada deles não empurra as extrações para fora da janela
+    recent: Deque[List[int]] = field(default_factory=lambda: deque(maxlen=ALERT_WINDOW))
+    recent_failures: int = 0
+    recent_blocks: int = 0
+    recent_captchas: int = 0
+    # Incrementos de contadores do Prometheus ainda não aplicados, por métrica filha;
+    # flush_prometheus() troca o dicionário sob o lock da estratégia
+    pending_prom: Dict[Any, float] = field(default_factory=lambda: defaultdict(float))
+    
+    def push_extraction(self, failed: bool) -> None:
+        """Adiciona uma extração à janela de alertas (chamar com o lock da estratégia)."""
+        recent = self.recent
+        if len(recent) == recent.maxlen:
+            old_failed, old_blocks, old_captchas = recent[0]
+            self.recent_failures -= old_failed
+            self.recent_blocks -= old_blocks
+            self.recent_captchas -= old_captchas
+        recent.append([int(failed), 0, 0])
+        self.recent_failures += failed
+        
+    def push_block(self) -> None:
+        """Conta um bloqueio na extração mais recente da janela (se houver alguma)."""
+        if self.recent:
+            self.recent[-1][1] += 1
+            self.recent_blocks += 1
+            
+    def push_captcha(self) -> None:
+        """Conta um CAPTCHA na extração mais recente da janela (se houver alguma)."""
+        if self.recent:
+            self.recent[-1][2] += 1
+            self.recent_captchas += 1
+
+# Intervalo entre exportações periódicas e atraso aleatório máximo somado a ele (segundos);
+# o atraso evita que todos os processos gravem no mesmo instante
+EXPORT_INTERVAL = 3600
+EXPORT_JITTER = 60
+
+# Intervalo (segundos) em que incrementos acumulados são repassados aos contadores do Prometheus
+PROM_FLUSH_INTERVAL = 1.0
+
+# Percentis de duração do resumo (p50, p90, p95, p99)
+SUMMARY_QUANTILES = (0.50, 0.90, 0.95, 0.99)
+
+# Máximo de combinações de labels compartilhadas entre eventos
+LABELS_CACHE_SIZE = 4096
+
+# Valores de label de um conjunto pequeno e fixo, reutilizados em vez de str(bool) a cada registro
+_TRUE_STR = 'True'
+_FALSE_STR = 'False'
+_NULL_STR = 'null'
+_SUCCESS = 'success'
+_FAILURE = 'failure'
+_EMPTY_LABELS: Mapping[str, str] = MappingProxyType({})
+
+@functools.lru_cache(maxsize=LABELS_CACHE_SIZE)
+def _shared_labels(strategy: str, *items: str) -> Mapping[str, str]:
+    """
+    Labels de estratégia reutilizados por eventos iguais.
+    
+    Args:
+        strategy: Nome da estratégia
+        items: Pares adicionais nome, valor (achatados)
+        
+    Returns:
+        Mapeamento somente leitura, compartilhado entre os eventos
+    """
+    labels = {'strategy': strategy}
+    for i in range(0, len(items), 2):
+        labels[items[i]] = items[i + 1]
+    return MappingProxyType(labels)
+
+# Ordem dos campos de cada linha exportada; gravada uma vez no cabeçalho de cada arquivo
+EVENT_SCHEMA = ('event_type', 'category', 'value', 'labels', 'timestamp')
+_EVENT_SCHEMA_LINE = _dumps_line({'schema': list(EVENT_SCHEMA)})
+
 class MetricsEvent:
     """Representa um evento de métrica."""
+    __slots__ = EVENT_SCHEMA
+    
     def __init__(self, 
                 event_type: str,
                 category: str,
                 value: Union[float, int, bool, str],
-                labels: Optional[Dict[str, str]] = None,
-                timestamp: Optional[datetime] = None):
+                labels: Optional[Mapping[str, str]] = None,
+                timestamp: Optional[float] = None):
         self.event_type = event_type
         self.category = category
         self.value = value
-        self.labels = labels or {}
-        self.timestamp = timestamp or datetime.now()
+        self.labels = labels or _EMPTY_LABELS
+        # Epoch em segundos; convertido para ISO só na exportação
+        self.timestamp = timestamp if timestamp is not None else time.time()
+    
+    def to_row(self) -> List[Any]:
+        """Converte o evento para uma lista posicional, na ordem de EVENT_SCHEMA."""
+        return [
+            self.event_type,
+            self.category,
+            self.value,
+            # Labels compartilhados são MappingProxyType, que os serializadores JSON não aceitam
+            dict(self.labels),
+            # UTC com sufixo "Z": independe do fuso e do horário de verão da máquina
+            datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat()[:-6] + 'Z'
+        ]
     
     def to_dict(self) -> Dict[str, Any]:
         """Converte o evento para um dicionário."""
-        return {
-            'event_type': self.event_type,
-            'category': self.category,
-            'value': self.value,
-            'labels': self.labels,
-            'timestamp': self.timestamp.isoformat()
-        }
+        return dict(zip(EVENT_SCHEMA, self.to_row()))
+    
+    @classmethod
+    def from_row(cls, row: List[Any], schema: Tuple[str, ...] = EVENT_SCHEMA) -> 'MetricsEvent':
+        """Cria um evento a partir de uma linha posicional e do esquema do arquivo."""
+        return cls.from_dict(dict(zip(schema, row)))
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'MetricsEvent':
         """Cria um evento a partir de um dicionário."""
+        timestamp = data['timestamp']
+        if timestamp.endswith('Z'):
+            # fromisoformat só aceita "Z" a partir do Python 3.11
+            timestamp = timestamp[:-1] + '+00:00'
         return cls(
             event_type=data['event_type'],
             category=data['category'],
             value=data['value'],
             labels=data['labels'],
-            timestamp=datetime.fromisoformat(data['timestamp'])
+            # Arquivos antigos têm horário local sem fuso, que timestamp() também interpreta
+            timestamp=datetime.fromisoformat(timestamp).timestamp()
         )
 
+def read_metrics_file(filepath: Union[str, Path]) -> List[MetricsEvent]:
+    """
+    Lê um arquivo de métricas exportado.
+    
+    Aceita o formato atual (cabeçalho {"schema": [...]} seguido de uma lista
+    posicional por linha), linhas antigas com um objeto por evento e os
+    arquivos metrics_*.json anteriores, com um único array JSON de objetos.
+    
+    Args:
+        filepath: Caminho do arquivo .ndjson (ou .json legado)
+        
+    Returns:
+        Eventos na ordem do arquivo
+    """
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    with open(filepath, 'rb') as f:
+        content = f.read()
+        
+    # Formato legado: o arquivo inteiro é um array, possivelmente indentado
+    if content.lstrip().startswith(b'['):
+        return [MetricsEvent.from_dict(data) for data in loads(content)]
+        
+    events = []
+    schema: Tuple[str, ...] = EVENT_SCHEMA
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        data = loads(line)
+        if isinstance(data, list):
+            events.append(MetricsEvent.from_row(data, schema))
+        elif 'schema' in data:
+            schema = tuple(data['schema'])
+        else:
+            events.append(MetricsEvent.from_dict(data))
+    return events
+
 class MetricsManager:
     """
     Gerenciador unificado de métricas.
@@ -75,6 +258,9 @@ class MetricsManager:
                 file_path: str - Caminho para o arquivo de métricas
                 history_size: int - Tamanho máximo do histórico em memória
                 retention_days: int - Dias de retenção para métricas em arquivo
+                record_mode: str - O que é mantido em memória a cada registro:
+                    'full' (eventos e agregados), 'summary' (só agregados por
+                    estratégia, sem eventos) ou 'prom_only' (nada; apenas Prometheus)
         """
         # Configuração padrão
         self.config = {
@@ -84,6 +270,7 @@ class MetricsManager:
             'file_path': 'data/metrics',
             'history_size': 1000,
             'retention_days': 7,
+            'record_mode': 'full',
             'alert_thresholds': {
                 'error_rate': 0.2,  # 20%
                 'block_rate': 0.1,  # 10%
@@ -99,28 +286,61 @@ class MetricsManager:
             
         # Inicialização
         self.logger = logging.getLogger("metrics_manager")
+        # Lock global apenas para eventos e callbacks; contadores ficam
+        # por estratégia, de modo que estratégias concorrentes não disputam lock
         self._lock = Lock()
-        self._events: List[MetricsEvent] = []
-        self._counters: Dict[str, Dict[str, float]] = {}
-        self._gauges: Dict[str, Dict[str, float]] = {}
-        self._histograms: Dict[str, List[float]] = {}
+        # Buffer circular: acima de history_size os eventos mais antigos são descartados
+        self._events: Deque[MetricsEvent] = deque(maxlen=self.config['history_size'])
+        # Eventos já exportados, reaproveitados pelos próximos registros
+        self._event_pool: Deque[MetricsEvent] = deque(maxlen=self.config['history_size'])
+        # Última leitura de recursos (memória em bytes, CPU %), trocada numa única atribuição
+        self._resources: Tuple[int, float] = (0, 0)
+        self._strategy_state: Dict[str, StrategyState] = {}
+        self._strategy_state_lock = RLock()
         self._alert_callbacks: List[Callable[[str, Dict[str, Any]], None]] = []
         
+        # Consumidores do lado Python, decididos uma vez: eventos só alimentam a
+        # exportação em arquivo; agregados por estratégia alimentam o resumo e os alertas
+        record_mode = self.config['record_mode']
+        if record_mode not in ('full', 'summary', 'prom_only'):
+            raise ValueError(f"record_mode inválido: {record_mode}")
+        self._need_events = record_mode == 'full'
+        self._need_state = record_mode != 'prom_only'
+        
+        # Processo e memória total resolvidos uma vez; a primeira leitura de CPU
+        # só define a referência para as leituras não bloqueantes seguintes
+        self._process = None
+        self._total_memory = 0
+        if PSUTIL_AVAILABLE:
+            try:
+                self._process = psutil.Process()
+                self._process.cpu_percent(None)
+                self._total_memory = psutil.virtual_memory().total
+            except Exception as e:
+                self.logger.warning(f"psutil indisponível para métricas de recursos: {str(e)}")
+                self._process = None
+            
         # Inicializa armazenamento em arquivo
         if self.config['file_enabled']:
             self.metrics_path = Path(self.config['file_path'])
             self.metrics_path.mkdir(parents=True, exist_ok=True)
             
         # Inicializa Prometheus
+        # Métricas filhas já resolvidas por (métrica, labels...), evitando .labels() a cada registro
+        self._prom_children: Dict[Tuple[str, ...], Any] = {}
         if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
             self._setup_prometheus()
+        # Calculado uma vez (após a configuração, que pode desabilitar o Prometheus)
+        self._prom_on = bool(self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE)
             
-        # Inicia thread de exportação periódica
+        # Inicia thread de exportação periódica; close() a encerra e faz a exportação final
+        self._stop = threading.Event()
         self._export_thread = threading.Thread(
             target=self._periodic_export,
             daemon=True
         )
         self._export_thread.start()
+        atexit.register(self.close)
             
     def _setup_prometheus(self) -> None:
         """Configura métricas do Prometheus."""
@@ -198,6 +418,69 @@ class MetricsManager:
             self.logger.error(f"Erro ao configurar Prometheus: {str(e)}")
             self.config['prometheus_enabled'] = False
             
+    def _child(self, metric: Any, key: Tuple[str, ...], **labels: str) -> Any:
+        """
+        Métrica filha do Prometheus para os labels, resolvida uma única vez por chave.
+        
+        Como as demais chamadas ao Prometheus (que têm locks internos), deve ser
+        usada só depois de liberados os locks do gerenciador.
+        """
+        child = self._prom_children.get(key)
+        if child is None:
+            child = self._prom_children[key] = metric.labels(**labels)
+        return child
+        
+    def _count(self, strategy: str, child: Any, amount: float = 1) -> None:
+        """
+        Acumula um incremento de contador para o próximo flush_prometheus().
+        
+        O acúmulo fica no estado da estratégia, sob o lock dela: estratégias
+        concorrentes não disputam um lock global.
+        """
+        state = self._state(strategy)
+        with state.lock:
+            state.pending_prom[child] += amount
+            
+    def flush_prometheus(self) -> None:
+        """Aplica aos contadores do Prometheus os incrementos acumulados."""
+        for state in list(self._strategy_state.values()):
+            with state.lock:
+                if not state.pending_prom:
+                    continue
+                pending, state.pending_prom = state.pending_prom, defaultdict(float)
+                
+            # Um único inc(n) por filha, fora do lock da estratégia
+            for child, amount in pending.items():
+                try:
+                    child.inc(amount)
+                except Exception as e:
+                    self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
+                
+    def _new_event(self, event_type: str, category: str, value: Any,
+                   labels: Mapping[str, str]) -> MetricsEvent:
+        """Evento com timestamp atual, reaproveitado do pool quando houver um livre."""
+        try:
+            # pop() é atômico: duas threads nunca recebem o mesmo objeto
+            event = self._event_pool.pop()
+        except IndexError:
+            event = MetricsEvent.__new__(MetricsEvent)
+        event.event_type = event_type
+        event.category = category
+        event.value = value
+        event.labels = labels
+        event.timestamp = time.time()
+        return event
+        
+    def _state(self, strategy: str) -> StrategyState:
+        """Estado da estratégia; o lock global só é usado ao criar uma nova."""
+        state = self._strategy_state.get(strategy)
+        if state is None:
+            with self._strategy_state_lock:
+                state = self._strategy_state.get(strategy)
+                if state is None:
+                    state = self._strategy_state[strategy] = StrategyState()
+        return state
+        
     def register_alert_callback(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
         """
         Registra uma callback para alertas.
@@ -219,57 +502,77 @@ class MetricsManager:
             duration: Duração da extração em segundos
             confidence: Confiança da extração (opcional)
         """
+        # Uma única instância por nome: buscas nos dicionários de estado e de
+        # métricas filhas resolvem por identidade
+        strategy = sys.intern(strategy)
         # Registra evento
-        event = MetricsEvent(
-            event_type='extraction',
-            category='scraping',
-            value=duration,
-            labels={
-                'strategy': strategy,
-                'success': str(success),
-                'confidence': str(confidence) if confidence is not None else 'null'
-            }
-        )
+        if self._need_events:
+            event = self._new_event(
+                event_type='extraction',
+                category='scraping',
+                value=duration,
+                labels=_shared_labels(
+                    strategy, 'success', _TRUE_STR if success else _FALSE_STR, 'confidence', _NULL_STR
+                ) if confidence is None else {
+                    'strategy': strategy,
+                    'success': _TRUE_STR if success else _FALSE_STR,
+                    'confidence': str(confidence)
+                }
+            )
+            
+            with self._lock:
+                self._events.append(event)
         
-        with self._lock:
-            self._events.append(event)
-            
-            # Atualiza contadores
-            counter_key = f"extraction_{strategy}_{'success' if success else 'failure'}"
-            self._increment_counter(counter_key, 1)
-            
-            # Atualiza histograma
-            histogram_key = f"duration_{strategy}"
-            if histogram_key not in self._histograms:
-                self._histograms[histogram_key] = []
-            self._histograms[histogram_key].append(duration)
-            
-            # Atualiza gauge de confiança
-            if confidence is not None:
-                gauge_key = f"confidence_{strategy}"
-                self._set_gauge(gauge_key, confidence)
+        if self._need_state:
+            state = self._state(strategy)
+            with state.lock:
+                # Atualiza contadores
+                if success:
+                    state.success += 1
+                else:
+                    state.failure += 1
+                
+                # Atualiza histograma
+                state.durations.add(duration)
+                state.duration_sum += duration
+                if duration < state.duration_min:
+                    state.duration_min = duration
+                if duration > state.duration_max:
+                    state.duration_max = duration
+            
+                # Atualiza gauge de confiança
+                if confidence is not None:
+                    state.confidence = confidence
+                    
+                # Janela de alertas, lida sob o lock já adquirido
+                state.push_extraction(not success)
+                failure, total = state.recent_failures, len(state.recent)
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
-                self._prom_extraction_total.labels(
-                    strategy=strategy,
-                    status='success' if success else 'failure'
-                ).inc()
-                
-                self._prom_extraction_duration.labels(
-                    strategy=strategy
-                ).observe(duration)
+                # As três métricas filhas da extração saem de uma única busca
+                status = _SUCCESS if success else _FAILURE
+                key = ('extraction', strategy, status)
+                children = self._prom_children.get(key)
+                if children is None:
+                    children = self._prom_children[key] = (
+                        self._prom_extraction_total.labels(strategy=strategy, status=status),
+                        self._prom_extraction_duration.labels(strategy=strategy),
+                        self._prom_extraction_confidence.labels(strategy=strategy)
+                    )
+                total_child, duration_child, confidence_child = children
                 
+                self._count(strategy, total_child)
+                duration_child.observe(duration)
                 if confidence is not None:
-                    self._prom_extraction_confidence.labels(
-                        strategy=strategy
-                    ).set(confidence)
+                    confidence_child.set(confidence)
             except Exception as e:
                 self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
                 
-        # Verifica alertas
-        self._check_extraction_alerts(strategy)
+        # Verifica alertas (dependem dos agregados por estratégia)
+        if self._need_state:
+            self._check_rate_alert(strategy, failure, total, 'error_rate', 'high_error_rate')
                 
     def record_error(self, strategy: str, error_type: str) -> None:
         """
@@ -279,31 +582,32 @@ class MetricsManager:
             strategy: Nome da estratégia
             error_type: Tipo do erro
         """
+        strategy = sys.intern(strategy)
         # Registra evento
-        event = MetricsEvent(
-            event_type='error',
-            category='error',
-            value=1,
-            labels={
-                'strategy': strategy,
-                'error_type': error_type
-            }
-        )
-        
-        with self._lock:
-            self._events.append(event)
+        if self._need_events:
+            event = self._new_event(
+                event_type='error',
+                category='error',
+                value=1,
+                labels=_shared_labels(strategy, 'error_type', error_type)
+            )
             
-            # Atualiza contadores
-            counter_key = f"error_{strategy}_{error_type}"
-            self._increment_counter(counter_key, 1)
+            with self._lock:
+                self._events.append(event)
+        
+        if self._need_state:
+            state = self._state(strategy)
+            with state.lock:
+                state.errors[error_type] += 1
+                state.error_total += 1
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
-                self._prom_error_total.labels(
-                    strategy=strategy,
-                    error_type=error_type
-                ).inc()
+                self._count(strategy, self._child(
+                    self._prom_error_total, ('error', strategy, error_type),
+                    strategy=strategy, error_type=error_type
+                ))
             except Exception as e:
                 self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
                 
@@ -314,34 +618,36 @@ class MetricsManager:
         Args:
             strategy: Nome da estratégia
         """
+        strategy = sys.intern(strategy)
         # Registra evento
-        event = MetricsEvent(
-            event_type='block',
-            category='security',
-            value=1,
-            labels={
-                'strategy': strategy
-            }
-        )
-        
-        with self._lock:
-            self._events.append(event)
+        if self._need_events:
+            event = self._new_event(
+                event_type='block',
+                category='security',
+                value=1,
+                labels=_shared_labels(strategy)
+            )
             
-            # Atualiza contadores
-            counter_key = f"block_{strategy}"
-            self._increment_counter(counter_key, 1)
+            with self._lock:
+                self._events.append(event)
+        
+        if self._need_state:
+            state = self._state(strategy)
+            with state.lock:
+                state.blocks += 1
+                state.push_block()
+                blocks, total = state.recent_blocks, len(state.recent)
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
-                self._prom_block_total.labels(
-                    strategy=strategy
-                ).inc()
+                self._count(strategy, self._child(self._prom_block_total, ('block', strategy), strategy=strategy))
             except Exception as e:
                 self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
                 
-        # Verifica alertas
-        self._check_block_alerts(strategy)
+        # Verifica alertas (dependem dos agregados por estratégia)
+        if self._need_state:
+            self._check_rate_alert(strategy, blocks, total, 'block_rate', 'high_block_rate')
                 
     def record_captcha(self, strategy: str) -> None:
         """
@@ -350,34 +656,36 @@ class MetricsManager:
         Args:
             strategy: Nome da estratégia
         """
+        strategy = sys.intern(strategy)
         # Registra evento
-        event = MetricsEvent(
-            event_type='captcha',
-            category='security',
-            value=1,
-            labels={
-                'strategy': strategy
-            }
-        )
-        
-        with self._lock:
-            self._events.append(event)
+        if self._need_events:
+            event = self._new_event(
+                event_type='captcha',
+                category='security',
+                value=1,
+                labels=_shared_labels(strategy)
+            )
             
-            # Atualiza contadores
-            counter_key = f"captcha_{strategy}"
-            self._increment_counter(counter_key, 1)
+            with self._lock:
+                self._events.append(event)
+        
+        if self._need_state:
+            state = self._state(strategy)
+            with state.lock:
+                state.captchas += 1
+                state.push_captcha()
+                captchas, total = state.recent_captchas, len(state.recent)
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
-                self._prom_captcha_total.labels(
-                    strategy=strategy
-                ).inc()
+                self._count(strategy, self._child(self._prom_captcha_total, ('captcha', strategy), strategy=strategy))
             except Exception as e:
                 self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
                 
-        # Verifica alertas
-        self._check_captcha_alerts(strategy)
+        # Verifica alertas (dependem dos agregados por estratégia)
+        if self._need_state:
+            self._check_rate_alert(strategy, captchas, total, 'captcha_rate', 'high_captcha_rate')
                 
     def record_cache(self, strategy: str, hit: bool) -> None:
         """
@@ -387,35 +695,34 @@ class MetricsManager:
             strategy: Nome da estratégia
             hit: Se foi hit (True) ou miss (False)
         """
+        strategy = sys.intern(strategy)
         # Registra evento
-        event = MetricsEvent(
-            event_type='cache',
-            category='performance',
-            value=1 if hit else 0,
-            labels={
-                'strategy': strategy,
-                'hit': str(hit)
-            }
-        )
-        
-        with self._lock:
-            self._events.append(event)
+        if self._need_events:
+            event = self._new_event(
+                event_type='cache',
+                category='performance',
+                value=1 if hit else 0,
+                labels=_shared_labels(strategy, 'hit', _TRUE_STR if hit else _FALSE_STR)
+            )
             
-            # Atualiza contadores
-            counter_key = f"cache_{strategy}_{'hit' if hit else 'miss'}"
-            self._increment_counter(counter_key, 1)
+            with self._lock:
+                self._events.append(event)
+        
+        if self._need_state:
+            state = self._state(strategy)
+            with state.lock:
+                if hit:
+                    state.cache_hits += 1
+                else:
+                    state.cache_misses += 1
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
                 if hit:
-                    self._prom_cache_hits.labels(
-                        strategy=strategy
-                    ).inc()
+                    self._count(strategy, self._child(self._prom_cache_hits, ('cache_hit', strategy), strategy=strategy))
                 else:
-                    self._prom_cache_misses.labels(
-                        strategy=strategy
-                    ).inc()
+                    self._count(strategy, self._child(self._prom_cache_misses, ('cache_miss', strategy), strategy=strategy))
             except Exception as e:
                 self.logger.error(f"Erro ao registrar métricas no Prometheus: {str(e)}")
                 
@@ -428,25 +735,26 @@ class MetricsManager:
             cpu_percent: Uso de CPU em percentual
         """
         # Registra evento
-        event = MetricsEvent(
-            event_type='resources',
-            category='system',
-            value={
-                'memory_bytes': memory_bytes,
-                'cpu_percent': cpu_percent
-            },
-            labels={}
-        )
-        
-        with self._lock:
-            self._events.append(event)
+        if self._need_events:
+            event = self._new_event(
+                event_type='resources',
+                category='system',
+                value={
+                    'memory_bytes': memory_bytes,
+                    'cpu_percent': cpu_percent
+                },
+                labels=_EMPTY_LABELS
+            )
             
-            # Atualiza gauges
-            self._set_gauge('memory_bytes', memory_bytes)
-            self._set_gauge('cpu_percent', cpu_percent)
+            with self._lock:
+                self._events.append(event)
+                
+        if self._need_state:
+            # Atualiza gauges: a tupla é substituída inteira, sem lock
+            self._resources = (memory_bytes, cpu_percent)
                 
         # Atualiza Prometheus
-        if self.config['prometheus_enabled'] and PROMETHEUS_AVAILABLE:
+        if self._prom_on:
             try:
                 self._prom_memory_usage.set(memory_bytes)
                 self._prom_cpu_usage.set(cpu_percent)
@@ -463,100 +771,119 @@ class MetricsManager:
         Returns:
             Dicionário com resumo das métricas
         """
-        with self._lock:
-            # Calcula estatísticas
-            extractions_total = sum(v for k, v in self._counters.items() if k.startswith('extraction_'))
-            extractions_success = sum(v for k, v in self._counters.items() if k.startswith('extraction_') and k.endswith('_success'))
-            extractions_failure = sum(v for k, v in self._counters.items() if k.startswith('extraction_') and k.endswith('_failure'))
-            
-            errors_total = sum(v for k, v in self._counters.items() if k.startswith('error_'))
-            blocks_total = sum(v for k, v in self._counters.items() if k.startswith('block_'))
-            captchas_total = sum(v for k, v in self._counters.items() if k.startswith('captcha_'))
-            
-            cache_hits = sum(v for k, v in self._counters.items() if k.startswith('cache_') and k.endswith('_hit'))
-            cache_misses = sum(v for k, v in self._counters.items() if k.startswith('cache_') and k.endswith('_miss'))
-            
-            # Calcula estatísticas por estratégia
-            strategies = set()
-            for key in self._counters.keys():
-                if key.startswith('extraction_'):
-                    strategy = key.split('_')[1]
-                    strategies.add(strategy)
-                    
-            strategy_stats = {}
-            for strategy in strategies:
-                success = self._counters.get(f'extraction_{strategy}_success', 0)
-                failure = self._counters.get(f'extraction_{strategy}_failure', 0)
-                total = success + failure
-                
-                strategy_stats[strategy] = {
-                    'extractions': {
-                        'total': total,
-                        'success': success,
-                        'failure': failure,
-                        'success_rate': success / total if total > 0 else 0
-                    },
-                    'errors': self._counters.get(f'error_{strategy}', 0),
-                    'blocks': self._counters.get(f'block_{strategy}', 0),
-                    'captchas': self._counters.get(f'captcha_{strategy}', 0),
-                    'cache': {
-                        'hits': self._counters.get(f'cache_{strategy}_hit', 0),
-                        'misses': self._counters.get(f'cache_{strategy}_miss', 0)
-                    }
-                }
-                
-                # Adiciona estatísticas de duração
-                duration_key = f'duration_{strategy}'
-                if duration_key in self._histograms and self._histograms[duration_key]:
-                    durations = self._histograms[duration_key]
-                    strategy_stats[strategy]['duration'] = {
-                        'avg': sum(durations) / len(durations),
-                        'min': min(durations),
-                        'max': max(durations),
-                        'p50': self._percentile(durations, 50),
-                        'p90': self._percentile(durations, 90),
-                        'p95': self._percentile(durations, 95),
-                        'p99': self._percentile(durations, 99)
-                    }
+        extractions_success = extractions_failure = 0
+        errors_total = blocks_total = captchas_total = 0
+        cache_hits = cache_misses = 0
+        
+        # Estatísticas por estratégia, cada uma lida sob o próprio lock; os totais
+        # gerais são somados na mesma passada (O(estratégias), sem varrer chaves)
+        strategy_stats = {}
+        for strategy, state in list(self._strategy_state.items()):
+            with state.lock:
+                success = state.success
+                failure = state.failure
+                errors = state.error_total
+                blocks = state.blocks
+                captchas = state.captchas
+                hits = state.cache_hits
+                misses = state.cache_misses
+                durations = state.durations.copy()
+                duration_sum = state.duration_sum
+                duration_min = state.duration_min
+                duration_max = state.duration_max
                 
-            # Obtém métricas de recurso atuais
-            try:
-                import psutil
-                process = psutil.Process()
-                memory_bytes = process.memory_info().rss
-                cpu_percent = process.cpu_percent(interval=0.1)
-            except ImportError:
-                memory_bytes = self._gauges.get('memory_bytes', 0)
-                cpu_percent = self._gauges.get('cpu_percent', 0)
+            extractions_success += success
+            extractions_failure += failure
+            errors_total += errors
+            blocks_total += blocks
+            captchas_total += captchas
+            cache_hits += hits
+            cache_misses += misses
+            
+            if success + failure == 0:
+                # Mantém o formato anterior: só estratégias com extrações aparecem
+                continue
                 
-            return {
+            total = success + failure
+            strategy_stats[strategy] = {
                 'extractions': {
-                    'total': extractions_total,
-                    'success': extractions_success,
-                    'failure': extractions_failure,
-                    'success_rate': extractions_success / extractions_total if extractions_total > 0 else 0
-                },
-                'errors': errors_total,
-                'security': {
-                    'blocks': blocks_total,
-                    'captchas': captchas_total
+                    'total': total,
+                    'success': success,
+                    'failure': failure,
+                    'success_rate': success / total if total > 0 else 0
                 },
+                'errors': errors,
+                'blocks': blocks,
+                'captchas': captchas,
                 'cache': {
-                    'hits': cache_hits,
-                    'misses': cache_misses,
-                    'hit_rate': cache_hits / (cache_hits + cache_misses) if (cache_hits + cache_misses) > 0 else 0
-                },
-                'resources': {
-                    'memory_mb': round(memory_bytes / (1024 * 1024), 2),
-                    'cpu_percent': cpu_percent
-                },
-                'strategies': strategy_stats,
-                'events_tracked': len(self._events)
+                    'hits': hits,
+                    'misses': misses
+                }
             }
             
+            # Adiciona estatísticas de duração
+            if durations.count:
+                # Os quatro percentis saem de uma única passada pelo sketch,
+                # limitados ao intervalo observado
+                p50, p90, p95, p99 = (
+                    min(max(v, duration_min), duration_max)
+                    for v in durations.quantiles(SUMMARY_QUANTILES)
+                )
+                strategy_stats[strategy]['duration'] = {
+                    'avg': duration_sum / durations.count,
+                    'min': duration_min,
+                    'max': duration_max,
+                    'p50': p50,
+                    'p90': p90,
+                    'p95': p95,
+                    'p99': p99
+                }
+                
+        extractions_total = extractions_success + extractions_failure
+        
+        # Obtém métricas de recurso atuais; cpu_percent(None) não bloqueia e
+        # mede o uso desde a leitura anterior
+        if self._process is not None:
+            memory_bytes = self._process.memory_info().rss
+            cpu_percent = self._process.cpu_percent(None)
+        else:
+            memory_bytes, cpu_percent = self._resources
+                
+        # Só a contagem de eventos precisa do lock; o dicionário é montado fora dele
+        with self._lock:
+            events_tracked = len(self._events)
+            
+        return {
+            'extractions': {
+                'total': extractions_total,
+                'success': extractions_success,
+                'failure': extractions_failure,
+                'success_rate': extractions_success / extractions_total if extractions_total > 0 else 0
+            },
+            'errors': errors_total,
+            'security': {
+                'blocks': blocks_total,
+                'captchas': captchas_total
+            },
+            'cache': {
+                'hits': cache_hits,
+                'misses': cache_misses,
+                'hit_rate': cache_hits / (cache_hits + cache_misses) if (cache_hits + cache_misses) > 0 else 0
+            },
+            'resources': {
+                'memory_mb': round(memory_bytes / (1024 * 1024), 2),
+                'cpu_percent': cpu_percent
+            },
+            'strategies': strategy_stats,
+            'events_tracked': events_tracked
+        }
+            
     def export_metrics(self) -> bool:
         """
-        Exporta métricas para arquivo.
+        Exporta métricas para arquivo. Os eventos novos são anexados ao arquivo
+        do dia em JSON delimitado por linha: a primeira linha do arquivo traz os
+        nomes dos campos ({"schema": [...]}) e cada evento é uma lista posicional.
+        Use read_metrics_file() para ler.
         
         Returns:
             True se exportado com sucesso, False caso contrário
@@ -564,41 +891,39 @@ class MetricsManager:
         if not self.config['file_enabled']:
             return False
             
+        pending = ()
         try:
             # Gera nome do arquivo baseado na data
             today = datetime.now().strftime('%Y-%m-%d')
-            filepath = self.metrics_path / f"metrics_{today}.json"
+            filepath = self.metrics_path / f"metrics_{today}.ndjson"
             
-            # Converte eventos para dicionários
+            # Troca o buffer sob o lock; a serialização ocorre fora dele
             with self._lock:
-                events = [e.to_dict() for e in self._events]
+                pending, self._events = self._events, deque(maxlen=self.config['history_size'])
                 
-            # Verifica se arquivo existe
-            if filepath.exists():
-                # Carrega dados existentes
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                    except:
-                        data = []
-                        
-                # Adiciona novos eventos
-                data.extend(events)
-            else:
-                data = events
+            if not pending:
+                return True
                 
-            # Salva arquivo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
-            # Limpa eventos
-            with self._lock:
-                self._events = []
+            # Serializa os eventos novos num único buffer, uma linha compacta por evento
+            data = b''.join(_dumps_line(e.to_row()) for e in pending)
+            
+            # Apenas anexa: o conteúdo já exportado no dia não é relido nem regravado
+            with open(filepath, 'ab', buffering=1 << 16) as f:
+                if f.tell() == 0:
+                    # Arquivo novo: nomes dos campos uma única vez
+                    f.write(_EVENT_SCHEMA_LINE)
+                f.write(data)
                 
+            # Gravados: os objetos voltam ao pool para os próximos registros
+            self._event_pool.extend(pending)
             return True
             
         except Exception as e:
             self.logger.error(f"Erro ao exportar métricas: {str(e)}")
+            # Devolve os eventos não gravados à frente do buffer; o limite descarta os mais antigos
+            if pending:
+                with self._lock:
+                    self._events = deque([*pending, *self._events], maxlen=self.config['history_size'])
             return False
             
     def cleanup_old_metrics(self) -> int:
@@ -615,7 +940,7 @@ class MetricsManager:
             cutoff_date = datetime.now() - timedelta(days=self.config['retention_days'])
             count = 0
             
-            for filepath in self.metrics_path.glob("metrics_*.json"):
+            for filepath in self.metrics_path.glob("metrics_*.*json"):
                 try:
                     # Extrai data do nome do arquivo
                     date_str = filepath.stem.replace('metrics_', '')
@@ -634,121 +959,86 @@ class MetricsManager:
             self.logger.error(f"Erro ao limpar métricas antigas: {str(e)}")
             return 0
             
+    def close(self) -> None:
+        """Encerra a exportação periódica e exporta os eventos pendentes."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        # O registro no atexit mantém o gerenciador vivo; depois de fechado, libera-o
+        atexit.unregister(self.close)
+        self._export_thread.join(timeout=5)
+        self.flush_prometheus()
+        self.export_metrics()
+        
     def _periodic_export(self) -> None:
-        """Exporta métricas periodicamente."""
+        """
+        Exporta métricas periodicamente, até close().
+        
+        Com o Prometheus ativo, acorda a cada PROM_FLUSH_INTERVAL para repassar
+        os incrementos acumulados; a exportação em arquivo segue no intervalo próprio.
+        """
+        next_export = time.monotonic() + EXPORT_INTERVAL + random.uniform(0, EXPORT_JITTER)
         while True:
-            try:
-                # Exporta métricas a cada hora
-                time.sleep(3600)
-                self.export_metrics()
-                self.cleanup_old_metrics()
-            except:
-                pass
+            timeout = max(next_export - time.monotonic(), 0)
+            if self._prom_on:
+                timeout = min(timeout, PROM_FLUSH_INTERVAL)
+            if self._stop.wait(timeout):
+                break
                 
-    def _percentile(self, values: List[float], percentile: int) -> float:
-        """Calcula percentil de uma lista de valores."""
-        if not values:
-            return 0
-            
-        values = sorted(values)
-        idx = (len(values) - 1) * percentile / 100
-        
-        if idx.is_integer():
-            return values[int(idx)]
-        else:
-            lower = values[int(idx)]
-            upper = values[int(idx) + 1]
-            return lower + (upper - lower) * (idx - int(idx))
-            
-    def _increment_counter(self, key: str, value: float = 1) -> None:
-        """Incrementa um contador."""
-        if key not in self._counters:
-            self._counters[key] = 0
-        self._counters[key] += value
-        
-    def _set_gauge(self, key: str, value: float) -> None:
-        """Define valor de um gauge."""
-        self._gauges[key] = value
-        
-    def _check_extraction_alerts(self, strategy: str) -> None:
-        """Verifica alertas baseados em extrações."""
-        with self._lock:
-            # Calcula taxa de erro
-            success = self._counters.get(f'extraction_{strategy}_success', 0)
-            failure = self._counters.get(f'extraction_{strategy}_failure', 0)
-            total = success + failure
-            
-            if total >= 10:  # Precisamos de pelo menos 10 extrações para avaliar
-                error_rate = failure / total
+            if self._prom_on:
+                self.flush_prometheus()
                 
-                # Verifica se acima do limiar
-                if error_rate >= self.config['alert_thresholds']['error_rate']:
-                    # Dispara alerta
-                    self._send_alert(
-                        'high_error_rate',
-                        {
-                            'strategy': strategy,
-                            'error_rate': error_rate,
-                            'threshold': self.config['alert_thresholds']['error_rate'],
-                            'total_attempts': total
-                        }
-                    )
-                    
-    def _check_block_alerts(self, strategy: str) -> None:
-        """Verifica alertas baseados em bloqueios."""
-        with self._lock:
-            # Calcula taxa de bloqueio
-            blocks = self._counters.get(f'block_{strategy}', 0)
-            total = sum(v for k, v in self._counters.items() 
-                       if k.startswith(f'extraction_{strategy}'))
-            
-            if total >= 10:  # Precisamos de pelo menos 10 extrações para avaliar
-                block_rate = blocks / total
+            if time.monotonic() >= next_export:
+                try:
+                    self.export_metrics()
+                    self.cleanup_old_metrics()
+                except Exception as e:
+                    self.logger.error(f"Erro na exportação periódica de métricas: {str(e)}")
+                next_export = time.monotonic() + EXPORT_INTERVAL + random.uniform(0, EXPORT_JITTER)
                 
-                # Verifica se acima do limiar
-                if block_rate >= self.config['alert_thresholds']['block_rate']:
-                    # Dispara alerta
-                    self._send_alert(
-                        'high_block_rate',
-                        {
-                            'strategy': strategy,
-                            'block_rate': block_rate,
-                            'threshold': self.config['alert_thresholds']['block_rate'],
-                            'total_attempts': total
-                        }
-                    )
-                    
-    def _check_captcha_alerts(self, strategy: str) -> None:
-        """Verifica alertas baseados em CAPTCHAs."""
-        with self._lock:
-            # Calcula taxa de CAPTCHA
-            captchas = self._counters.get(f'captcha_{strategy}', 0)
-            total = sum(v for k, v in self._counters.items() 
-                       if k.startswith(f'extraction_{strategy}'))
+    def _check_rate_alert(self, strategy: str, count: int, total: int,
+                          threshold_key: str, alert_type: str) -> None:
+        """
+        Verifica um alerta de taxa (erros, bloqueios ou CAPTCHAs por extração).
+        
+        Os valores vêm da janela das últimas ALERT_WINDOW extrações, lida pelo
+        registro que acabou de atualizá-la; aqui nenhum lock é adquirido, e os
+        callbacks rodam livres. Quando a taxa recente volta ao normal o alerta cessa.
+        
+        A taxa é a fração das extrações da janela afetadas, limitada a 1.0: mais
+        bloqueios (ou CAPTCHAs) que extrações contam como todas afetadas.
+        
+        Args:
+            strategy: Nome da estratégia
+            count: Ocorrências na janela
+            total: Extrações na janela
+            threshold_key: Chave do limiar em alert_thresholds (também usada no alerta)
+            alert_type: Tipo do alerta enviado
+        """
+        if total < 10:  # Precisamos de pelo menos 10 extrações para avaliar
+            return
             
-            if total >= 10:  # Precisamos de pelo menos 10 extrações para avaliar
-                captcha_rate = captchas / total
-                
-                # Verifica se acima do limiar
-                if captcha_rate >= self.config['alert_thresholds']['captcha_rate']:
-                    # Dispara alerta
-                    self._send_alert(
-                        'high_captcha_rate',
-                        {
-                            'strategy': strategy,
-                            'captcha_rate': captcha_rate,
-                            'threshold': self.config['alert_thresholds']['captcha_rate'],
-                            'total_attempts': total
-                        }
-                    )
+        rate = min(count, total) / total
+        threshold = self.config['alert_thresholds'][threshold_key]
+        
+        # Verifica se acima do limiar
+        if rate >= threshold:
+            # Dispara alerta
+            self._send_alert(
+                alert_type,
+                {
+                    'strategy': strategy,
+                    threshold_key: rate,
+                    'threshold': threshold,
+                    'total_attempts': total
+                }
+            )
                     
     def _check_resource_alerts(self, memory_bytes: int, cpu_percent: float) -> None:
         """Verifica alertas baseados em recursos."""
-        # Verifica uso de memória
-        try:
-            import psutil
-            total_memory = psutil.virtual_memory().total
-            memory_percent = memory_bytes / total_memory * 100
+        # Verifica uso de memória (memória total lida uma vez na inicialização)
+        if self._total_memory:
+            memory_percent = memory_bytes / self._total_memory * 100
             
             # Verifica se acima do limiar
             if memory_percent >= self.config['alert_thresholds']['memory_percent']:
@@ -761,8 +1051,6 @@ class MetricsManager:
                         'threshold': self.config['alert_thresholds']['memory_percent']
                     }
                 )
-        except:
-            pass
             
         # Verifica uso de CPU
         if cpu_percent >= self.config['alert_thresholds']['cpu_percent']:
@@ -0,0 +1,94 @@
+"""
+Sketch de quantis com memória limitada para durações.
+
+Os valores são agrupados em baldes logarítmicos (como no DDSketch): cada
+balde cobre um intervalo [gamma^(i-1), gamma^i), então qualquer quantil é
+estimado com erro relativo de no máximo `relative_accuracy`. Inserção é
+O(1) e o número de baldes cresce só com o logaritmo da faixa de valores.
+"""
+
+import math
+from typing import Dict, List, Sequence
+
+# Valores abaixo deste limite (inclusive zero e negativos) vão para um balde único
+_MIN_VALUE = 1e-9
+
+
+class DurationSketch:
+    """Histograma logarítmico com erro relativo limitado nos quantis."""
+
+    __slots__ = ('_gamma', '_log_gamma', '_buckets', '_zero', 'count')
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Inicializa o sketch.
+
+        Args:
+            relative_accuracy: Erro relativo máximo dos quantis (0.01 = 1%)
+        """
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Registra um valor."""
+        self.count += 1
+        if value <= _MIN_VALUE:
+            self._zero += 1
+            return
+        i = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[i] = self._buckets.get(i, 0) + 1
+
+    def copy(self) -> 'DurationSketch':
+        """Cópia independente (para ler fora do lock do dono)."""
+        other = DurationSketch.__new__(DurationSketch)
+        other._gamma = self._gamma
+        other._log_gamma = self._log_gamma
+        other._buckets = dict(self._buckets)
+        other._zero = self._zero
+        other.count = self.count
+        return other
+
+    def quantile(self, q: float) -> float:
+        """Valor estimado no quantil q (0 a 1); 0 se vazio."""
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        Valores estimados em vários quantis com uma única ordenação dos baldes.
+
+        Args:
+            qs: Quantis (0 a 1), em qualquer ordem
+
+        Returns:
+            Estimativas na mesma ordem de qs; zeros se vazio
+        """
+        result = [0.0] * len(qs)
+        if not self.count:
+            return result
+        # Percorre os baldes uma vez, atendendo os quantis em ordem crescente
+        order = sorted(range(len(qs)), key=qs.__getitem__)
+        pending = iter(order)
+        j = next(pending, None)
+        seen = self._zero
+        while j is not None and qs[j] * (self.count - 1) < seen:
+            j = next(pending, None)
+        midpoint = 2 / (self._gamma + 1)
+        if j is not None:
+            for i in sorted(self._buckets):
+                seen += self._buckets[i]
+                # Ponto do balde com o menor erro relativo para todo o intervalo
+                value = midpoint * self._gamma ** i
+                while j is not None and qs[j] * (self.count - 1) < seen:
+                    result[j] = value
+                    j = next(pending, None)
+                if j is None:
+                    break
+            else:
+                value = midpoint * self._gamma ** max(self._buckets)
+                while j is not None:
+                    result[j] = value
+                    j = next(pending, None)
+        return result
@@ -0,0 +1,75 @@
+import time
+import threading
+
+from src.services.cache.admission import TinyLFU
+from src.services.cache.sqlite_store import SQLiteStore
+
+def test_sqlite_store_expiry(tmp_path):
+    """Testa que chaves expiradas somem das leituras e da limpeza."""
+    store = SQLiteStore(tmp_path / "cache.db")
+    try:
+        store.set("live", b"1", time.time() + 60)
+        store.set("forever", b"2", None)
+        store.set("expired", b"3", time.time() - 1)
+        
+        assert store.get("live") == b"1"
+        assert store.get("forever") == b"2"
+        assert store.get("expired") is None
+        assert [row[0] for row in store.recent(10)] == ["forever", "live"]
+        
+        assert store.delete_expired() == 1
+        assert store.stats() == (2, 2)
+    finally:
+        store.close()
+
+def test_sqlite_store_threads(tmp_path):
+    """Testa leituras de várias threads, cada uma com a própria conexão."""
+    store = SQLiteStore(tmp_path / "cache.db")
+    try:
+        for i in range(50):
+            store.set(f"key{i}", str(i).encode(), None)
+            
+        errors = []
+        def reader():
+            try:
+                for i in range(50):
+                    assert store.get(f"key{i}") == str(i).encode()
+            except Exception as e:
+                errors.append(e)
+                
+        threads = [threading.Thread(target=reader) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+            
+        assert errors == []
+        # Uma conexão para a thread principal e uma por leitora
+        assert len(store._connections) == 9
+    finally:
+        store.close()
+
+def test_tinylfu_admits_frequent_keys():
+    """Testa que uma chave popular não é expulsa por uma chave vista uma vez."""
+    admission = TinyLFU(1000)
+    for _ in range(10):
+        admission.increment("popular")
+    admission.increment("once")
+    
+    assert admission.estimate("popular") > admission.estimate("once")
+    assert not admission.admit("once", "popular")
+    assert admission.admit("popular", "once")
+    # Chave nunca vista não substitui nenhuma já registrada
+    assert not admission.admit("never", "once")
+
+def test_tinylfu_ages_counters():
+    """Testa que o envelhecimento reduz frequências antigas."""
+    admission = TinyLFU(16)
+    for _ in range(15):
+        admission.increment("old")
+    before = admission.estimate("old")
+    
+    # Acessos a outras chaves disparam o envelhecimento (10x a capacidade)
+    for i in range(160):
+        admission.increment(f"other{i}")
+    assert admission.estimate("old") < before
@@ -0,0 +1,95 @@
+import json
+import random
+import pytest
+
+from src.services.metrics import MetricsManager, read_metrics_file
+from src.services.metrics.manager import ALERT_WINDOW
+from src.services.metrics.sketch import DurationSketch
+
+@pytest.fixture
+def metrics(tmp_path):
+    """Gerenciador de métricas isolado, com alertas capturados."""
+    manager = MetricsManager({
+        'prometheus_enabled': False,
+        'file_path': str(tmp_path)
+    })
+    manager.alerts = []
+    manager._alert_callbacks.append(lambda alert_type, details: manager.alerts.append((alert_type, details)))
+    yield manager
+    manager.close()
+
+def test_block_storm_keeps_alerting(metrics):
+    """Testa que uma rajada de bloqueios não tira as extrações da janela de alertas."""
+    for _ in range(20):
+        metrics.record_extraction('test', True, 1.0)
+    for _ in range(300):
+        metrics.record_block('test')
+
+    block_alerts = [details for alert_type, details in metrics.alerts if alert_type == 'high_block_rate']
+    # Só o primeiro bloqueio fica abaixo do limiar de 10%; nenhum alerta se perde depois
+    assert len(block_alerts) == 299
+    assert block_alerts[-1]['total_attempts'] == 20
+    assert 0 < block_alerts[-1]['block_rate'] <= 1.0
+
+def test_error_rate_alert_recovers(metrics):
+    """Testa que o alerta de erro cessa quando as falhas saem da janela."""
+    for _ in range(50):
+        metrics.record_extraction('test', False, 1.0)
+    assert metrics.alerts[-1][0] == 'high_error_rate'
+
+    for _ in range(ALERT_WINDOW):
+        metrics.record_extraction('test', True, 1.0)
+    metrics.alerts.clear()
+
+    metrics.record_extraction('test', True, 1.0)
+    assert metrics.alerts == []
+
+def test_blocks_leave_window_with_their_extraction(metrics):
+    """Testa que bloqueios antigos deixam de contar junto com a extração a que pertencem."""
+    for _ in range(20):
+        metrics.record_extraction('test', True, 1.0)
+        metrics.record_block('test')
+    for _ in range(ALERT_WINDOW):
+        metrics.record_extraction('test', True, 1.0)
+    metrics.alerts.clear()
+
+    metrics.record_block('test')
+    # Um único bloqueio sobre ALERT_WINDOW extrações fica abaixo do limiar
+    assert metrics.alerts == []
+
+def test_read_metrics_file_formats(metrics, tmp_path):
+    """Testa a leitura do formato atual e dos arquivos .json antigos (um array)."""
+    metrics.record_block('test')
+    assert metrics.export_metrics()
+    current = list(tmp_path.glob("metrics_*.ndjson"))
+    events = read_metrics_file(current[0])
+    assert [e.event_type for e in events] == ['block']
+    assert events[0].labels == {'strategy': 'test'}
+    
+    legacy = tmp_path / "metrics_2024-01-01.json"
+    legacy.write_text(json.dumps([{
+        'event_type': 'captcha',
+        'category': 'security',
+        'value': 1,
+        'labels': {'strategy': 'test'},
+        'timestamp': '2024-01-01T12:00:00'
+    }], indent=2), encoding='utf-8')
+    events = read_metrics_file(legacy)
+    assert [e.event_type for e in events] == ['captcha']
+    assert events[0].value == 1
+
+def test_duration_sketch_relative_error():
+    """Testa que os quantis do sketch ficam dentro do erro relativo configurado."""
+    rng = random.Random(42)
+    values = [rng.lognormvariate(0, 1.5) for _ in range(10000)]
+    sketch = DurationSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+        
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+        
+    assert sketch.count == len(values)
+    assert DurationSketch().quantile(0.5) == 0.0
@@ -0,0 +1,76 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import src.queue as queue_module
+from src.queue import QueueItem, ScrapingQueue
+
+@pytest.fixture
+def scraping_queue(monkeypatch):
+    """Fila com configurações de teste e sem arquivo de log."""
+    monkeypatch.setattr(queue_module, "settings", SimpleNamespace(
+        MAX_QUEUE_SIZE=100,
+        PRIORITY_THRESHOLD=3600,
+        MAX_RETRIES=3,
+        DOMAIN_RATE_LIMIT=0.05,
+        QUEUE_PROCESS_INTERVAL=0.01
+    ))
+    monkeypatch.setattr(ScrapingQueue, "_setup_logging", lambda self: None)
+    return ScrapingQueue(max_workers=2)
+
+def make_item(url="https://example.com/a", domain="example.com"):
+    return QueueItem(
+        url=url,
+        domain=domain,
+        last_checked=datetime.utcnow() - timedelta(hours=1),
+        priority_score=0.5
+    )
+
+@pytest.mark.asyncio
+async def test_pause_holds_items_for_waiting_workers(scraping_queue):
+    """Testa que um worker já bloqueado na fila não pega itens após pause()."""
+    waiting = asyncio.create_task(scraping_queue.get_next_item())
+    await asyncio.sleep(0)
+
+    await scraping_queue.pause()
+    await scraping_queue.add_item(make_item())
+    await asyncio.sleep(0.05)
+
+    # O item continua na fila enquanto pausada
+    assert not waiting.done()
+    assert scraping_queue.priority_queue.qsize() == 1
+
+    await scraping_queue.resume()
+    item = await asyncio.wait_for(waiting, timeout=1)
+    assert item.url == "https://example.com/a"
+    assert item.status == "processing"
+
+@pytest.mark.asyncio
+async def test_flush_cancels_rate_limited_requeues(scraping_queue):
+    """Testa que flush() descarta também os itens aguardando o limite do domínio."""
+    scraping_queue.domain_last_scrape["example.com"] = datetime.utcnow()
+    await scraping_queue.add_item(make_item())
+
+    waiting = asyncio.create_task(scraping_queue.get_next_item())
+    await asyncio.sleep(0.01)
+    # O item foi adiado pelo limite do domínio
+    assert scraping_queue.priority_queue.empty()
+
+    await scraping_queue.flush()
+    await asyncio.sleep(0.1)
+
+    # Nada volta para a fila depois do flush
+    assert scraping_queue.priority_queue.empty()
+    assert not waiting.done()
+    waiting.cancel()
+
+@pytest.mark.asyncio
+async def test_rate_limited_item_returns_without_flush(scraping_queue):
+    """Testa que, sem flush, o item adiado volta à fila após o limite do domínio."""
+    scraping_queue.domain_last_scrape["example.com"] = datetime.utcnow()
+    await scraping_queue.add_item(make_item())
+
+    item = await asyncio.wait_for(scraping_queue.get_next_item(), timeout=1)
+    assert item.url == "https://example.com/a"
+    assert not scraping_queue._requeues